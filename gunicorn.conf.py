@@ -0,0 +1,22 @@
+# Configuración de gunicorn (se carga automáticamente desde el directorio de trabajo).
+# GUNICORN_PRELOAD=True importa la aplicación una vez en el master y los
+# workers se crean con fork: arranque y autoescalado más rápidos.
+import os
+
+wsgi_app = 'sisreservas.wsgi:application'
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'False') == 'True'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+if preload_app:
+    os.environ.setdefault('DJANGO_PRECARGAR_URLS', 'True')
+
+
+def post_fork(server, worker):
+    # Conexiones y clientes de cache creados en el master no son seguros
+    # tras el fork: cada worker abre los suyos.
+    from django.core.cache import caches
+    from django.db import connections
+
+    connections.close_all()
+    for cache in caches.all(initialized_only=True):
+        cache.close()
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Usuario, Cancha, Reserva, Pago
+from .models import Usuario, Cancha, Reserva, Pago, ListaEspera, MensajeSaliente
+from .paginacion import PaginadorConteoEstimado
 from django.contrib.auth.admin import UserAdmin
 
 @admin.register(Usuario)
@@ -7,10 +8,67 @@ class UsuarioAdmin(UserAdmin):
     model = Usuario
     list_display = ('username', 'first_name', 'last_name', 'rol', 'dni', 'celular', 'is_active')
     list_filter = ('rol', 'is_active')
+    search_fields = ('username', 'first_name', 'last_name', '=dni', 'celular')
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
     fieldsets = UserAdmin.fieldsets + (
         ('Información adicional', {'fields': ('rol', 'dni', 'celular')}),
     )
 
-admin.site.register(Cancha)
-admin.site.register(Reserva)
-admin.site.register(Pago)
\ No newline at end of file
+
+@admin.register(Cancha)
+class CanchaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'deporte', 'calidad', 'costo_dia', 'costo_noche', 'disponible')
+    list_filter = ('deporte', 'calidad', 'disponible')
+    search_fields = ('nombre',)
+
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'cancha', 'cliente', 'fecha_reserva', 'hora_inicio', 'hora_fin',
+        'estado', 'monto_total', 'monto_pagado', 'saldo',
+    )
+    # Reserva.__str__ usa cancha y cliente
+    list_select_related = ('cancha', 'cliente')
+    list_filter = ('estado',)
+    date_hierarchy = 'fecha_reserva'
+    ordering = ('-fecha_reserva', '-hora_inicio')
+    search_fields = ('=id', 'cliente__username', '=cliente__dni')
+    autocomplete_fields = ('cancha', 'cliente', 'atendido_por')
+    readonly_fields = ('monto_pagado', 'saldo', 'fecha_creacion')
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+
+
+@admin.register(Pago)
+class PagoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'reserva', 'monto', 'metodo_pago', 'estado_pago', 'fecha_pago', 'verificado_por')
+    # Pago.__str__ -> Reserva.__str__ -> cancha y cliente
+    list_select_related = ('reserva__cancha', 'reserva__cliente', 'verificado_por')
+    list_filter = ('estado_pago', 'metodo_pago')
+    date_hierarchy = 'fecha_pago'
+    ordering = ('-fecha_pago',)
+    search_fields = ('=id', '=reserva__id', 'reserva__cliente__username')
+    raw_id_fields = ('reserva',)
+    autocomplete_fields = ('verificado_por',)
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+
+
+@admin.register(ListaEspera)
+class ListaEsperaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'cancha', 'cliente', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'creado')
+    list_select_related = ('cancha', 'cliente')
+    list_filter = ('estado',)
+    date_hierarchy = 'fecha'
+    autocomplete_fields = ('cancha', 'cliente')
+    raw_id_fields = ('reserva',)
+
+
+@admin.register(MensajeSaliente)
+class MensajeSalienteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'destinatario', 'estado', 'intentos', 'enviar_desde', 'enviado')
+    list_filter = ('estado', 'tipo')
+    search_fields = ('destinatario',)
+    raw_id_fields = ('reserva',)
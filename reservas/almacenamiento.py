@@ -0,0 +1,166 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+
+# ----------------- SUBIDA -----------------
+class HashTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Escribe la subida a un archivo temporal por bloques (nunca el archivo
+    completo en memoria) y calcula su sha256 mientras llegan los datos.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        archivo = super().file_complete(file_size)
+        archivo.sha256 = self.hash.hexdigest()
+        return archivo
+
+
+# ----------------- ALMACENAMIENTO -----------------
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """
+    Guarda cada archivo con el nombre de su sha256 en directorios de dos
+    niveles (comprobantes/ab/cd/abcd...jpg). Si el contenido ya existe no se
+    vuelve a escribir: las subidas repetidas comparten el mismo archivo.
+    """
+
+    def _save(self, name, content):
+        digest = getattr(content, 'sha256', None) or self.calcular_hash(content)
+        carpeta = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(carpeta, digest[:2], digest[2:4], digest + extension)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    @staticmethod
+    def calcular_hash(content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+
+_comprobantes = None
+
+
+def almacenamiento_comprobantes():
+    global _comprobantes
+    if _comprobantes is None:
+        _comprobantes = AlmacenamientoPorContenido()
+    return _comprobantes
+
+
+# ----------------- ENVÍO -----------------
+RANGO_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+TAMANO_BLOQUE = 64 * 1024
+
+
+def _leer_rango(ruta, inicio, longitud):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while longitud > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+            yield bloque
+
+
+def servir_archivo(request, storage, name):
+    """
+    Respuesta para un archivo del storage con ETag/Last-Modified, peticiones
+    condicionales y Range. Según COMPROBANTES_ENVIO los bytes los entrega
+    nginx (X-Accel-Redirect), apache (X-Sendfile) o el propio Django.
+    """
+    ruta = storage.path(name)
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+
+    base = posixpath.splitext(posixpath.basename(name))[0]
+    # Con nombres por contenido el hash ya identifica la versión
+    etag_valor = base if re.fullmatch(r'[0-9a-f]{64}', base) else hashlib.md5(
+        f'{name}:{estado.st_mtime_ns}:{estado.st_size}'.encode()
+    ).hexdigest()
+    etag = f'"{etag_valor}"'
+    modificado = int(estado.st_mtime)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        no_modificado = etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    else:
+        desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        no_modificado = desde is not None and modificado <= desde
+    if no_modificado:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    tipo = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    modo = settings.COMPROBANTES_ENVIO
+
+    if modo == 'nginx':
+        response = HttpResponse(content_type=tipo)
+        response['X-Accel-Redirect'] = settings.COMPROBANTES_ACCEL_PREFIX.rstrip('/') + '/' + name
+    elif modo == 'apache':
+        response = HttpResponse(content_type=tipo)
+        response['X-Sendfile'] = ruta
+    else:
+        response = _respuesta_django(request, ruta, estado.st_size, tipo, etag, modificado)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado)
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+def _respuesta_django(request, ruta, tamano, tipo, etag, modificado):
+    rango = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != modificado:
+        # El cliente tiene otra versión: se envía el archivo completo
+        rango = ''
+
+    m = RANGO_RE.match(rango.strip())
+    if rango and m and (m.group(1) or m.group(2)):
+        if m.group(1):
+            inicio = int(m.group(1))
+            fin = int(m.group(2)) if m.group(2) else tamano - 1
+        else:
+            # bytes=-N: los últimos N bytes
+            inicio = max(tamano - int(m.group(2)), 0)
+            fin = tamano - 1
+        fin = min(fin, tamano - 1)
+        if inicio > fin or inicio >= tamano:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{tamano}'
+            return response
+        longitud = fin - inicio + 1
+        response = StreamingHttpResponse(_leer_rango(ruta, inicio, longitud), status=206, content_type=tipo)
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    else:
+        longitud = tamano
+        response = StreamingHttpResponse(_leer_rango(ruta, 0, tamano), content_type=tipo)
+
+    response['Content-Length'] = str(longitud)
+    response['Accept-Ranges'] = 'bytes'
+    return response
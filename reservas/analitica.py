@@ -0,0 +1,144 @@
+"""
+Analítica de demanda con NumPy: mapas de ocupación (día x hora), tasa de
+anulación y pronóstico estacional por cancha.
+
+Las reservas se leen en una sola consulta como tuplas (sin instanciar
+modelos) y todos los cálculos se hacen sobre arreglos.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models.functions import ExtractHour, ExtractMinute
+from django.utils import timezone
+
+from .models import Cancha, Reserva
+
+DIAS = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+# Semanas de historia usadas en el pronóstico y peso relativo de cada semana
+# hacia atrás (la más reciente pesa más)
+SEMANAS_PRONOSTICO = 8
+DECAIMIENTO = 0.8
+
+
+def _dia_semana(dias_epoch):
+    # 1970-01-01 fue jueves (lunes = 0)
+    return (dias_epoch + 3) % 7
+
+
+def _minutos(campo):
+    return ExtractHour(campo) * 60 + ExtractMinute(campo)
+
+
+def cargar_reservas(desde, hasta):
+    """Devuelve las columnas de las reservas del rango como arreglos NumPy."""
+    filas = list(
+        Reserva.objects.filter(fecha_reserva__range=(desde, hasta))
+        .annotate(ini=_minutos('hora_inicio'), fin=_minutos('hora_fin'))
+        .values_list('cancha_id', 'fecha_reserva', 'ini', 'fin', 'estado')
+        .iterator(chunk_size=5000)
+    )
+    if not filas:
+        vacio = np.empty(0, dtype=np.int64)
+        return {'cancha': vacio, 'dia': vacio, 'ini': vacio, 'fin': vacio, 'anulada': vacio.astype(bool)}
+
+    canchas, fechas, ini, fin, estados = zip(*filas)
+    ini = np.array(ini, dtype=np.int64)
+    fin = np.array(fin, dtype=np.int64)
+    return {
+        'cancha': np.array(canchas, dtype=np.int64),
+        'dia': np.array(fechas, dtype='datetime64[D]').astype(np.int64),
+        'ini': ini,
+        # Una reserva que termina a medianoche (00:00) ocupa hasta el final del día
+        'fin': np.where(fin <= ini, 24 * 60, fin),
+        'anulada': np.array(estados) == 'ANULADA',
+    }
+
+
+def calcular_reporte(desde, hasta):
+    canchas = list(Cancha.objects.order_by('id').values_list('id', 'nombre', 'deporte'))
+    ids = np.array([c[0] for c in canchas], dtype=np.int64)
+    datos = cargar_reservas(desde, hasta)
+
+    n_canchas = len(canchas)
+    idx = np.searchsorted(ids, datos['cancha'])
+    vigente = ~datos['anulada']
+    primer_dia = np.datetime64(desde, 'D').astype(np.int64)
+    n_dias = (hasta - desde).days + 1
+
+    # Total y anuladas por cancha
+    total = np.bincount(idx, minlength=n_canchas)
+    anuladas = np.bincount(idx, weights=datos['anulada'], minlength=n_canchas)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tasa_anulacion = np.where(total > 0, anuladas / total, 0.0)
+
+    # Mapa de ocupación: horas del día que cubre cada reserva vigente
+    horas = np.arange(24) * 60
+    cubre = (horas < datos['fin'][:, None]) & (horas + 60 > datos['ini'][:, None]) & vigente[:, None]
+    dia_semana = _dia_semana(datos['dia'])
+    conteo = np.zeros((n_canchas, 7, 24), dtype=np.int64)
+    np.add.at(conteo, (idx, dia_semana), cubre.astype(np.int64))
+    # Cuántas veces aparece cada día de la semana en el rango
+    ocurrencias = np.bincount(_dia_semana(primer_dia + np.arange(n_dias)), minlength=7)
+    ocupacion = conteo / np.maximum(ocurrencias, 1)[None, :, None]
+
+    # Demanda diaria en horas por cancha
+    duracion = np.where(vigente, (datos['fin'] - datos['ini']) / 60, 0.0)
+    diario = np.zeros((n_canchas, n_dias))
+    np.add.at(diario, (idx, datos['dia'] - primer_dia), duracion)
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'dias': DIAS,
+        'canchas': [
+            {
+                'id': cancha_id,
+                'nombre': nombre,
+                'deporte': deporte,
+                'reservas': int(total[i]),
+                'anuladas': int(anuladas[i]),
+                'tasa_anulacion': round(float(tasa_anulacion[i]), 4),
+                'horas_reservadas': round(float(diario[i].sum()), 2),
+                'ocupacion': np.round(ocupacion[i], 3).tolist(),
+                'pronostico': pronosticar(diario[i], hasta),
+            }
+            for i, (cancha_id, nombre, deporte) in enumerate(canchas)
+        ],
+    }
+
+
+def pronosticar(diario, hasta):
+    """
+    Pronóstico estacional semanal de horas reservadas para los 7 días
+    siguientes a `hasta`: promedio ponderado del mismo día de la semana en
+    las últimas SEMANAS_PRONOSTICO semanas.
+    """
+    semanas = min(SEMANAS_PRONOSTICO, len(diario) // 7)
+    if semanas == 0:
+        return []
+    # Fila k = semana k (la última es la más reciente); columna j = día
+    # `hasta - 6 + j`, el mismo día de la semana que `hasta + 1 + j`
+    historia = diario[len(diario) - semanas * 7:].reshape(semanas, 7)
+    pesos = DECAIMIENTO ** np.arange(semanas - 1, -1, -1)
+    estimado = pesos @ historia / pesos.sum()
+    return [
+        {'fecha': hasta + timedelta(days=j + 1), 'horas': round(float(horas), 2)}
+        for j, horas in enumerate(estimado)
+    ]
+
+
+def reporte_demanda(desde, hasta):
+    """
+    Reporte cacheado. La clave incluye la fecha actual: los datos de días
+    pasados casi no cambian, así que se recalcula una vez por día (y expira
+    a medianoche).
+    """
+    hoy = timezone.localdate()
+    clave = f'analitica:demanda:{desde}:{hasta}:{hoy}'
+    reporte = cache.get(clave)
+    if reporte is None:
+        reporte = calcular_reporte(desde, hasta)
+        manana = timezone.make_aware(datetime.combine(hoy + timedelta(days=1), time.min))
+        cache.set(clave, reporte, max(int((manana - timezone.now()).total_seconds()), 60))
+    return reporte
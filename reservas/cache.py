@@ -0,0 +1,158 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+
+# Versión global: cualquier cambio en reservas o pagos la incrementa.
+# Los trabajadores/administradores ven datos de todos los clientes, así que
+# sus respuestas cacheadas dependen de esta versión y no de la suya propia.
+VERSION_GLOBAL_RESERVAS = 'reservas:global'
+# Catálogo público de canchas
+VERSION_CANCHAS = 'canchas'
+# Trabajadores y administradores (aparecen como atendido_por/verificado_por
+# en las reservas y pagos de los clientes)
+VERSION_PERSONAL = 'personal'
+
+# Versiones ya leídas en el request actual (solo dentro de memo_versiones)
+_memo = ContextVar('memo_versiones', default=None)
+
+
+def _clave_version(alcance):
+    return f'ver:{alcance}'
+
+
+@contextmanager
+def memo_versiones():
+    """
+    Dentro del bloque cada versión se consulta a la cache una sola vez
+    (p. ej. las subsolicitudes de /lote/ comparten la versión del usuario).
+    """
+    token = _memo.set({})
+    try:
+        yield
+    finally:
+        _memo.reset(token)
+
+
+def obtener_version(alcance):
+    memo = _memo.get()
+    if memo is not None and alcance in memo:
+        return memo[alcance]
+    # Si la clave no existe (o fue desalojada) se inicializa con un valor
+    # nuevo, así nunca se reutiliza una versión antigua que pudiera seguir en cache.
+    version = cache.get_or_set(_clave_version(alcance), time.time_ns, None)
+    if memo is not None:
+        memo[alcance] = version
+    return version
+
+
+def incrementar_version(alcance):
+    memo = _memo.get()
+    if memo is not None:
+        memo.pop(alcance, None)
+    clave = _clave_version(alcance)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, time.time_ns(), None)
+
+
+def version_usuario(user_id):
+    return obtener_version(f'usuario:{user_id}')
+
+
+def invalidar_usuarios(user_ids, global_reservas=True):
+    """
+    Invalida las respuestas cacheadas de los usuarios indicados cuando la
+    transacción en curso se confirma (antes de eso otro request podría
+    cachear datos viejos con la versión nueva).
+    """
+    ids = {uid for uid in user_ids if uid is not None}
+
+    def _invalidar():
+        for uid in ids:
+            incrementar_version(f'usuario:{uid}')
+        if global_reservas:
+            incrementar_version(VERSION_GLOBAL_RESERVAS)
+
+    transaction.on_commit(_invalidar)
+
+
+def version_cancha(cancha_id):
+    # Reservas de una cancha (feed iCalendar de la cancha)
+    return obtener_version(f'cancha:{cancha_id}')
+
+
+def invalidar_agenda_canchas(cancha_ids):
+    ids = {cid for cid in cancha_ids if cid is not None}
+
+    def _invalidar():
+        for cid in ids:
+            incrementar_version(f'cancha:{cid}')
+
+    transaction.on_commit(_invalidar)
+
+
+def invalidar_canchas():
+    transaction.on_commit(lambda: incrementar_version(VERSION_CANCHAS))
+
+
+def invalidar_personal():
+    transaction.on_commit(lambda: incrementar_version(VERSION_PERSONAL))
+
+
+def etag_coincide(request, etag):
+    # Comparación débil: W/"x" y "x" se consideran iguales
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    candidatos = parse_etags(if_none_match)
+    if '*' in candidatos:
+        return True
+    etag = etag.removeprefix('W/')
+    return any(c.removeprefix('W/') == etag for c in candidatos)
+
+
+class CachePorUsuarioMixin:
+    """
+    Cachea la respuesta del GET por usuario. La clave incluye la versión de
+    datos del usuario (o la global para trabajadores/administradores), de modo
+    que una llamada repetida no toca la base de datos ni el serializer.
+    """
+    cache_alcance = None
+    cache_timeout = 300
+    # Si es False, la respuesta solo depende de los datos del propio usuario
+    cache_global_para_staff = True
+    # Otras versiones de las que depende la respuesta (p. ej. VERSION_CANCHAS
+    # si incluye los datos de la cancha)
+    cache_dependencias = ()
+
+    def clave_cache(self, request):
+        user = request.user
+        if self.cache_global_para_staff and user.rol != 'cliente':
+            versiones = [obtener_version(VERSION_GLOBAL_RESERVAS)]
+        else:
+            versiones = [version_usuario(user.pk)]
+        versiones += [obtener_version(alcance) for alcance in self.cache_dependencias]
+        version = '-'.join(map(str, versiones))
+        consulta = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+        return f'resp:{self.cache_alcance}:{user.pk}:{version}:{consulta}'
+
+    def get(self, request, *args, **kwargs):
+        # Import diferido: este módulo se carga desde las señales en
+        # AppConfig.ready(), también en comandos que no usan DRF
+        from rest_framework.response import Response
+
+        clave = self.clave_cache(request)
+        data = cache.get(clave)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(clave, response.data, self.cache_timeout)
+        return response
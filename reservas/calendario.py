@@ -0,0 +1,187 @@
+"""
+Feeds iCalendar (.ics) por cliente y por cancha. El enlace lleva un token
+firmado en lugar del JWT, para que las apps de calendario puedan
+suscribirse. El token incluye calendario_version del usuario o la cancha:
+al incrementarla (POST /calendario/enlace/) los enlaces anteriores dejan de
+funcionar. El cuerpo se cachea por versión de datos (la del usuario o la de
+la cancha), así que las consultas periódicas de los calendarios se
+responden con 304 sin tocar la base.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from .cache import VERSION_CANCHAS, obtener_version, version_cancha, version_usuario
+from .models import Cancha, Reserva, Usuario
+
+SALT = 'reservas.calendario'
+# Reservas pasadas que se siguen publicando
+DIAS_HISTORIA = 30
+ESTADO_ICS = {
+    'PENDIENTE_APROBACION': 'TENTATIVE',
+    'APROBADA': 'CONFIRMED',
+    'PAGO_COMPLETO': 'CONFIRMED',
+    'ANULADA': 'CANCELLED',
+}
+
+
+def token_feed(tipo, objeto_id, version):
+    return signing.dumps({'t': tipo, 'id': objeto_id, 'v': version}, salt=SALT)
+
+
+def leer_token(token):
+    """Devuelve (tipo, id, versión del enlace) o lanza signing.BadSignature."""
+    datos = signing.loads(token, salt=SALT)
+    if datos.get('t') not in ('cliente', 'cancha'):
+        raise signing.BadSignature("Tipo de feed inválido")
+    return datos['t'], int(datos['id']), int(datos['v'])
+
+
+def version_feed(tipo, objeto_id):
+    if tipo == 'cliente':
+        # El feed del cliente muestra el nombre de cada cancha
+        return f'{version_usuario(objeto_id)}-{obtener_version(VERSION_CANCHAS)}'
+    return version_cancha(objeto_id)
+
+
+# ----------------- FORMATO -----------------
+class ICalendarRenderer(BaseRenderer):
+    """Las vistas de feed entregan el .ics ya armado como texto."""
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data.encode(self.charset) if isinstance(data, str) else b''
+
+
+def _escapar(texto):
+    return (
+        str(texto).replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _plegar(linea):
+    # RFC 5545: líneas de máximo 75 octetos, las siguientes empiezan con espacio
+    datos = linea.encode()
+    if len(datos) <= 75:
+        return linea
+    partes, actual = [], b''
+    for caracter in linea:
+        codificado = caracter.encode()
+        if len(actual) + len(codificado) > (75 if not partes else 74):
+            partes.append(actual.decode())
+            actual = b''
+        actual += codificado
+    partes.append(actual.decode())
+    return '\r\n '.join(partes)
+
+
+def _utc(momento):
+    return momento.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _evento(reserva_id, fecha, hora_inicio, hora_fin, estado, actualizado, resumen, descripcion):
+    inicio = timezone.make_aware(datetime.combine(fecha, hora_inicio))
+    fin = timezone.make_aware(datetime.combine(fecha, hora_fin))
+    if fin <= inicio:
+        fin += timedelta(days=1)
+    return [
+        'BEGIN:VEVENT',
+        f'UID:reserva-{reserva_id}@sisreservas',
+        f'DTSTAMP:{_utc(actualizado)}',
+        f'LAST-MODIFIED:{_utc(actualizado)}',
+        f'DTSTART:{_utc(inicio)}',
+        f'DTEND:{_utc(fin)}',
+        f'SUMMARY:{_escapar(resumen)}',
+        f'DESCRIPTION:{_escapar(descripcion)}',
+        f'STATUS:{ESTADO_ICS[estado]}',
+        'END:VEVENT',
+    ]
+
+
+def _calendario(nombre, eventos):
+    lineas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//sisreservas//reservas//ES',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escapar(nombre)}',
+    ]
+    for evento in eventos:
+        lineas.extend(evento)
+    lineas.append('END:VCALENDAR')
+    return ''.join(_plegar(linea) + '\r\n' for linea in lineas)
+
+
+# ----------------- GENERACIÓN -----------------
+def _construir(tipo, objeto_id, version_enlace):
+    """
+    Una sola consulta de proyección (values_list con los datos de la cancha
+    o del cliente por JOIN). Devuelve (cuerpo, última modificación) o None
+    si el objeto ya no existe, está desactivado o el enlace fue revocado.
+    """
+    desde = timezone.localdate() - timedelta(days=DIAS_HISTORIA)
+    reservas = Reserva.objects.filter(fecha_reserva__gte=desde).order_by('fecha_reserva', 'hora_inicio')
+    campos = ['id', 'fecha_reserva', 'hora_inicio', 'hora_fin', 'estado', 'actualizado']
+
+    if tipo == 'cliente':
+        usuario = (
+            Usuario.objects.filter(pk=objeto_id, is_active=True, calendario_version=version_enlace)
+            .values_list('username', flat=True).first()
+        )
+        if usuario is None:
+            return None
+        nombre = f"Mis reservas ({usuario})"
+        filas = list(reservas.filter(cliente_id=objeto_id).values_list(*campos, 'cancha__nombre'))
+        eventos = [
+            _evento(*fila[:6], f"Reserva {fila[6]}", f"Estado: {fila[4]}")
+            for fila in filas
+        ]
+    else:
+        cancha = (
+            Cancha.objects.filter(pk=objeto_id, calendario_version=version_enlace)
+            .values_list('nombre', flat=True).first()
+        )
+        if cancha is None:
+            return None
+        nombre = f"Agenda {cancha}"
+        # Sin datos de contacto: el enlace no caduca y puede circular
+        filas = list(reservas.filter(cancha_id=objeto_id).values_list(
+            *campos, 'cliente__first_name', 'cliente__last_name', 'cliente__username',
+        ))
+        eventos = [
+            _evento(
+                *fila[:6],
+                f"{cancha}: {' '.join(filter(None, fila[6:8])) or fila[8]}",
+                f"Estado: {fila[4]}",
+            )
+            for fila in filas
+        ]
+
+    # Last-Modified: la reserva modificada más recientemente (None si no hay).
+    # Las eliminaciones no lo mueven; para eso está el ETag por versión.
+    ultima = max((fila[5] for fila in filas), default=None)
+    return _calendario(nombre, eventos), ultima
+
+
+def feed(tipo, objeto_id, version_enlace):
+    """
+    Devuelve (cuerpo, etag, última modificación) usando la cache por
+    versión, o None si el feed ya no existe o el enlace fue revocado.
+    """
+    version = f'{version_enlace}-{version_feed(tipo, objeto_id)}'
+    clave = f'ics:{tipo}:{objeto_id}:{version}'
+    contenido = cache.get(clave)
+    if contenido is None:
+        contenido = _construir(tipo, objeto_id, version_enlace) or ()
+        cache.set(clave, contenido, 3600)
+    if not contenido:
+        return None
+    cuerpo, ultima = contenido
+    # Débil: el mismo con o sin compresión (ver CanchaListCreateView.list)
+    return cuerpo, f'W/"ics-{tipo}-{objeto_id}-{version}"', ultima
@@ -0,0 +1,152 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CursorConsumidor, EventoCambio, Reserva
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------- ESCRITURA -----------------
+def evento_reserva(reserva, accion):
+    return EventoCambio(
+        entidad='reserva',
+        objeto_id=reserva.pk,
+        accion=accion,
+        cliente_id=reserva.cliente_id,
+        datos={
+            'estado': reserva.estado,
+            'cancha_id': reserva.cancha_id,
+            'fecha_reserva': reserva.fecha_reserva,
+            'hora_inicio': reserva.hora_inicio,
+            'hora_fin': reserva.hora_fin,
+            'monto_pagado': reserva.monto_pagado,
+            'saldo': reserva.saldo,
+        },
+    )
+
+
+def evento_pago(pago, accion, cliente_id):
+    return EventoCambio(
+        entidad='pago',
+        objeto_id=pago.pk,
+        accion=accion,
+        cliente_id=cliente_id,
+        datos={
+            'reserva_id': pago.reserva_id,
+            'monto': pago.monto,
+            'estado_pago': pago.estado_pago,
+        },
+    )
+
+
+def registrar_eventos(eventos):
+    """Inserta los eventos en lote; debe llamarse dentro de la transacción del cambio."""
+    eventos = EventoCambio.objects.bulk_create(eventos, batch_size=500)
+    if eventos:
+        primero = min(evento.creado for evento in eventos)
+        transaction.on_commit(lambda: _verificar_confirmacion(primero, eventos[0].pk))
+    return eventos
+
+
+def _verificar_confirmacion(creado, evento_id):
+    # Ver marca_de_agua: pasado el margen, un hueco se da por cerrado
+    demora = (timezone.now() - creado).total_seconds()
+    if demora > settings.EVENTOS_MARGEN_SEGUNDOS:
+        logger.error(
+            "Eventos desde #%s confirmados %.1fs después de crearse (margen %ss): "
+            "los consumidores pudieron saltarlos", evento_id, demora, settings.EVENTOS_MARGEN_SEGUNDOS,
+        )
+
+
+def registrar_reservas_actualizadas(reserva_ids):
+    # Para cambios hechos con update()/bulk_update, que no disparan señales
+    reservas = Reserva.objects.filter(id__in=set(reserva_ids)).order_by('id')
+    return registrar_eventos([evento_reserva(r, 'actualizado') for r in reservas])
+
+
+def registrar_pagos_actualizados(pagos, clientes_por_reserva):
+    return registrar_eventos([
+        evento_pago(p, 'actualizado', clientes_por_reserva.get(p.reserva_id)) for p in pagos
+    ])
+
+
+# ----------------- LECTURA -----------------
+def marca_de_agua(despues_de=0):
+    """
+    Mayor id hasta el que el registro no tiene huecos pendientes.
+
+    Los ids se asignan al insertar, pero las filas se ven recién al
+    confirmar: un hueco entre ids puede ser una transacción en curso (su
+    evento aparecerá después) o una revertida (no aparecerá nunca). La
+    lectura se detiene antes del primer hueco hasta que el evento que lo
+    sigue tiene más de EVENTOS_MARGEN_SEGUNDOS; desde ahí el hueco se da
+    por revertido. Sin huecos los eventos se entregan de inmediato.
+
+    Garantía: no se salta ningún evento cuya transacción confirme dentro
+    de EVENTOS_MARGEN_SEGUNDOS desde que se creó. Si una tarda más, se
+    registra un error al confirmar (ver registrar_eventos).
+    """
+    limite_creado = timezone.now() - timedelta(seconds=settings.EVENTOS_MARGEN_SEGUNDOS)
+    # Hasta el último evento con más antigüedad que el margen, todo está cerrado
+    base = (
+        EventoCambio.objects.filter(id__gt=despues_de, creado__lte=limite_creado)
+        .order_by('-id').values_list('id', flat=True).first()
+    ) or despues_de
+    # Los recientes (pocos: los del margen) solo mientras los ids sean consecutivos
+    for evento_id in EventoCambio.objects.filter(id__gt=base).order_by('id').values_list('id', flat=True):
+        if evento_id != base + 1:
+            break
+        base = evento_id
+    return base
+
+
+def leer_eventos(despues_de=0, limite=500, entidad=None, cliente_id=None):
+    """Eventos con id > despues_de y hasta la marca de agua, en orden."""
+    eventos = EventoCambio.objects.filter(id__gt=despues_de, id__lte=marca_de_agua(despues_de))
+    if entidad:
+        eventos = eventos.filter(entidad=entidad)
+    if cliente_id is not None:
+        eventos = eventos.filter(cliente_id=cliente_id)
+    return list(eventos.order_by('id')[:limite])
+
+
+class Consumidor:
+    """
+    Lee el registro de cambios desde un cursor guardado en la base.
+
+        Consumidor('reportes').procesar(lambda eventos: ...)
+
+    El manejador recibe cada lote en orden; el cursor avanza en la misma
+    transacción, así que si el manejador falla el lote se vuelve a entregar.
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def posicion(self):
+        return CursorConsumidor.objects.filter(nombre=self.nombre).values_list('ultimo_id', flat=True).first() or 0
+
+    def procesar(self, manejador, limite=500):
+        with transaction.atomic():
+            cursor, _ = CursorConsumidor.objects.select_for_update().get_or_create(nombre=self.nombre)
+            eventos = leer_eventos(cursor.ultimo_id, limite)
+            if eventos:
+                manejador(eventos)
+                cursor.ultimo_id = eventos[-1].id
+                cursor.save(update_fields=['ultimo_id', 'actualizado'])
+            return len(eventos)
+
+    def procesar_todo(self, manejador, limite=500):
+        total = 0
+        while True:
+            procesados = self.procesar(manejador, limite)
+            total += procesados
+            if procesados < limite:
+                return total
+
+    def reiniciar(self, ultimo_id=0):
+        CursorConsumidor.objects.update_or_create(nombre=self.nombre, defaults={'ultimo_id': ultimo_id})
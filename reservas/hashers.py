@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2AjustableHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 con la cantidad de iteraciones de PASSWORD_PBKDF2_ITERATIONS.
+    Usa el mismo nombre de algoritmo que el hasher de Django, así los hashes
+    existentes siguen siendo válidos y se recalculan al iniciar sesión
+    cuando el costo configurado cambia.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import ClaveIdempotencia
+
+
+def huella_solicitud(request):
+    if hasattr(request.data, 'getlist'):
+        datos = {k: [str(v) for v in request.data.getlist(k)] for k in request.data}
+    else:
+        datos = request.data
+    contenido = json.dumps([request.path, datos], sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def idempotente(metodo):
+    """
+    Soporte para la cabecera Idempotency-Key en un POST. La primera solicitud
+    con una clave se ejecuta dentro de una transacción junto con el registro
+    de la clave; los reintentos devuelven la respuesta almacenada sin volver
+    a validar ni crear nada. Solo se almacenan respuestas 2xx.
+    """
+
+    @functools.wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        clave = request.headers.get('Idempotency-Key')
+        if not clave or not request.user.is_authenticated:
+            return metodo(self, request, *args, **kwargs)
+
+        if len(clave) > 255:
+            return Response({"error": "Idempotency-Key demasiado larga."}, status=status.HTTP_400_BAD_REQUEST)
+
+        huella = huella_solicitud(request)
+        ahora = timezone.now()
+        previa = ClaveIdempotencia.objects.filter(usuario=request.user, clave=clave).first()
+        if previa and previa.expira > ahora:
+            return repetir_respuesta(previa, huella)
+
+        with transaction.atomic():
+            if previa:
+                previa.delete()
+            try:
+                with transaction.atomic():
+                    registro = ClaveIdempotencia.objects.create(
+                        usuario=request.user,
+                        clave=clave,
+                        ruta=request.path[:255],
+                        huella=huella,
+                        codigo_estado=0,
+                        expira=ahora + settings.IDEMPOTENCIA_TTL,
+                    )
+            except IntegrityError:
+                # Otra solicitud con la misma clave terminó mientras tanto
+                registro = None
+
+            if registro is not None:
+                response = metodo(self, request, *args, **kwargs)
+                if not status.is_success(response.status_code):
+                    transaction.set_rollback(True)
+                    return response
+                registro.codigo_estado = response.status_code
+                registro.respuesta = response.data
+                registro.save(update_fields=['codigo_estado', 'respuesta'])
+                return response
+
+        previa = ClaveIdempotencia.objects.get(usuario=request.user, clave=clave)
+        return repetir_respuesta(previa, huella)
+
+    return envoltura
+
+
+def repetir_respuesta(registro, huella):
+    if registro.huella != huella:
+        return Response(
+            {"error": "La Idempotency-Key ya fue usada con otros datos."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(registro.respuesta, status=registro.codigo_estado)
+    response['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,174 @@
+import codecs
+import csv
+import re
+import secrets
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import IntegrityError, transaction
+
+from .models import Usuario
+
+# Nombres de columna aceptados (en minúsculas) para cada campo
+COLUMNAS = {
+    'first_name': ('nombre', 'nombres', 'first_name'),
+    'last_name': ('apellido', 'apellidos', 'last_name'),
+    'dni': ('dni',),
+    'celular': ('celular', 'telefono', 'teléfono'),
+}
+MAX_ERRORES = 1000
+
+
+def _normalizar_celular(valor):
+    return re.sub(r'[\s\-+().]', '', valor)
+
+
+def contrasena_inutilizable():
+    # Equivale a make_password(None) (misma forma "!" + 40 caracteres
+    # aleatorios) pero con secrets.token_urlsafe, que es ~20 veces más rápido
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(30)
+
+
+def leer_csv(lineas):
+    """
+    Lee el CSV línea por línea (sin cargarlo completo) y devuelve pares
+    (número de línea, fila). Acepta ',' o ';' como separador, como exportan
+    las hojas de cálculo.
+    """
+    lineas = iter(lineas)
+    cabecera = next(lineas, '')
+    separador = ';' if cabecera.count(';') > cabecera.count(',') else ','
+    columnas = [c.strip().lower() for c in next(csv.reader([cabecera], delimiter=separador), [])]
+    indices = {}
+    for campo, alias in COLUMNAS.items():
+        for nombre in alias:
+            if nombre in columnas:
+                indices[campo] = columnas.index(nombre)
+                break
+    lector = csv.reader(lineas, delimiter=separador)
+    for fila in lector:
+        if any(valor.strip() for valor in fila):
+            # +1 por la cabecera, que se leyó aparte
+            yield lector.line_num + 1, {
+                campo: fila[i].strip() if i < len(fila) else ''
+                for campo, i in indices.items()
+            }
+
+
+def linea_no_utf8(archivo):
+    """
+    Recorre el archivo binario antes de importar (sin cargarlo completo) y
+    devuelve el número de la primera línea que no es UTF-8 válido, o None.
+    Deja el archivo al inicio.
+    """
+    decodificador = codecs.getincrementaldecoder('utf-8-sig')()
+    numero = 0
+    try:
+        for numero, linea in enumerate(archivo, 1):
+            decodificador.decode(linea)
+        decodificador.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return max(numero, 1)
+    finally:
+        archivo.seek(0)
+    return None
+
+
+def leer_archivo_subido(archivo):
+    """Adapta un UploadedFile (bytes por líneas) al lector CSV."""
+    return leer_csv(codecs.iterdecode(archivo, 'utf-8-sig'))
+
+
+def importar_clientes(filas, lote=1000, simular=False):
+    """
+    Crea clientes en lote. dni, celular y username se validan contra
+    conjuntos cargados con una sola consulta (y contra el propio archivo);
+    las contraseñas quedan inutilizables (sin hash) hasta que el cliente
+    defina la suya. Devuelve el reporte por fila.
+    """
+    usernames, dnis, celulares = set(), set(), set()
+    for username, dni, celular in Usuario.objects.values_list('username', 'dni', 'celular').iterator(chunk_size=5000):
+        usernames.add(username)
+        if dni:
+            dnis.add(dni)
+        if celular:
+            celulares.add(_normalizar_celular(celular))
+
+    reporte = {'filas': 0, 'creados': 0, 'total_errores': 0, 'errores': []}
+
+    def error(numero, mensajes):
+        reporte['total_errores'] += 1
+        if len(reporte['errores']) < MAX_ERRORES:
+            reporte['errores'].append({'fila': numero, 'errores': mensajes})
+
+    pendientes = []
+    for numero, fila in filas:
+        reporte['filas'] += 1
+        dni = fila.get('dni', '')
+        celular = _normalizar_celular(fila.get('celular', ''))
+        nombre = fila.get('first_name', '')
+        mensajes = []
+
+        if not nombre:
+            mensajes.append("Falta el nombre.")
+        elif len(nombre) > 150 or len(fila.get('last_name', '')) > 150:
+            mensajes.append("Nombre demasiado largo.")
+        if not dni and not celular:
+            mensajes.append("Se requiere dni o celular.")
+        if dni and not re.fullmatch(r'\d{8}', dni):
+            mensajes.append("DNI inválido (8 dígitos).")
+        elif dni in dnis:
+            mensajes.append("DNI ya registrado.")
+        if celular and not re.fullmatch(r'\d{6,15}', celular):
+            mensajes.append("Celular inválido.")
+        elif celular in celulares:
+            mensajes.append("Celular ya registrado.")
+
+        username = dni or f'cel{celular}'
+        if not mensajes and username in usernames:
+            mensajes.append(f"El usuario {username} ya existe.")
+        if mensajes:
+            error(numero, mensajes)
+            continue
+
+        usernames.add(username)
+        if dni:
+            dnis.add(dni)
+        if celular:
+            celulares.add(celular)
+        pendientes.append((numero, Usuario(
+            username=username,
+            first_name=nombre,
+            last_name=fila.get('last_name', ''),
+            dni=dni or None,
+            celular=celular or None,
+            rol='cliente',
+            password=contrasena_inutilizable(),
+        )))
+        if len(pendientes) >= lote:
+            reporte['creados'] += _guardar(pendientes, error, simular)
+            pendientes = []
+
+    if pendientes:
+        reporte['creados'] += _guardar(pendientes, error, simular)
+    return reporte
+
+
+def _guardar(pendientes, error, simular):
+    if simular:
+        return len(pendientes)
+    try:
+        with transaction.atomic():
+            Usuario.objects.bulk_create([usuario for _, usuario in pendientes])
+        return len(pendientes)
+    except IntegrityError:
+        pass
+    # Alguien creó un usuario igual mientras se importaba: fila por fila
+    creados = 0
+    for numero, usuario in pendientes:
+        try:
+            with transaction.atomic():
+                usuario.save(force_insert=True)
+            creados += 1
+        except IntegrityError:
+            error(numero, ["DNI o usuario ya registrado."])
+    return creados
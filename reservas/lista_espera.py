@@ -0,0 +1,62 @@
+from django.db import transaction
+
+from .models import ListaEspera, Reserva
+
+ESTADOS_ACTIVOS = ['PENDIENTE_APROBACION', 'APROBADA', 'PAGO_COMPLETO']
+
+
+def horario_ocupado(cancha_id, fecha, hora_inicio, hora_fin):
+    return Reserva.objects.filter(
+        cancha_id=cancha_id,
+        fecha_reserva=fecha,
+        estado__in=ESTADOS_ACTIVOS,
+    ).exclude(
+        hora_fin__lte=hora_inicio
+    ).exclude(
+        hora_inicio__gte=hora_fin
+    ).exists()
+
+
+def promover_lista_espera(reserva):
+    """
+    Se llama cuando una reserva pasa a ANULADA. Busca (por índice) las
+    solicitudes en espera de la misma cancha y fecha que se solapan con el
+    horario liberado y, por orden de llegada, convierte en reserva
+    PENDIENTE_APROBACION cada una que ahora entre sin solaparse.
+    """
+    promovidas = []
+    with transaction.atomic():
+        candidatas = (
+            # of=self: bloquear solo las solicitudes, no la cancha del JOIN
+            # (si no, anulaciones simultáneas en la misma cancha se saltarían
+            # las candidatas de la otra y las ediciones de la cancha esperarían)
+            ListaEspera.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('cancha')
+            .filter(
+                cancha_id=reserva.cancha_id,
+                fecha=reserva.fecha_reserva,
+                estado='ESPERANDO',
+                hora_inicio__lt=reserva.hora_fin,
+                hora_fin__gt=reserva.hora_inicio,
+            )
+            .order_by('creado', 'id')
+        )
+        for espera in candidatas:
+            if horario_ocupado(espera.cancha_id, espera.fecha, espera.hora_inicio, espera.hora_fin):
+                continue
+
+            cancha = espera.cancha
+            nueva = Reserva.objects.create(
+                cancha=cancha,
+                cliente_id=espera.cliente_id,
+                fecha_reserva=espera.fecha,
+                hora_inicio=espera.hora_inicio,
+                hora_fin=espera.hora_fin,
+                monto_total=cancha.tarifa(espera.hora_inicio),
+                estado='PENDIENTE_APROBACION',
+            )
+            espera.estado = 'PROMOVIDA'
+            espera.reserva = nueva
+            espera.save(update_fields=['estado', 'reserva'])
+            promovidas.append(nueva)
+    return promovidas
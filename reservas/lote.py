@@ -0,0 +1,76 @@
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from .cache import memo_versiones
+
+# Vistas de solo lectura que se pueden pedir dentro de /lote/ (por nombre de URL)
+VISTAS_PERMITIDAS = {
+    'perfil',
+    'canchas-list-create',
+    'canchas-detail',
+    'canchas-disponibilidad',
+    'reservas-list-create',
+    'reservas-mis',
+    'reservas-con-saldo',
+    'reservas-detail',
+    'lista-espera-list-create',
+    'agenda',
+    'sync',
+    'pagos-list-create',
+    'pagos-detail',
+}
+# Cabeceras del request original que no aplican a las subsolicitudes
+_CABECERAS_EXCLUIDAS = {
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+}
+
+
+def subsolicitud(request, ruta, etag=None):
+    """
+    Arma un GET interno para `ruta` reutilizando el usuario ya autenticado
+    (DRF no vuelve a decodificar el JWT ni a buscar el usuario).
+    """
+    partes = urlsplit(ruta)
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = partes.path
+    sub.META = {k: v for k, v in request.META.items() if k not in _CABECERAS_EXCLUIDAS}
+    sub.META.update(REQUEST_METHOD='GET', PATH_INFO=partes.path, QUERY_STRING=partes.query)
+    if etag:
+        sub.META['HTTP_IF_NONE_MATCH'] = etag
+    sub.GET = QueryDict(partes.query)
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def ejecutar_lote(request, solicitudes):
+    """
+    Ejecuta las subsolicitudes en orden, en el mismo hilo (misma conexión a
+    la base) y con las versiones de cache memorizadas para todo el lote.
+    """
+    resultados = []
+    with memo_versiones():
+        for i, solicitud in enumerate(solicitudes):
+            ruta = solicitud['ruta']
+            resultado = {'id': solicitud.get('id') or str(i), 'ruta': ruta}
+            try:
+                match = resolve(urlsplit(ruta).path)
+            except Resolver404:
+                match = None
+            if match is None or match.url_name not in VISTAS_PERMITIDAS:
+                resultado.update(status=404, datos={"error": "Ruta no disponible en /lote/."})
+                resultados.append(resultado)
+                continue
+
+            sub = subsolicitud(request, ruta, solicitud.get('etag'))
+            sub.resolver_match = match
+            response = match.func(sub, *match.args, **match.kwargs)
+            resultado['status'] = response.status_code
+            if response.has_header('ETag'):
+                resultado['etag'] = response['ETag']
+            resultado['datos'] = getattr(response, 'data', None)
+            resultados.append(resultado)
+    return resultados
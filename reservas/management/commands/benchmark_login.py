@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from reservas.models import Usuario
+from reservas.ultimo_login import volcar
+from reservas.views import MyTokenObtainPairView
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el throughput de /api/login/ (hash de contraseña + emisión de tokens) "
+        "para uno o varios costos de PBKDF2. No deja datos en la base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+        parser.add_argument(
+            '--iteraciones', default=None,
+            help="Costos de PBKDF2 a comparar separados por coma (por defecto el configurado)."
+        )
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        costos = (
+            [int(c) for c in options['iteraciones'].split(',')]
+            if options['iteraciones'] else [settings.PASSWORD_PBKDF2_ITERATIONS]
+        )
+        factory = APIRequestFactory()
+        vista = MyTokenObtainPairView.as_view(throttle_classes=[])
+
+        for costo in costos:
+            with override_settings(PASSWORD_PBKDF2_ITERATIONS=costo), transaction.atomic():
+                usuario = Usuario.objects.create_user('benchmark_login', password='clave-benchmark')
+
+                inicio = time.perf_counter()
+                for _ in range(options['logins']):
+                    usuario.check_password('clave-benchmark')
+                solo_hash = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                for _ in range(options['logins']):
+                    request = factory.post(
+                        '/api/login/', {'username': 'benchmark_login', 'password': 'clave-benchmark'}, format='json'
+                    )
+                    response = vista(request)
+                    assert response.status_code == 200, response.data
+                completo = time.perf_counter() - inicio
+                volcar()
+
+                transaction.set_rollback(True)
+
+            n = options['logins']
+            self.stdout.write(
+                f"iteraciones={costo}: hash {solo_hash / n * 1000:.1f} ms/login, "
+                f"login completo {completo / n * 1000:.1f} ms/login ({n / completo:.1f} logins/s por worker)"
+            )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservas.notificaciones import despachar_lote, obtener_proveedor
+
+
+class Command(BaseCommand):
+    help = "Proceso despachador del outbox de notificaciones (recordatorios y pagos confirmados)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50)
+        parser.add_argument('--intervalo', type=float, default=5.0, help="Segundos de espera cuando no hay mensajes.")
+        parser.add_argument('--una-vez', action='store_true', help="Despacha lo pendiente y termina.")
+
+    def handle(self, *args, **options):
+        proveedor = obtener_proveedor()
+        total = 0
+        while True:
+            enviados = despachar_lote(proveedor, options['lote'])
+            total += enviados
+            if enviados < options['lote']:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        self.stdout.write(self.style.SUCCESS(f"Mensajes procesados: {total}"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from reservas.purgas import ejecutar_purga, reclamar_trabajo
+
+
+class Command(BaseCommand):
+    help = "Ejecuta las purgas encoladas (DELETE ...?purgar=1) eliminando por lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500)
+        parser.add_argument('--pausa', type=float, default=0.0, help="Segundos de espera entre lotes.")
+        parser.add_argument('--reanudar', action='store_true', help="Retoma también los trabajos EN_CURSO (tras una interrupción).")
+
+    def handle(self, *args, **options):
+        while True:
+            trabajo = reclamar_trabajo(options['reanudar'])
+            if trabajo is None:
+                break
+            self.stdout.write(f"{trabajo}: {trabajo.total} filas estimadas")
+            ejecutar_purga(trabajo, options['lote'], options['pausa'])
+            self.stdout.write(self.style.SUCCESS(f"  eliminadas {trabajo.eliminados}"))
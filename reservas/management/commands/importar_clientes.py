@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.importacion import importar_clientes, leer_csv, linea_no_utf8
+
+
+class Command(BaseCommand):
+    help = "Importa clientes desde un CSV (nombre, apellido, dni, celular)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--lote', type=int, default=1000)
+        parser.add_argument('--simular', action='store_true', help="Solo valida, no crea usuarios.")
+
+    def handle(self, *args, **options):
+        try:
+            # Se valida antes de insertar: los lotes se confirman a medida que se leen
+            with open(options['archivo'], 'rb') as archivo:
+                linea = linea_no_utf8(archivo)
+            if linea is not None:
+                raise CommandError(f"El archivo debe estar en UTF-8 (línea {linea}).")
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                reporte = importar_clientes(leer_csv(archivo), lote=options['lote'], simular=options['simular'])
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer el archivo: {exc}")
+
+        for error in reporte['errores']:
+            self.stdout.write(f"  fila {error['fila']}: {' '.join(error['errores'])}")
+        self.stdout.write(f"Filas: {reporte['filas']}  errores: {reporte['total_errores']}")
+        self.stdout.write(self.style.SUCCESS(f"Clientes creados: {reporte['creados']}"))
@@ -0,0 +1,45 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.utils._os import safe_join
+
+from reservas.almacenamiento import almacenamiento_comprobantes
+from reservas.models import Pago
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a MEDIA_ROOT los comprobantes subidos cuando MEDIA_ROOT no estaba "
+        "configurado (se guardaban relativos al directorio de trabajo). Se puede "
+        "ejecutar varias veces: los que ya están en su lugar no se tocan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', default=os.getcwd(), help="Raíz anterior (por defecto el directorio actual).")
+        parser.add_argument('--simular', action='store_true', help="Informa sin mover nada.")
+
+    def handle(self, *args, **options):
+        storage = almacenamiento_comprobantes()
+        desde = os.path.abspath(options['desde'])
+        movidos = faltantes = 0
+        nombres = (
+            Pago.objects.exclude(comprobante_imagen='').exclude(comprobante_imagen__isnull=True)
+            .values_list('comprobante_imagen', flat=True).distinct().iterator()
+        )
+        for nombre in nombres:
+            if storage.exists(nombre):
+                continue
+            origen = safe_join(desde, nombre)
+            if not os.path.isfile(origen):
+                faltantes += 1
+                self.stderr.write(f"No se encontró {nombre} en {desde}")
+                continue
+            if not options['simular']:
+                destino = storage.path(nombre)
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                shutil.move(origen, destino)
+            movidos += 1
+
+        accion = "A mover" if options['simular'] else "Movidos"
+        self.stdout.write(self.style.SUCCESS(f"{accion}: {movidos}. No encontrados: {faltantes}"))
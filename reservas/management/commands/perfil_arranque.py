@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+# Se ejecuta en un proceso nuevo, igual que un worker de gunicorn al arrancar
+SCRIPT = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import django
+from django.apps import AppConfig
+
+tiempos = {}
+_create = AppConfig.create.__func__
+_import_models = AppConfig.import_models
+
+def create(cls, entry):
+    inicio = time.perf_counter()
+    config = _create(cls, entry)
+    tiempos.setdefault(config.label, {})['config_ms'] = (time.perf_counter() - inicio) * 1000
+    ready = config.ready
+    def ready_medido():
+        inicio = time.perf_counter()
+        ready()
+        tiempos[config.label]['ready_ms'] = (time.perf_counter() - inicio) * 1000
+    config.ready = ready_medido
+    return config
+
+def import_models(self):
+    inicio = time.perf_counter()
+    _import_models(self)
+    tiempos.setdefault(self.label, {})['models_ms'] = (time.perf_counter() - inicio) * 1000
+
+AppConfig.create = classmethod(create)
+AppConfig.import_models = import_models
+
+t1 = time.perf_counter()
+django.setup()
+t2 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_django_ms": (t1 - t0) * 1000,
+    "setup_ms": (t2 - t1) * 1000,
+    "urlconf_ms": (t3 - t2) * 1000,
+    "total_ms": (t3 - t0) * 1000,
+    "apps": tiempos,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Perfila el arranque de un worker en un proceso nuevo: tiempo de import "
+        "por módulo (python -X importtime), tiempo de cada app (config, modelos, "
+        "ready) y carga del URLconf."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help="Cantidad de módulos a mostrar.")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if proceso.returncode != 0:
+            self.stderr.write(proceso.stderr[-4000:])
+            return
+
+        resumen = json.loads(proceso.stdout.strip().splitlines()[-1])
+        modulos = self.parsear_importtime(proceso.stderr)
+        paquetes = {}
+        for modulo, propio, _ in modulos:
+            raiz = modulo.split('.')[0]
+            paquetes[raiz] = paquetes.get(raiz, 0) + propio
+
+        if options['json']:
+            resumen['modulos'] = [
+                {"modulo": m, "propio_us": p, "acumulado_us": a}
+                for m, p, a in sorted(modulos, key=lambda x: -x[2])[:options['top']]
+            ]
+            resumen['paquetes_us'] = dict(sorted(paquetes.items(), key=lambda x: -x[1]))
+            self.stdout.write(json.dumps(resumen, indent=2))
+            return
+
+        self.stdout.write(
+            f"Total {resumen['total_ms']:.0f} ms (import django {resumen['import_django_ms']:.0f} ms, "
+            f"setup {resumen['setup_ms']:.0f} ms, urlconf {resumen['urlconf_ms']:.0f} ms)"
+        )
+        self.stdout.write("\nApps (ms): config / modelos / ready")
+        for label, t in resumen['apps'].items():
+            self.stdout.write(
+                f"  {label:<25} {t.get('config_ms', 0):7.1f} {t.get('models_ms', 0):7.1f} {t.get('ready_ms', 0):7.1f}"
+            )
+        self.stdout.write("\nPaquetes por tiempo propio de import (ms):")
+        for raiz, propio in sorted(paquetes.items(), key=lambda x: -x[1])[:15]:
+            self.stdout.write(f"  {raiz:<35} {propio / 1000:7.1f}")
+        self.stdout.write(f"\nMódulos por tiempo acumulado (ms), top {options['top']}:")
+        for modulo, propio, acumulado in sorted(modulos, key=lambda x: -x[2])[:options['top']]:
+            self.stdout.write(f"  {modulo:<55} {acumulado / 1000:7.1f} (propio {propio / 1000:.1f})")
+
+    @staticmethod
+    def parsear_importtime(salida):
+        modulos = []
+        for linea in salida.splitlines():
+            if not linea.startswith('import time:') or 'self [us]' in linea:
+                continue
+            propio, acumulado, modulo = linea[len('import time:'):].split('|')
+            modulos.append((modulo.strip(), int(propio), int(acumulado)))
+        return modulos
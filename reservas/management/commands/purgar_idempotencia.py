@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reservas.models import ClaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = "Elimina las claves de idempotencia expiradas (ejecutar periódicamente, p. ej. con cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        total = 0
+        while True:
+            ids = list(
+                ClaveIdempotencia.objects.filter(expira__lt=ahora)
+                .order_by('expira')
+                .values_list('id', flat=True)[:options['lote']]
+            )
+            if not ids:
+                break
+            borrados, _ = ClaveIdempotencia.objects.filter(id__in=ids).delete()
+            total += borrados
+        self.stdout.write(self.style.SUCCESS(f"Claves eliminadas: {total}"))
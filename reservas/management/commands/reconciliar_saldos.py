@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from reservas.cache import invalidar_usuarios
+from reservas.models import Reserva
+from reservas.saldos import recalcular_saldos, suma_pagos_vigentes
+
+
+class Command(BaseCommand):
+    help = "Verifica que monto_pagado y saldo coincidan con los pagos y, con --reparar, corrige las diferencias."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar', action='store_true', help="Corrige las reservas desfasadas.")
+        parser.add_argument('--lote', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        desfasadas = (
+            Reserva.objects.annotate(calculado=suma_pagos_vigentes())
+            .filter(~Q(monto_pagado=F('calculado')) | ~Q(saldo=F('monto_total') - F('calculado')))
+            .order_by('id')
+        )
+        filas = list(desfasadas.values_list('id', 'cliente_id', 'monto_pagado', 'calculado'))
+        self.stdout.write(f"Reservas desfasadas: {len(filas)}")
+        for reserva_id, _, monto_pagado, calculado in filas[:20]:
+            self.stdout.write(f"  #{reserva_id}: monto_pagado={monto_pagado} calculado={calculado}")
+
+        if not options['reparar'] or not filas:
+            return
+
+        lote = options['lote']
+        for i in range(0, len(filas), lote):
+            bloque = filas[i:i + lote]
+            with transaction.atomic():
+                recalcular_saldos([fila[0] for fila in bloque])
+                invalidar_usuarios({fila[1] for fila in bloque})
+        self.stdout.write(self.style.SUCCESS(f"Reservas reparadas: {len(filas)}"))
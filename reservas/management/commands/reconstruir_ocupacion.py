@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reservas.ocupacion import reconstruir_ocupacion
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los mapas de ocupación desde las reservas activas (por defecto desde hoy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help="Fecha inicial AAAA-MM-DD.")
+        parser.add_argument('--todo', action='store_true', help="Incluye también las fechas pasadas.")
+
+    def handle(self, *args, **options):
+        desde = None if options['todo'] else (options['desde'] or timezone.localdate())
+        with transaction.atomic():
+            total = reconstruir_ocupacion(desde)
+        self.stdout.write(self.style.SUCCESS(f"Días con ocupación: {total}"))
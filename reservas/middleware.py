@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+
+def _gzip(contenido):
+    return gzip.compress(contenido, compresslevel=6, mtime=0)
+
+
+def _brotli(contenido):
+    import brotli
+    return brotli.compress(contenido, quality=5)
+
+
+def _zstd(contenido):
+    import zstandard
+    return zstandard.ZstdCompressor(level=6).compress(contenido)
+
+
+def _disponible(modulo):
+    try:
+        __import__(modulo)
+    except ImportError:
+        return False
+    return True
+
+
+# Por orden de preferencia cuando el cliente acepta varias con el mismo q.
+# brotli y zstandard están en requirements.txt; si faltan, se negocia gzip.
+CODIFICADORES = {'br': _brotli, 'zstd': _zstd, 'gzip': _gzip}
+_MODULOS = {'br': 'brotli', 'zstd': 'zstandard'}
+_soportadas = None
+
+
+def codificaciones_soportadas():
+    global _soportadas
+    if _soportadas is None:
+        _soportadas = [c for c in CODIFICADORES if c not in _MODULOS or _disponible(_MODULOS[c])]
+    return _soportadas
+
+
+def negociar_codificacion(accept_encoding):
+    aceptadas = {}
+    for parte in accept_encoding.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        nombre = nombre.strip().lower()
+        q = 1.0
+        m = re.search(r'q=([0-9.]+)', parametros)
+        if m:
+            try:
+                q = float(m.group(1))
+            except ValueError:
+                q = 0
+        aceptadas[nombre] = q
+
+    mejor, mejor_q = None, 0
+    for codificacion in codificaciones_soportadas():
+        q = aceptadas.get(codificacion, aceptadas.get('*', 0))
+        if q > mejor_q:
+            mejor, mejor_q = codificacion, q
+    return mejor
+
+
+class CompresionMiddleware:
+    """
+    Comprime respuestas JSON con br, zstd o gzip según Accept-Encoding,
+    a partir de COMPRESION_MIN_BYTES. Si la respuesta trae ETag (catálogo de
+    canchas, agenda) el cuerpo comprimido se guarda en cache junto al ETag,
+    así un payload frecuente se comprime una sola vez.
+
+    Un ETag fuerte identifica los bytes, así que al comprimir se vuelve
+    débil. Las vistas con 304 ya usan ETags débiles, para que el 200
+    comprimido y el 304 lleven el mismo valor.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.comprimir(request, response)
+
+    def comprimir(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or response.status_code != 200:
+            return response
+        tipo = response.get('Content-Type', '').split(';')[0].strip()
+        if tipo not in settings.COMPRESION_TIPOS:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESION_MIN_BYTES:
+            return response
+
+        codificacion = negociar_codificacion(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacion is None:
+            return response
+
+        etag = response.get('ETag')
+        if etag and request.method == 'GET':
+            huella = hashlib.md5(f'{request.get_full_path()}|{etag}'.encode()).hexdigest()
+            clave = f'comp:{codificacion}:{huella}'
+            cuerpo = cache.get(clave)
+            if cuerpo is None:
+                cuerpo = CODIFICADORES[codificacion](response.content)
+                cache.set(clave, cuerpo, settings.COMPRESION_CACHE_TIMEOUT)
+        else:
+            cuerpo = CODIFICADORES[codificacion](response.content)
+
+        if len(cuerpo) >= len(response.content):
+            return response
+
+        response.content = cuerpo
+        response['Content-Length'] = str(len(cuerpo))
+        response['Content-Encoding'] = codificacion
+        if etag and not etag.startswith('W/'):
+            # La representación comprimida no es idéntica byte a byte
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class PerfiladoMiddleware:
+    """
+    Perfilado a pedido: si un administrador envía la cabecera X-Perfilar: 1
+    (o ?perfilar=1) el request se ejecuta bajo cProfile, se captura el SQL
+    con tiempos y origen, y el informe queda en PERFILADO_DIR (ver
+    reservas/perfilado.py). Sin la marca solo se revisa una cabecera.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.META.get('HTTP_X_PERFILAR') != '1' and request.GET.get('perfilar') != '1':
+            return self.get_response(request)
+
+        from .perfilado import perfilar, usuario_administrador
+
+        usuario = usuario_administrador(request)
+        if usuario is None:
+            return self.get_response(request)
+        return perfilar(request, self.get_response, usuario)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:14
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def calcular_saldo(apps, schema_editor):
+    Reserva = apps.get_model('reservas', 'Reserva')
+    Reserva.objects.update(saldo=F('monto_total') - F('monto_pagado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_claveidempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='saldo',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=6),
+        ),
+        migrations.RunPython(calcular_saldo, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('saldo__gt', 0)), fields=['estado', 'cliente'], name='reserva_con_saldo_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0010_indices_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('estado', models.CharField(choices=[('ESPERANDO', 'Esperando'), ('PROMOVIDA', 'Promovida'), ('CANCELADA', 'Cancelada')], default='ESPERANDO', max_length=10)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cancha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='reservas.cancha')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listas_espera', to=settings.AUTH_USER_MODEL)),
+                ('reserva', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reservas.reserva')),
+            ],
+            options={
+                'verbose_name': 'Lista de espera',
+                'verbose_name_plural': 'Listas de espera',
+                'indexes': [models.Index(condition=models.Q(('estado', 'ESPERANDO')), fields=['cancha', 'fecha', 'hora_inicio', 'hora_fin'], name='lista_espera_activa_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:19
+
+import reservas.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0011_listaespera'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pago',
+            name='comprobante_imagen',
+            field=models.ImageField(blank=True, null=True, storage=reservas.almacenamiento.almacenamiento_comprobantes, upload_to='comprobantes/'),
+        ),
+    ]
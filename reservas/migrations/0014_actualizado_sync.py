@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0013_registro_cambios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pago',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='eventocambio',
+            index=models.Index(condition=models.Q(('accion', 'eliminado')), fields=['creado'], name='evento_eliminado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['actualizado'], name='pago_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['cliente', 'actualizado'], name='reserva_cliente_act_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['actualizado'], name='reserva_actualizado_idx'),
+        ),
+    ]
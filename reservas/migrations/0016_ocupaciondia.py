@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0015_mensajesaliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('mapa', models.BinaryField(max_length=12)),
+                ('cancha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion', to='reservas.cancha')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='ocupacion_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cancha', 'fecha'), name='ocupacion_cancha_fecha_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0017_trabajopurga'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cancha',
+            name='calendario_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='calendario_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
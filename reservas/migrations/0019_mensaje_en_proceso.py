@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0018_calendario_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mensajesaliente',
+            name='mensaje_pendiente_idx',
+        ),
+        migrations.AlterField(
+            model_name='mensajesaliente',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido'), ('CANCELADO', 'Cancelado')], default='PENDIENTE', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='mensajesaliente',
+            index=models.Index(condition=models.Q(('estado__in', ['PENDIENTE', 'EN_PROCESO'])), fields=['enviar_desde'], name='mensaje_por_despachar_idx'),
+        ),
+    ]
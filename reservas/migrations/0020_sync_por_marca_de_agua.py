@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0019_mensaje_en_proceso'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='eventocambio',
+            name='evento_eliminado_idx',
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from .almacenamiento import almacenamiento_comprobantes
 
 class Usuario(AbstractUser):
     ROL_CHOICES = (
@@ -14,6 +16,8 @@ class Usuario(AbstractUser):
     dni = models.CharField(max_length=8, unique=True, null=True, blank=True)
     celular = models.CharField(max_length=15, null=True, blank=True)
     puede_reservar_sin_adelanto = models.BooleanField(default=False)
+    # Va firmada en el enlace del feed .ics: incrementarla revoca los enlaces anteriores
+    calendario_version = models.PositiveIntegerField(default=1)
 
     groups = models.ManyToManyField(
         'auth.Group',
@@ -46,10 +50,16 @@ class Cancha(models.Model):
     costo_dia = models.DecimalField(max_digits=6, decimal_places=2)
     costo_noche = models.DecimalField(max_digits=6, decimal_places=2)
     disponible = models.BooleanField(default=True)
+    # Ver Usuario.calendario_version
+    calendario_version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return f"{self.nombre} - {self.get_deporte_display()} ({self.get_calidad_display()})"
 
+    def tarifa(self, hora_inicio):
+        """Precio de una reserva que empieza a `hora_inicio` (tarifa noche desde las 18:00)."""
+        return self.costo_dia if hora_inicio.hour < 18 else self.costo_noche
+
 
 class Reserva(models.Model):
     ESTADO_RESERVA_CHOICES = [
@@ -75,10 +85,13 @@ class Reserva(models.Model):
     hora_fin = models.TimeField()
     monto_pagado = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     monto_total = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    # Derivado: monto_total - monto_pagado (ver reservas.saldos)
+    saldo = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     pago_por_yape = models.BooleanField(default=False)
     yape_verificado = models.BooleanField(default=False)
 
     fecha_creacion = models.DateTimeField(default=timezone.now)
+    actualizado = models.DateTimeField(auto_now=True)
     estado = models.CharField(max_length=20, choices=ESTADO_RESERVA_CHOICES, default="PENDIENTE_APROBACION")
     motivo_anulacion = models.TextField(null=True, blank=True)
 
@@ -92,11 +105,27 @@ class Reserva(models.Model):
     class Meta:
         verbose_name = "Reserva"
         verbose_name_plural = "Reservas"
+        indexes = [
+            models.Index(fields=['estado', 'cliente'], condition=Q(saldo__gt=0), name='reserva_con_saldo_idx'),
+            models.Index(fields=['fecha_reserva', 'hora_inicio'], name='reserva_fecha_hora_idx'),
+            models.Index(fields=['estado', 'fecha_reserva'], name='reserva_estado_fecha_idx'),
+            models.Index(fields=['cliente', 'actualizado'], name='reserva_cliente_act_idx'),
+            models.Index(fields=['actualizado'], name='reserva_actualizado_idx'),
+        ]
 
 
     def __str__(self):
         return f"{self.cancha} - {self.cliente} ({self.fecha_reserva} {self.hora_inicio})"
 
+    def save(self, *args, **kwargs):
+        self.saldo = self.monto_total - self.monto_pagado
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'monto_total', 'monto_pagado'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'saldo'}
+        # Las señales (lista de espera, registro de cambios) corren en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def realizada_por_cliente(self):
         return self.atendido_por is None
 
@@ -112,9 +141,12 @@ class Pago(models.Model):
     reserva = models.ForeignKey(Reserva, on_delete=models.CASCADE, related_name='pagos')
     monto = models.DecimalField(max_digits=6, decimal_places=2)
     metodo_pago = models.CharField(max_length=20, default="YAPE")
-    comprobante_imagen = models.ImageField(upload_to="comprobantes/", null=True, blank=True)
+    comprobante_imagen = models.ImageField(
+        upload_to="comprobantes/", storage=almacenamiento_comprobantes, null=True, blank=True
+    )
     estado_pago = models.CharField(max_length=15, choices=ESTADO_PAGO_CHOICES, default="PENDIENTE")
     fecha_pago = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
     verificado_por = models.ForeignKey(
         Usuario,
         on_delete=models.SET_NULL,
@@ -124,5 +156,204 @@ class Pago(models.Model):
     )
     observacion = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha_pago'], name='pago_fecha_idx'),
+            models.Index(fields=['estado_pago', 'fecha_pago'], name='pago_estado_fecha_idx'),
+            models.Index(fields=['actualizado'], name='pago_actualizado_idx'),
+        ]
+
     def __str__(self):
         return f"Pago #{self.id} - {self.reserva}"
+
+    def save(self, *args, **kwargs):
+        # Las señales (saldo de la reserva, registro de cambios) corren en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class ClaveIdempotencia(models.Model):
+    """Respuesta almacenada de un POST con cabecera Idempotency-Key."""
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='claves_idempotencia')
+    clave = models.CharField(max_length=255)
+    ruta = models.CharField(max_length=255)
+    huella = models.CharField(max_length=64)
+    codigo_estado = models.PositiveSmallIntegerField()
+    respuesta = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    creado = models.DateTimeField(default=timezone.now)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave'], name='unique_clave_idempotencia_por_usuario'),
+        ]
+
+    def __str__(self):
+        return f"{self.clave} ({self.usuario_id})"
+
+
+class ListaEspera(models.Model):
+    ESTADO_CHOICES = [
+        ("ESPERANDO", "Esperando"),
+        ("PROMOVIDA", "Promovida"),
+        ("CANCELADA", "Cancelada"),
+    ]
+
+    cancha = models.ForeignKey(Cancha, on_delete=models.CASCADE, related_name='lista_espera')
+    cliente = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='listas_espera')
+    fecha = models.DateField()
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default="ESPERANDO")
+    # Reserva creada al promover la solicitud
+    reserva = models.ForeignKey(Reserva, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    creado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Lista de espera"
+        verbose_name_plural = "Listas de espera"
+        indexes = [
+            models.Index(
+                fields=['cancha', 'fecha', 'hora_inicio', 'hora_fin'],
+                condition=Q(estado='ESPERANDO'),
+                name='lista_espera_activa_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente} espera {self.cancha} ({self.fecha} {self.hora_inicio}-{self.hora_fin})"
+
+
+class EventoCambio(models.Model):
+    """Registro append-only de cambios en reservas y pagos (ver reservas.eventos)."""
+    ENTIDAD_CHOICES = [
+        ("reserva", "Reserva"),
+        ("pago", "Pago"),
+    ]
+    ACCION_CHOICES = [
+        ("creado", "Creado"),
+        ("actualizado", "Actualizado"),
+        ("eliminado", "Eliminado"),
+    ]
+
+    entidad = models.CharField(max_length=10, choices=ENTIDAD_CHOICES)
+    objeto_id = models.BigIntegerField()
+    accion = models.CharField(max_length=12, choices=ACCION_CHOICES)
+    # Sin FK: el evento debe sobrevivir a la eliminación del cliente
+    cliente_id = models.BigIntegerField(null=True)
+    datos = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    creado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Feed y sincronización incremental de un cliente
+            models.Index(fields=['cliente_id', 'id'], name='evento_cliente_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.entidad} {self.objeto_id} {self.accion}"
+
+
+class CursorConsumidor(models.Model):
+    """Posición (último evento procesado) de cada consumidor del registro de cambios."""
+    nombre = models.CharField(max_length=100, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} @ {self.ultimo_id}"
+
+
+class MensajeSaliente(models.Model):
+    """Outbox de notificaciones (WhatsApp/SMS); las envía el comando despachar_mensajes."""
+    TIPO_CHOICES = [
+        ("recordatorio", "Recordatorio de reserva"),
+        ("pago_confirmado", "Pago confirmado"),
+    ]
+    ESTADO_CHOICES = [
+        ("PENDIENTE", "Pendiente"),
+        # Tomado por un despachador; enviar_desde es el vencimiento del reclamo
+        ("EN_PROCESO", "En proceso"),
+        ("ENVIADO", "Enviado"),
+        ("FALLIDO", "Fallido"),
+        ("CANCELADO", "Cancelado"),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    canal = models.CharField(max_length=10, default="whatsapp")
+    destinatario = models.CharField(max_length=15)
+    contenido = models.TextField()
+    reserva = models.ForeignKey(Reserva, on_delete=models.CASCADE, null=True, blank=True, related_name='mensajes')
+    # Evita encolar dos veces el mismo aviso (p. ej. "recordatorio:reserva:5:202611201800")
+    clave = models.CharField(max_length=100, unique=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default="PENDIENTE")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    enviar_desde = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True, default='')
+    creado = models.DateTimeField(default=timezone.now)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['enviar_desde'], condition=Q(estado__in=['PENDIENTE', 'EN_PROCESO']),
+                name='mensaje_por_despachar_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} a {self.destinatario} ({self.estado})"
+
+
+class OcupacionDia(models.Model):
+    """
+    Mapa de bits de ocupación de una cancha en un día: 96 franjas de 15
+    minutos (bit 0 = 00:00-00:15). Se mantiene desde las señales de Reserva
+    a partir de las reservas activas; ver reservas/ocupacion.py.
+    """
+    cancha = models.ForeignKey(Cancha, on_delete=models.CASCADE, related_name='ocupacion')
+    fecha = models.DateField()
+    mapa = models.BinaryField(max_length=12)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cancha', 'fecha'], name='ocupacion_cancha_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='ocupacion_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cancha_id} {self.fecha}"
+
+
+class TrabajoPurga(models.Model):
+    """
+    Eliminación definitiva de una cancha o un usuario con sus reservas y
+    pagos. La ejecuta el comando ejecutar_purgas por lotes (ver reservas/purgas.py).
+    """
+    TIPO_CHOICES = [
+        ("cancha", "Cancha"),
+        ("usuario", "Usuario"),
+    ]
+    ESTADO_CHOICES = [
+        ("PENDIENTE", "Pendiente"),
+        ("EN_CURSO", "En curso"),
+        ("COMPLETADO", "Completado"),
+        ("FALLIDO", "Fallido"),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    objeto_id = models.BigIntegerField()
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default="PENDIENTE")
+    # Reservas + pagos a eliminar (estimado al encolar) y eliminados hasta ahora
+    total = models.PositiveIntegerField(default=0)
+    eliminados = models.PositiveIntegerField(default=0)
+    solicitado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True, default='')
+    creado = models.DateTimeField(default=timezone.now)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Purga {self.tipo} #{self.objeto_id} ({self.estado})"
@@ -0,0 +1,166 @@
+import logging
+import random
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import MensajeSaliente, Reserva
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------- PROVEEDORES -----------------
+class ProveedorMensajeria:
+    """Interfaz de envío. enviar() debe lanzar una excepción si el envío falla."""
+
+    def enviar(self, mensaje):
+        raise NotImplementedError
+
+
+class ProveedorConsola(ProveedorMensajeria):
+    def enviar(self, mensaje):
+        logger.info("[%s] %s: %s", mensaje.canal, mensaje.destinatario, mensaje.contenido)
+
+
+class ProveedorFalso(ProveedorMensajeria):
+    """Para pruebas: guarda los mensajes en memoria y puede simular fallos."""
+
+    def __init__(self, fallos=0):
+        self.enviados = []
+        self.fallos = fallos
+
+    def enviar(self, mensaje):
+        if self.fallos > 0:
+            self.fallos -= 1
+            raise ConnectionError("Fallo simulado del proveedor")
+        self.enviados.append((mensaje.canal, mensaje.destinatario, mensaje.contenido))
+
+
+def obtener_proveedor():
+    return import_string(settings.MENSAJERIA_PROVEEDOR)()
+
+
+# ----------------- ENCOLADO (dentro de la transacción del cambio) -----------------
+def encolar_recordatorio(reserva, celular):
+    """
+    Programa el recordatorio para la fecha y hora actuales de la reserva.
+    La clave incluye el horario: si la reserva se reprogramó, el pendiente
+    del horario anterior se cancela y se encola uno nuevo.
+    """
+    # Un save() del ORM puede traer la fecha/hora como texto
+    fecha = Reserva._meta.get_field('fecha_reserva').to_python(reserva.fecha_reserva)
+    hora_inicio = Reserva._meta.get_field('hora_inicio').to_python(reserva.hora_inicio)
+    clave = f'recordatorio:reserva:{reserva.pk}:{fecha:%Y%m%d}{hora_inicio:%H%M}'
+    recordatorios_pendientes(reserva).exclude(clave=clave).update(estado='CANCELADO')
+
+    inicio = timezone.make_aware(datetime.combine(fecha, hora_inicio))
+    ahora = timezone.now()
+    if not celular or inicio <= ahora:
+        return None
+    enviar_desde = max(inicio - timedelta(hours=settings.MENSAJERIA_RECORDATORIO_HORAS), ahora)
+    mensaje, creado = MensajeSaliente.objects.get_or_create(
+        clave=clave,
+        defaults={
+            'tipo': 'recordatorio',
+            'destinatario': celular,
+            'reserva': reserva,
+            'enviar_desde': enviar_desde,
+            'contenido': f"Recordatorio: tienes una reserva el {fecha:%d/%m/%Y} a las {hora_inicio:%H:%M}.",
+        },
+    )
+    if not creado and mensaje.estado == 'CANCELADO':
+        # La reserva volvió a un horario que ya tenía
+        mensaje.estado = 'PENDIENTE'
+        mensaje.destinatario = celular
+        mensaje.enviar_desde = enviar_desde
+        mensaje.save(update_fields=['estado', 'destinatario', 'enviar_desde'])
+    return mensaje
+
+
+def recordatorios_pendientes(reserva):
+    return MensajeSaliente.objects.filter(reserva_id=reserva.pk, tipo='recordatorio', estado='PENDIENTE')
+
+
+def cancelar_recordatorio(reserva):
+    return recordatorios_pendientes(reserva).update(estado='CANCELADO')
+
+
+def mensaje_pago_confirmado(pago, celular):
+    return MensajeSaliente(
+        clave=f'pago_confirmado:{pago.pk}',
+        tipo='pago_confirmado',
+        destinatario=celular,
+        reserva_id=pago.reserva_id,
+        contenido=f"Tu pago de S/ {pago.monto} para la reserva #{pago.reserva_id} fue confirmado.",
+    )
+
+
+def encolar_pagos_confirmados(pagos_con_celular):
+    mensajes = [mensaje_pago_confirmado(pago, celular) for pago, celular in pagos_con_celular if celular]
+    return MensajeSaliente.objects.bulk_create(mensajes, ignore_conflicts=True)
+
+
+# ----------------- DESPACHO -----------------
+def espera_reintento(intentos):
+    base = settings.MENSAJERIA_BACKOFF_SEGUNDOS * 2 ** (intentos - 1)
+    base = min(base, 6 * 3600)
+    return timedelta(seconds=base * random.uniform(1, 1.1))
+
+
+def reclamar_lote(lote):
+    """
+    Toma hasta `lote` mensajes vencidos con SELECT ... FOR UPDATE SKIP LOCKED
+    y los marca EN_PROCESO en una transacción corta. Mientras están
+    EN_PROCESO, enviar_desde es el vencimiento del reclamo: si el despachador
+    muere antes de registrar el resultado, otro los vuelve a tomar después
+    de MENSAJERIA_RECLAMO_SEGUNDOS.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        mensajes = list(
+            MensajeSaliente.objects.select_for_update(skip_locked=True)
+            .filter(estado__in=['PENDIENTE', 'EN_PROCESO'], enviar_desde__lte=ahora)
+            .order_by('enviar_desde')[:lote]
+        )
+        vence = ahora + timedelta(seconds=settings.MENSAJERIA_RECLAMO_SEGUNDOS)
+        for mensaje in mensajes:
+            mensaje.estado = 'EN_PROCESO'
+            mensaje.enviar_desde = vence
+        MensajeSaliente.objects.bulk_update(mensajes, ['estado', 'enviar_desde'])
+    return mensajes
+
+
+def despachar_lote(proveedor, lote=50):
+    """
+    Reclama un lote de mensajes (varios despachadores pueden correr en
+    paralelo sin repetir envíos), los envía fuera de la transacción y
+    registra cada resultado con su propio UPDATE: el envío no deja filas
+    bloqueadas para las señales de Reserva que cancelan o reprograman
+    recordatorios. Los fallos se reintentan con backoff exponencial hasta
+    MENSAJERIA_MAX_INTENTOS.
+    """
+    mensajes = reclamar_lote(lote)
+    for mensaje in mensajes:
+        cambios = {}
+        try:
+            proveedor.enviar(mensaje)
+        except Exception as exc:
+            cambios['intentos'] = mensaje.intentos + 1
+            cambios['ultimo_error'] = str(exc)[:500]
+            if cambios['intentos'] >= settings.MENSAJERIA_MAX_INTENTOS:
+                cambios['estado'] = 'FALLIDO'
+            else:
+                cambios['estado'] = 'PENDIENTE'
+                cambios['enviar_desde'] = timezone.now() + espera_reintento(cambios['intentos'])
+            logger.warning("Error enviando mensaje %s: %s", mensaje.pk, exc)
+        else:
+            cambios['estado'] = 'ENVIADO'
+            cambios['enviado'] = timezone.now()
+        # Solo si el reclamo sigue siendo nuestro (no venció y otro lo tomó)
+        MensajeSaliente.objects.filter(
+            pk=mensaje.pk, estado='EN_PROCESO', enviar_desde=mensaje.enviar_desde,
+        ).update(**cambios)
+    return len(mensajes)
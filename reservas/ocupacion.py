@@ -0,0 +1,167 @@
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .lista_espera import ESTADOS_ACTIVOS
+from .models import Cancha, OcupacionDia, Reserva
+
+MINUTOS_FRANJA = 15
+FRANJAS = 24 * 60 // MINUTOS_FRANJA
+BYTES_MAPA = FRANJAS // 8
+
+
+def a_minutos(hora, fin=False):
+    minutos = hora.hour * 60 + hora.minute
+    # 00:00 como hora de fin significa medianoche (fin del día)
+    return 24 * 60 if fin and minutos == 0 else minutos
+
+
+def mascara(inicio_min, fin_min):
+    """Bits de las franjas que toca el intervalo [inicio_min, fin_min)."""
+    primera = inicio_min // MINUTOS_FRANJA
+    ultima = -(-fin_min // MINUTOS_FRANJA)
+    if ultima <= primera:
+        return 0
+    return ((1 << (ultima - primera)) - 1) << primera
+
+
+def a_entero(mapa):
+    return int.from_bytes(bytes(mapa), 'little')
+
+
+def a_bytes(bits):
+    return bits.to_bytes(BYTES_MAPA, 'little')
+
+
+# ----------------- MANTENIMIENTO -----------------
+def recalcular_ocupacion(pares):
+    """
+    Recalcula el mapa de los pares (cancha_id, fecha) indicados a partir de
+    sus reservas activas. Los días sin reservas no guardan fila.
+
+    Las canchas quedan bloqueadas hasta el fin de la transacción: dos
+    reservas simultáneas en la misma cancha recalculan una después de la
+    otra, y la segunda lee la reserva ya confirmada de la primera (si no,
+    cada una escribiría el mapa sin la franja de la otra). FOR NO KEY
+    UPDATE no choca con el bloqueo que toma el INSERT de la reserva sobre
+    la cancha por la clave foránea.
+    """
+    pares = {(cancha_id, fecha) for cancha_id, fecha in pares if cancha_id and fecha}
+    if not pares:
+        return
+    filtro = Q()
+    for cancha_id, fecha in pares:
+        filtro |= Q(cancha_id=cancha_id, fecha_reserva=fecha)
+    mapas = dict.fromkeys(pares, 0)
+    with transaction.atomic():
+        # Siempre en el mismo orden, para no bloquearse entre sí
+        list(
+            Cancha.objects.select_for_update(no_key=True)
+            .filter(id__in={cancha_id for cancha_id, _ in pares})
+            .order_by('id').values_list('id', flat=True)
+        )
+        filas = (
+            Reserva.objects.filter(filtro, estado__in=ESTADOS_ACTIVOS)
+            .values_list('cancha_id', 'fecha_reserva', 'hora_inicio', 'hora_fin')
+        )
+        for cancha_id, fecha, hora_inicio, hora_fin in filas:
+            mapas[(cancha_id, fecha)] |= mascara(a_minutos(hora_inicio), a_minutos(hora_fin, fin=True))
+        guardar_mapas(mapas)
+
+
+def guardar_mapas(mapas, batch_size=1000):
+    ocupados = [
+        OcupacionDia(cancha_id=cancha_id, fecha=fecha, mapa=a_bytes(bits))
+        for (cancha_id, fecha), bits in mapas.items() if bits
+    ]
+    OcupacionDia.objects.bulk_create(
+        ocupados, batch_size=batch_size,
+        update_conflicts=True, unique_fields=['cancha', 'fecha'], update_fields=['mapa'],
+    )
+    libres = [par for par, bits in mapas.items() if not bits]
+    if libres:
+        filtro = Q()
+        for cancha_id, fecha in libres:
+            filtro |= Q(cancha_id=cancha_id, fecha=fecha)
+        OcupacionDia.objects.filter(filtro).delete()
+
+
+def reconstruir_ocupacion(desde=None, chunk_size=5000):
+    """Reconstruye todos los mapas (desde una fecha, si se indica)."""
+    consulta = Reserva.objects.filter(estado__in=ESTADOS_ACTIVOS)
+    existentes = OcupacionDia.objects.all()
+    if desde:
+        consulta = consulta.filter(fecha_reserva__gte=desde)
+        existentes = existentes.filter(fecha__gte=desde)
+    mapas = defaultdict(int)
+    filas = consulta.values_list('cancha_id', 'fecha_reserva', 'hora_inicio', 'hora_fin').iterator(chunk_size=chunk_size)
+    for cancha_id, fecha, hora_inicio, hora_fin in filas:
+        mapas[(cancha_id, fecha)] |= mascara(a_minutos(hora_inicio), a_minutos(hora_fin, fin=True))
+    existentes.delete()
+    guardar_mapas(mapas)
+    return len(mapas)
+
+
+# ----------------- BÚSQUEDA -----------------
+def inicios_libres(ocupado, ventana, franjas_necesarias):
+    """
+    Bits de las franjas donde puede empezar una reserva de
+    `franjas_necesarias` franjas libres consecutivas dentro de `ventana`.
+    """
+    libre = ~ocupado & ventana
+    inicios = libre
+    for desplazamiento in range(1, franjas_necesarias):
+        inicios &= libre >> desplazamiento
+    return inicios
+
+
+def buscar_horarios(canchas, desde, hasta, hora_desde, hora_hasta, duracion, limite=50):
+    """
+    Horarios libres de `duracion` minutos entre hora_desde y hora_hasta, en
+    las canchas y fechas indicadas, ordenados por precio, fecha y hora.
+    """
+    canchas = {cancha.id: cancha for cancha in canchas}
+    mapas = {
+        (cancha_id, fecha): a_entero(mapa)
+        for cancha_id, fecha, mapa in OcupacionDia.objects.filter(
+            cancha_id__in=canchas, fecha__range=(desde, hasta)
+        ).values_list('cancha_id', 'fecha', 'mapa')
+    }
+    ventana_base = mascara(a_minutos(hora_desde), a_minutos(hora_hasta, fin=True))
+    franjas_necesarias = duracion // MINUTOS_FRANJA
+    ahora = timezone.localtime()
+
+    resultados = []
+    fecha = desde
+    while fecha <= hasta:
+        ventana = ventana_base
+        if fecha == ahora.date():
+            # Hoy solo las franjas que aún no empezaron
+            ventana &= ~mascara(0, ahora.hour * 60 + ahora.minute)
+        elif fecha < ahora.date():
+            ventana = 0
+        for cancha_id, cancha in canchas.items():
+            inicios = inicios_libres(mapas.get((cancha_id, fecha), 0), ventana, franjas_necesarias)
+            while inicios:
+                franja = (inicios & -inicios).bit_length() - 1
+                inicios &= inicios - 1
+                minuto = franja * MINUTOS_FRANJA
+                hora_inicio = time(minuto // 60, minuto % 60)
+                fin = minuto + duracion
+                resultados.append({
+                    'cancha': cancha_id,
+                    'nombre': cancha.nombre,
+                    'deporte': cancha.deporte,
+                    'calidad': cancha.calidad,
+                    'fecha': fecha,
+                    'hora_inicio': hora_inicio,
+                    'hora_fin': time(fin // 60 % 24, fin % 60),
+                    'precio': cancha.tarifa(hora_inicio),
+                })
+        fecha += timedelta(days=1)
+
+    resultados.sort(key=lambda r: (r['precio'], r['fecha'], r['hora_inicio'], r['cancha']))
+    return resultados[:limite]
@@ -0,0 +1,31 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Debajo de este tamaño se usa el COUNT(*) exacto
+UMBRAL_CONTEO_ESTIMADO = 100_000
+
+
+class PaginadorConteoEstimado(Paginator):
+    """
+    Paginator para tablas grandes: si el queryset no tiene filtros y la base
+    es PostgreSQL, usa la estimación de filas del planificador (pg_class)
+    en lugar de un COUNT(*) que recorre toda la tabla.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                        [queryset.model._meta.db_table],
+                    )
+                    fila = cursor.fetchone()
+                if fila and fila[0] >= UMBRAL_CONTEO_ESTIMADO:
+                    return fila[0]
+        return super().count
@@ -0,0 +1,243 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+ID_VALIDO = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$')
+
+
+def usuario_administrador(request):
+    """
+    El middleware corre antes que la autenticación de DRF, así que el token
+    JWT se valida aquí. Devuelve el usuario solo si es administrador.
+    """
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    try:
+        resultado = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError):
+        return None
+    if resultado is None:
+        return None
+    usuario = resultado[0]
+    return usuario if usuario.rol == 'administrador' else None
+
+
+def _origen(limite=6):
+    """
+    Frames del proyecto que llevaron a la consulta. Si la consulta sale
+    directamente de código de DRF (p. ej. una vista genérica sin métodos
+    propios) se devuelven los últimos frames fuera del ORM.
+    """
+    base = str(settings.BASE_DIR)
+    pila = traceback.extract_stack()[:-2]
+    propios = [
+        f for f in pila
+        if f.filename.startswith(base) and 'site-packages' not in f.filename
+        and not f.filename.endswith(('perfilado.py', 'middleware.py'))
+    ]
+    if not propios:
+        propios = [f for f in pila if f'{os.sep}django{os.sep}db{os.sep}' not in f.filename]
+    return [f"{_archivo_corto(f.filename, base)}:{f.lineno} en {f.name}" for f in propios[-limite:]]
+
+
+def _archivo_corto(archivo, base):
+    if 'site-packages' in archivo:
+        return archivo.rsplit(f'site-packages{os.sep}', 1)[1]
+    return os.path.relpath(archivo, base) if archivo.startswith(base) else archivo
+
+
+class CapturaSQL:
+    """execute_wrapper que guarda cada consulta con su duración y su origen."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({
+                'base': context['connection'].alias,
+                'sql': sql,
+                'duracion_ms': round((time.perf_counter() - inicio) * 1000, 3),
+                'origen': _origen(),
+            })
+
+
+# cProfile es uno por proceso: desde Python 3.12 enable() lanza ValueError
+# si ya hay otro perfilador activo (otro hilo del mismo worker)
+_perfilando = threading.Lock()
+
+
+def perfilar(request, get_response, usuario):
+    """
+    Ejecuta el request bajo cProfile capturando el SQL y guarda el informe.
+    Si ya se está perfilando otro request en el proceso, este se atiende
+    normalmente, sin informe.
+    """
+    if not _perfilando.acquire(blocking=False):
+        return get_response(request)
+    try:
+        return _perfilar(request, get_response, usuario)
+    finally:
+        _perfilando.release()
+
+
+def _perfilar(request, get_response, usuario):
+    captura = CapturaSQL()
+    perfil = cProfile.Profile()
+    inicio = time.perf_counter()
+    with ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(captura))
+        perfil.enable()
+        try:
+            response = get_response(request)
+        finally:
+            perfil.disable()
+    duracion = time.perf_counter() - inicio
+
+    informe_id = f"{timezone.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    guardar_informe(informe_id, {
+        'id': informe_id,
+        'fecha': timezone.now().isoformat(),
+        'metodo': request.method,
+        'ruta': request.path,
+        'query_string': request.META.get('QUERY_STRING', ''),
+        'usuario': usuario.username,
+        'status': response.status_code,
+        'duracion_ms': round(duracion * 1000, 3),
+        'sql': resumen_sql(captura.consultas),
+        'funciones': resumen_perfil(perfil),
+    })
+    response['X-Perfil-Id'] = informe_id
+    return response
+
+
+def resumen_sql(consultas):
+    repetidas = Counter(c['sql'] for c in consultas)
+    return {
+        'total': len(consultas),
+        'tiempo_ms': round(sum(c['duracion_ms'] for c in consultas), 3),
+        'repetidas': [
+            {'sql': sql, 'veces': veces}
+            for sql, veces in repetidas.most_common(10) if veces > 1
+        ],
+        'consultas': consultas,
+    }
+
+
+def resumen_perfil(perfil, limite=60):
+    estadisticas = pstats.Stats(perfil)
+    filas = []
+    for (archivo, linea, funcion), (_, llamadas, propio, acumulado, _) in estadisticas.stats.items():
+        filas.append({
+            'funcion': f"{archivo}:{linea}({funcion})",
+            'llamadas': llamadas,
+            'tiempo_propio_ms': round(propio * 1000, 3),
+            'tiempo_acumulado_ms': round(acumulado * 1000, 3),
+        })
+    filas.sort(key=lambda f: f['tiempo_acumulado_ms'], reverse=True)
+    return filas[:limite]
+
+
+# ----------------- ALMACENAMIENTO -----------------
+# Varios workers escriben y aplican la retención sobre el mismo directorio:
+# cualquier archivo puede desaparecer entre listarlo y abrirlo.
+CAMPOS_RESUMEN = ('fecha', 'metodo', 'ruta', 'usuario', 'status', 'duracion_ms')
+
+
+def _ruta(informe_id, extension='json'):
+    return os.path.join(settings.PERFILADO_DIR, f'{informe_id}.{extension}')
+
+
+def resumen(informe):
+    datos = {campo: informe[campo] for campo in CAMPOS_RESUMEN}
+    datos['consultas'] = informe['sql']['total']
+    return datos
+
+
+def guardar_informe(informe_id, informe):
+    """Guarda el informe y, al lado, su resumen para el listado (<id>.resumen)."""
+    os.makedirs(settings.PERFILADO_DIR, exist_ok=True)
+    with open(_ruta(informe_id), 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, ensure_ascii=False, default=str)
+    with open(_ruta(informe_id, 'resumen'), 'w', encoding='utf-8') as archivo:
+        json.dump(resumen(informe), archivo, ensure_ascii=False, default=str)
+    aplicar_retencion()
+
+
+def _eliminar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def _archivos():
+    try:
+        nombres = os.listdir(settings.PERFILADO_DIR)
+    except FileNotFoundError:
+        return []
+    archivos = []
+    for nombre in nombres:
+        if nombre.endswith('.json') and ID_VALIDO.match(nombre[:-5]):
+            try:
+                archivos.append((nombre[:-5], os.path.getsize(os.path.join(settings.PERFILADO_DIR, nombre))))
+            except FileNotFoundError:
+                continue
+    # El id empieza con la fecha, así que el orden alfabético es cronológico
+    return sorted(archivos, reverse=True)
+
+
+def aplicar_retencion():
+    """Borra los informes más antiguos que excedan el número o el tamaño máximo."""
+    total = 0
+    for posicion, (informe_id, tamano) in enumerate(_archivos()):
+        total += tamano
+        if posicion >= settings.PERFILADO_MAX_ARCHIVOS or total > settings.PERFILADO_MAX_BYTES:
+            _eliminar(_ruta(informe_id))
+            _eliminar(_ruta(informe_id, 'resumen'))
+
+
+def _leer_resumen(informe_id):
+    try:
+        with open(_ruta(informe_id, 'resumen'), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        # Informe anterior a los resúmenes (o eliminado mientras tanto)
+        informe = leer_informe(informe_id)
+        return resumen(informe) if informe is not None else None
+
+
+def listar_informes():
+    resultado = []
+    for informe_id, tamano in _archivos():
+        datos = _leer_resumen(informe_id)
+        if datos is not None:
+            resultado.append({'id': informe_id, **datos, 'tamano': tamano})
+    return resultado
+
+
+def leer_informe(informe_id):
+    if not ID_VALIDO.match(informe_id):
+        return None
+    try:
+        with open(_ruta(informe_id), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,136 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidar_agenda_canchas, invalidar_usuarios
+from .eventos import (
+    evento_pago, evento_reserva, registrar_eventos,
+    registrar_pagos_actualizados, registrar_reservas_actualizadas,
+)
+from .models import (
+    Cancha, ClaveIdempotencia, ListaEspera, OcupacionDia, Pago, Reserva, TrabajoPurga, Usuario,
+)
+from .ocupacion import recalcular_ocupacion
+from .signals import purga_en_curso
+
+
+def _reservas_de(trabajo):
+    if trabajo.tipo == 'cancha':
+        return Reserva.objects.filter(cancha_id=trabajo.objeto_id)
+    return Reserva.objects.filter(cliente_id=trabajo.objeto_id)
+
+
+def encolar_purga(tipo, objeto_id, usuario):
+    """Crea el trabajo (o devuelve el que ya está pendiente para el mismo objeto)."""
+    trabajo = TrabajoPurga.objects.filter(
+        tipo=tipo, objeto_id=objeto_id, estado__in=['PENDIENTE', 'EN_CURSO']
+    ).first()
+    if trabajo:
+        return trabajo
+    trabajo = TrabajoPurga(tipo=tipo, objeto_id=objeto_id, solicitado_por=usuario)
+    reservas = _reservas_de(trabajo)
+    trabajo.total = reservas.count() + Pago.objects.filter(reserva__in=reservas).count()
+    trabajo.save()
+    return trabajo
+
+
+def reclamar_trabajo(reanudar=False):
+    estados = ['PENDIENTE', 'EN_CURSO'] if reanudar else ['PENDIENTE']
+    with transaction.atomic():
+        trabajo = (
+            TrabajoPurga.objects.select_for_update(skip_locked=True)
+            .filter(estado__in=estados).order_by('id').first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = 'EN_CURSO'
+        trabajo.iniciado = trabajo.iniciado or timezone.now()
+        trabajo.save(update_fields=['estado', 'iniciado'])
+    return trabajo
+
+
+def ejecutar_purga(trabajo, lote=500, pausa=0):
+    """
+    Elimina las reservas (y sus pagos) del objeto en lotes de `lote` por
+    orden de id, cada lote en su propia transacción corta, y al final el
+    objeto. Se puede interrumpir y volver a ejecutar: continúa donde quedó.
+    """
+    try:
+        while _purgar_lote(trabajo, lote):
+            if pausa:
+                time.sleep(pausa)
+        if trabajo.tipo == 'usuario':
+            _desvincular_usuario(trabajo.objeto_id, lote)
+        with transaction.atomic():
+            _eliminar_objeto(trabajo)
+            trabajo.estado = 'COMPLETADO'
+            trabajo.terminado = timezone.now()
+            trabajo.save(update_fields=['estado', 'terminado'])
+    except Exception as exc:
+        trabajo.estado = 'FALLIDO'
+        trabajo.error = str(exc)[:1000]
+        trabajo.save(update_fields=['estado', 'error'])
+        raise
+
+
+def _purgar_lote(trabajo, lote):
+    with transaction.atomic():
+        reservas = list(_reservas_de(trabajo).select_for_update().order_by('id')[:lote])
+        if not reservas:
+            return 0
+        ids = [r.id for r in reservas]
+        clientes = {r.id: r.cliente_id for r in reservas}
+        pagos = list(Pago.objects.filter(reserva_id__in=ids).order_by('id'))
+
+        # Lo que harían las señales fila por fila, una vez por lote
+        eventos = [evento_pago(p, 'eliminado', clientes[p.reserva_id]) for p in pagos]
+        eventos += [evento_reserva(r, 'eliminado') for r in reservas]
+
+        token = purga_en_curso.set(True)
+        try:
+            Reserva.objects.filter(id__in=ids).delete()
+        finally:
+            purga_en_curso.reset(token)
+
+        registrar_eventos(eventos)
+        invalidar_usuarios(clientes.values())
+        invalidar_agenda_canchas({r.cancha_id for r in reservas})
+        recalcular_ocupacion({(r.cancha_id, r.fecha_reserva) for r in reservas})
+
+        trabajo.eliminados += len(reservas) + len(pagos)
+        trabajo.save(update_fields=['eliminados'])
+        return len(reservas)
+
+
+def _desvincular_usuario(usuario_id, lote):
+    """Quita al usuario de las reservas que atendió y los pagos que verificó."""
+    while True:
+        with transaction.atomic():
+            ids = list(Reserva.objects.filter(atendido_por_id=usuario_id).order_by('id').values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+            Reserva.objects.filter(id__in=ids).update(atendido_por=None, actualizado=timezone.now())
+            registrar_reservas_actualizadas(ids)
+            invalidar_usuarios(Reserva.objects.filter(id__in=ids).values_list('cliente_id', flat=True))
+    while True:
+        with transaction.atomic():
+            pagos = list(Pago.objects.filter(verificado_por_id=usuario_id).select_related('reserva').order_by('id')[:lote])
+            if not pagos:
+                break
+            Pago.objects.filter(id__in=[p.id for p in pagos]).update(verificado_por=None, actualizado=timezone.now())
+            clientes = {p.reserva_id: p.reserva.cliente_id for p in pagos}
+            registrar_pagos_actualizados(pagos, clientes)
+            invalidar_usuarios(clientes.values())
+
+
+def _eliminar_objeto(trabajo):
+    # Ya sin reservas, lo que queda en cascada es poco
+    if trabajo.tipo == 'cancha':
+        ListaEspera.objects.filter(cancha_id=trabajo.objeto_id).delete()
+        OcupacionDia.objects.filter(cancha_id=trabajo.objeto_id).delete()
+        Cancha.objects.filter(id=trabajo.objeto_id).delete()
+    else:
+        ListaEspera.objects.filter(cliente_id=trabajo.objeto_id).delete()
+        ClaveIdempotencia.objects.filter(usuario_id=trabajo.objeto_id).delete()
+        Usuario.objects.filter(id=trabajo.objeto_id).delete()
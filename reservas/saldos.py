@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan, LessThanOrEqual
+from django.utils import timezone
+
+from .cache import invalidar_agenda_canchas
+from .eventos import registrar_reservas_actualizadas
+from .models import Pago, Reserva
+
+# Pagos que cuentan para monto_pagado. Un abono se suma apenas se registra
+# (PENDIENTE) y deja de contar si se rechaza o se devuelve.
+ESTADOS_PAGO_VIGENTES = ('PENDIENTE', 'CONFIRMADO')
+
+
+def suma_pagos_vigentes():
+    """Expresión con la suma de pagos vigentes de la reserva externa (OuterRef)."""
+    pagos = (
+        Pago.objects.filter(reserva=OuterRef('pk'), estado_pago__in=ESTADOS_PAGO_VIGENTES)
+        .order_by()
+        .values('reserva')
+        .annotate(total=Sum('monto'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(pagos),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=8, decimal_places=2),
+    )
+
+
+def estado_por_saldo(suma):
+    """
+    Estado derivado de los pagos vigentes: PAGO_COMPLETO mientras cubran el
+    total; si dejan de cubrirlo (pago rechazado o eliminado) vuelve a
+    APROBADA, o a PENDIENTE_APROBACION si no queda ningún pago. Las
+    reservas anuladas no cambian.
+    """
+    return Case(
+        When(estado='ANULADA', then=F('estado')),
+        When(LessThanOrEqual(F('monto_total'), suma), then=Value('PAGO_COMPLETO')),
+        When(GreaterThan(suma, Value(Decimal('0'))), estado='PAGO_COMPLETO', then=Value('APROBADA')),
+        When(estado='PAGO_COMPLETO', then=Value('PENDIENTE_APROBACION')),
+        default=F('estado'),
+    )
+
+
+def recalcular_saldos(reserva_ids):
+    """
+    Único punto que escribe monto_pagado, saldo y el estado de pago: los
+    recalcula a partir de los pagos con un solo UPDATE por conjunto de reservas.
+    """
+    ids = {rid for rid in reserva_ids if rid is not None}
+    if not ids:
+        return 0
+    suma = suma_pagos_vigentes()
+    actualizadas = Reserva.objects.filter(id__in=ids).update(
+        monto_pagado=suma,
+        saldo=F('monto_total') - suma,
+        estado=estado_por_saldo(suma),
+        actualizado=timezone.now(),
+    )
+    eventos = registrar_reservas_actualizadas(ids)
+    # update() no dispara señales: el estado se muestra en los feeds de cancha
+    invalidar_agenda_canchas({evento.datos['cancha_id'] for evento in eventos})
+    return actualizadas
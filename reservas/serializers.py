@@ -1,9 +1,23 @@
 from rest_framework import serializers
-from .models import Usuario, Cancha, Reserva, Pago
+from django.urls import reverse
+from django.utils import timezone
+from datetime import time, timedelta
+from .models import Usuario, Cancha, Reserva, Pago, ListaEspera, TrabajoPurga
+from .lista_espera import horario_ocupado
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .ultimo_login import registrar_login
+
+# ----------------- TOKEN -----------------
+class TokenObtainPairDiferidoSerializer(TokenObtainPairSerializer):
+    """Registra last_login en el buffer diferido en vez de un UPDATE por login."""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        registrar_login(self.user.pk)
+        return data
+
 
 # ----------------- TOKEN CON DATOS -----------------
-class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+class MyTokenObtainPairSerializer(TokenObtainPairDiferidoSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -54,11 +68,11 @@ class ReservaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'cancha', 'cancha_detalle', 'cliente', 'atendido_por',
             'fecha_reserva', 'hora_inicio', 'hora_fin',
-            'monto_pagado', 'monto_total', 'pago_por_yape', 'yape_verificado',
+            'monto_pagado', 'monto_total', 'saldo', 'pago_por_yape', 'yape_verificado',
             'fecha_creacion', 'estado', 'motivo_anulacion',
             'cliente_username'
         ]
-        read_only_fields = ['motivo_anulacion', 'fecha_creacion']
+        read_only_fields = ['motivo_anulacion', 'fecha_creacion', 'saldo']
 
     def validate(self, data):
         user = self.context['request'].user
@@ -69,6 +83,12 @@ class ReservaSerializer(serializers.ModelSerializer):
         hora_fin = data.get('hora_fin') or getattr(self.instance, 'hora_fin', None)
         monto_pagado = data.get('monto_pagado', getattr(self.instance, 'monto_pagado', 0))
 
+        # Una cancha desactivada (DELETE) conserva sus reservas, pero no admite nuevas
+        if cancha is not None and not cancha.disponible and (
+            self.instance is None or self.instance.cancha_id != cancha.id
+        ):
+            raise serializers.ValidationError({"cancha": "La cancha no está disponible."})
+
         # Validar adelanto según política del cliente
         if user.rol == 'cliente' and not getattr(user, 'puede_reservar_sin_adelanto', False):
             if monto_pagado < 10:
@@ -112,21 +132,18 @@ class ReservaSerializer(serializers.ModelSerializer):
                     "cliente_username": "Debe especificarse un cliente."
                 })
             try:
-                cliente = Usuario.objects.get(username=cliente_username)
+                cliente = Usuario.objects.get(username=cliente_username, is_active=True)
                 validated_data['cliente'] = cliente
             except Usuario.DoesNotExist:
                 raise serializers.ValidationError({
-                    "cliente_username": "Cliente no encontrado."
+                    "cliente_username": "Cliente no encontrado o desactivado."
                 })
             # Asignar el usuario que atiende
             validated_data['atendido_por'] = usuario
 
         # ---- CÁLCULO AUTOMÁTICO DEL PRECIO ----
         cancha = validated_data['cancha']
-        hora_inicio = validated_data['hora_inicio']
-        hora_int = hora_inicio.hour
-        monto_total =  cancha.costo_dia if hora_int < 18 else cancha.costo_noche
-        validated_data['monto_total'] = monto_total
+        validated_data['monto_total'] = cancha.tarifa(validated_data['hora_inicio'])
 
         # ---- VALIDACIÓN DE ADELANTO ----
         monto_pagado = validated_data.get('monto_pagado', 0)
@@ -164,6 +181,9 @@ class ReservaSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         user = getattr(request, 'user', None)
 
+        # monto_pagado se deriva de los pagos: solo se modifica registrando abonos
+        validated_data.pop('monto_pagado', None)
+
         # --- Si el usuario es cliente ---
         if user and user.rol == 'cliente':
             nuevo_estado = validated_data.get('estado', None)
@@ -213,17 +233,26 @@ class PagoSerializer(serializers.ModelSerializer):
     verificado_por = UsuarioSerializer(read_only=True)
     cliente_username = serializers.CharField(source='reserva.cliente.username', read_only=True)
     reserva_cancha_nombre = serializers.CharField(source='reserva.cancha.nombre', read_only=True)
+    comprobante_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Pago
         fields = [
             'id', 'reserva', 'monto', 'metodo_pago',
-            'comprobante_imagen', 'estado_pago', 'fecha_pago',
+            'comprobante_imagen', 'comprobante_url', 'estado_pago', 'fecha_pago',
             'verificado_por', 'observacion',
             'cliente_username', 'reserva_cancha_nombre'
         ]
         read_only_fields = ['fecha_pago', 'verificado_por']
 
+    def get_comprobante_url(self, obj):
+        # Los comprobantes se sirven con control de permisos, no desde MEDIA_URL
+        if not obj.comprobante_imagen:
+            return None
+        url = reverse('pagos-comprobante', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
     def validate_monto(self, value):
         # Validación: no pagar más que el total pendiente de la reserva
         reserva = self.initial_data.get('reserva')
@@ -241,14 +270,117 @@ class PagoSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        # Si el pago es confirmado, actualizamos reserva
-        if instance.estado_pago == 'CONFIRMADO':
-            reserva = instance.reserva
-            reserva.monto_pagado += instance.monto
-
-            if reserva.monto_pagado >= reserva.monto_total:
-                reserva.estado = 'PAGO_COMPLETO'
-            reserva.save()
-
+        # Al guardar el pago se recalculan monto_pagado, saldo y estado de la reserva
         instance.save()
         return instance
+
+
+class VerificacionPagoSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    estado_pago = serializers.ChoiceField(choices=['CONFIRMADO', 'RECHAZADO'])
+    observacion = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class VerificacionLoteSerializer(serializers.Serializer):
+    pagos = VerificacionPagoSerializer(many=True, allow_empty=False, max_length=500)
+
+
+# ----------------- DISPONIBILIDAD -----------------
+class BusquedaDisponibilidadSerializer(serializers.Serializer):
+    """Parámetros de GET /canchas/disponibilidad/ (hora_hasta vacía = medianoche)."""
+    desde = serializers.DateField()
+    hasta = serializers.DateField(required=False)
+    hora_desde = serializers.TimeField(required=False, default=time(0, 0))
+    hora_hasta = serializers.TimeField(required=False, default=time(0, 0))
+    duracion = serializers.IntegerField(min_value=15, max_value=24 * 60, default=60)
+    deporte = serializers.ChoiceField(choices=Cancha.DEPORTE_CHOICES, required=False)
+    calidad = serializers.ChoiceField(choices=Cancha.CALIDAD_CHOICES, required=False)
+    disponible = serializers.BooleanField(default=True)
+    limite = serializers.IntegerField(min_value=1, max_value=200, default=50)
+
+    def validate(self, data):
+        data.setdefault('hasta', data['desde'])
+        if data['hasta'] < data['desde']:
+            raise serializers.ValidationError({"hasta": "Debe ser igual o posterior a 'desde'."})
+        if (data['hasta'] - data['desde']).days > 31:
+            raise serializers.ValidationError({"hasta": "El rango máximo es de 31 días."})
+        if data['duracion'] % 15:
+            raise serializers.ValidationError({"duracion": "Debe ser múltiplo de 15 minutos."})
+        # Los mapas de ocupación tienen franjas de 15 minutos
+        for campo in ('hora_desde', 'hora_hasta'):
+            if data[campo].minute % 15 or data[campo].second or data[campo].microsecond:
+                raise serializers.ValidationError({campo: "Debe caer en un múltiplo de 15 minutos (p. ej. 18:15)."})
+        if data['hora_hasta'] != time(0, 0) and data['hora_hasta'] <= data['hora_desde']:
+            raise serializers.ValidationError({"hora_hasta": "Debe ser posterior a 'hora_desde' (00:00 = medianoche)."})
+        return data
+
+
+# ----------------- REPORTES -----------------
+class ReporteDemandaSerializer(serializers.Serializer):
+    """Parámetros de GET /reportes/demanda/ (por defecto el último año hasta hoy)."""
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+
+    def validate(self, data):
+        data.setdefault('hasta', timezone.localdate())
+        data.setdefault('desde', data['hasta'] - timedelta(days=364))
+        if data['hasta'] < data['desde']:
+            raise serializers.ValidationError({"hasta": "Debe ser igual o posterior a 'desde'."})
+        # Todas las reservas del rango se cargan en memoria
+        if (data['hasta'] - data['desde']).days > 365:
+            raise serializers.ValidationError({"hasta": "El rango máximo es de 366 días."})
+        return data
+
+
+# ----------------- LOTE -----------------
+class SubsolicitudSerializer(serializers.Serializer):
+    id = serializers.CharField(max_length=50, required=False)
+    ruta = serializers.CharField(max_length=500)
+    etag = serializers.CharField(max_length=200, required=False)
+
+
+class LoteSerializer(serializers.Serializer):
+    solicitudes = SubsolicitudSerializer(many=True, allow_empty=False, max_length=20)
+
+
+# ----------------- LISTA DE ESPERA -----------------
+class ListaEsperaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ListaEspera
+        fields = ['id', 'cancha', 'cliente', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'reserva', 'creado']
+        read_only_fields = ['cliente', 'estado', 'reserva', 'creado']
+
+    def validate(self, data):
+        cancha = data['cancha']
+        if data['hora_fin'] <= data['hora_inicio']:
+            raise serializers.ValidationError({"hora_fin": "Debe ser posterior a la hora de inicio."})
+        if data['fecha'] < timezone.localdate():
+            raise serializers.ValidationError({"fecha": "La fecha ya pasó."})
+        if not cancha.disponible:
+            raise serializers.ValidationError({"cancha": "La cancha no está disponible."})
+
+        if not horario_ocupado(cancha.id, data['fecha'], data['hora_inicio'], data['hora_fin']):
+            raise serializers.ValidationError("El horario está libre: realice la reserva directamente.")
+
+        cliente = self.context['request'].user
+        if ListaEspera.objects.filter(
+            cliente=cliente, cancha=cancha, fecha=data['fecha'],
+            hora_inicio=data['hora_inicio'], hora_fin=data['hora_fin'], estado='ESPERANDO'
+        ).exists():
+            raise serializers.ValidationError("Ya estás en la lista de espera para este horario.")
+        return data
+
+
+# ----------------- PURGAS -----------------
+class TrabajoPurgaSerializer(serializers.ModelSerializer):
+    progreso = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoPurga
+        fields = ['id', 'tipo', 'objeto_id', 'estado', 'total', 'eliminados', 'progreso', 'error', 'creado', 'iniciado', 'terminado']
+
+    def get_progreso(self, obj):
+        if obj.estado == 'COMPLETADO':
+            return 100
+        # total es un estimado: puede haber reservas nuevas mientras tanto
+        return min(99, round(obj.eliminados * 100 / obj.total)) if obj.total else 0
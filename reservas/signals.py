@@ -0,0 +1,196 @@
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import invalidar_agenda_canchas, invalidar_canchas, invalidar_personal, invalidar_usuarios
+from .models import Cancha, Pago, Reserva, Usuario
+from .eventos import evento_pago, evento_reserva, registrar_eventos
+from .lista_espera import promover_lista_espera
+from .ocupacion import recalcular_ocupacion
+from .notificaciones import cancelar_recordatorio, encolar_pagos_confirmados, encolar_recordatorio
+from .saldos import recalcular_saldos
+
+
+# Mientras una purga elimina reservas por lote (reservas/purgas.py) los
+# receptores de post_delete no hacen nada: la purga registra eventos,
+# invalida cache y recalcula la ocupación una sola vez por lote.
+purga_en_curso = ContextVar('purga_en_curso', default=False)
+
+
+# ----------------- SALDOS -----------------
+@receiver([post_save, post_delete], sender=Pago)
+def recalcular_saldo_reserva(sender, instance, origin=None, **kwargs):
+    if purga_en_curso.get():
+        return
+    # Si se está eliminando la reserva (cascada) no hay saldo que mantener
+    if isinstance(origin, Reserva) or getattr(origin, 'model', None) is Reserva:
+        return
+    recalcular_saldos([instance.reserva_id])
+
+
+def cliente_de_pago(pago):
+    if Pago.reserva.is_cached(pago):
+        return pago.reserva.cliente_id
+    return (
+        Reserva.objects.filter(id=pago.reserva_id)
+        .values_list('cliente_id', flat=True)
+        .first()
+    )
+
+
+# ----------------- INVALIDACIÓN DE CACHE -----------------
+@receiver([post_save, post_delete], sender=Reserva)
+def invalidar_cache_reserva(sender, instance, **kwargs):
+    if purga_en_curso.get():
+        return
+    invalidar_usuarios([instance.cliente_id])
+    # Si la reserva cambió de cancha, también la agenda de la anterior
+    invalidar_agenda_canchas({instance.cancha_id, instance._dia_original[0]})
+
+
+@receiver([post_save, post_delete], sender=Pago)
+def invalidar_cache_pago(sender, instance, **kwargs):
+    if purga_en_curso.get():
+        return
+    invalidar_usuarios([cliente_de_pago(instance)])
+
+
+@receiver([post_save, post_delete], sender=Cancha)
+def invalidar_cache_cancha(sender, instance, **kwargs):
+    invalidar_canchas()
+    invalidar_agenda_canchas([instance.pk])
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_feeds_de_canchas(sender, instance, created, update_fields=None, **kwargs):
+    # Los feeds .ics de cancha muestran el nombre del cliente
+    if created or (update_fields and not {'first_name', 'last_name', 'username'} & set(update_fields)):
+        return
+    invalidar_agenda_canchas(
+        Reserva.objects.filter(cliente_id=instance.pk).values_list('cancha_id', flat=True).distinct()
+    )
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_cache_usuario(sender, instance, update_fields=None, **kwargs):
+    # last_login y password no forman parte de ninguna respuesta cacheada
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    # Las reservas serializadas incluyen los datos del cliente, por eso
+    # también se invalida la versión global
+    invalidar_usuarios([instance.pk])
+    if instance.rol != 'cliente':
+        # ...y los de quien las atendió, que aparecen en las de cualquier cliente
+        invalidar_personal()
+
+
+# ----------------- LISTA DE ESPERA -----------------
+@receiver(post_init, sender=Reserva)
+def recordar_estado_reserva(sender, instance, **kwargs):
+    # __dict__ para no disparar una consulta si el campo fue diferido
+    instance._estado_original = instance.__dict__.get('estado')
+
+
+@receiver(post_save, sender=Reserva)
+def al_anular_reserva(sender, instance, created, **kwargs):
+    anulada = (
+        not created
+        and instance.estado == 'ANULADA'
+        and instance._estado_original not in (None, 'ANULADA')
+    )
+    instance._estado_original = instance.estado
+    if anulada:
+        cancelar_recordatorio(instance)
+        promover_lista_espera(instance)
+
+
+# ----------------- REGISTRO DE CAMBIOS -----------------
+@receiver(post_save, sender=Reserva)
+def registrar_cambio_reserva(sender, instance, created, **kwargs):
+    registrar_eventos([evento_reserva(instance, 'creado' if created else 'actualizado')])
+
+
+@receiver(post_delete, sender=Reserva)
+def registrar_eliminacion_reserva(sender, instance, **kwargs):
+    if purga_en_curso.get():
+        return
+    registrar_eventos([evento_reserva(instance, 'eliminado')])
+
+
+@receiver(post_save, sender=Pago)
+def registrar_cambio_pago(sender, instance, created, **kwargs):
+    registrar_eventos([evento_pago(instance, 'creado' if created else 'actualizado', cliente_de_pago(instance))])
+
+
+@receiver(post_delete, sender=Pago)
+def registrar_eliminacion_pago(sender, instance, **kwargs):
+    if purga_en_curso.get():
+        return
+    registrar_eventos([evento_pago(instance, 'eliminado', cliente_de_pago(instance))])
+
+
+# ----------------- MAPAS DE OCUPACIÓN -----------------
+CAMPOS_OCUPACION = {'cancha', 'fecha_reserva', 'hora_inicio', 'hora_fin', 'estado'}
+
+
+@receiver(post_init, sender=Reserva)
+def recordar_dia_reserva(sender, instance, **kwargs):
+    instance._dia_original = (instance.__dict__.get('cancha_id'), instance.__dict__.get('fecha_reserva'))
+
+
+@receiver(post_save, sender=Reserva)
+def actualizar_ocupacion(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not CAMPOS_OCUPACION & set(update_fields):
+        return
+    # Si cambió la cancha o la fecha también se recalcula el día anterior
+    recalcular_ocupacion({instance._dia_original, (instance.cancha_id, instance.fecha_reserva)})
+    instance._dia_original = (instance.cancha_id, instance.fecha_reserva)
+
+
+@receiver(post_delete, sender=Reserva)
+def liberar_ocupacion(sender, instance, origin=None, **kwargs):
+    if purga_en_curso.get():
+        return
+    # Al eliminar la cancha sus mapas se borran en cascada
+    if isinstance(origin, Cancha) or getattr(origin, 'model', None) is Cancha:
+        return
+    recalcular_ocupacion([(instance.cancha_id, instance.fecha_reserva)])
+
+
+# ----------------- NOTIFICACIONES (outbox) -----------------
+def celular_de(user_id):
+    return Usuario.objects.filter(pk=user_id).values_list('celular', flat=True).first()
+
+
+@receiver(post_init, sender=Reserva)
+def recordar_horario_reserva(sender, instance, **kwargs):
+    instance._horario_original = (instance.__dict__.get('fecha_reserva'), instance.__dict__.get('hora_inicio'))
+
+
+@receiver(post_save, sender=Reserva)
+def programar_recordatorio(sender, instance, created, **kwargs):
+    # Se escribe en la misma transacción que la reserva: si esta se revierte,
+    # el mensaje tampoco existe
+    # (la cancelación al anular se hace en al_anular_reserva)
+    horario = (instance.fecha_reserva, instance.hora_inicio)
+    reprogramada = not created and horario != instance._horario_original
+    instance._horario_original = horario
+    if (created or reprogramada) and instance.estado != 'ANULADA':
+        encolar_recordatorio(instance, celular_de(instance.cliente_id))
+
+
+@receiver(post_init, sender=Pago)
+def recordar_estado_pago(sender, instance, **kwargs):
+    instance._estado_pago_original = instance.__dict__.get('estado_pago')
+
+
+@receiver(post_save, sender=Pago)
+def avisar_pago_confirmado(sender, instance, **kwargs):
+    confirmado = (
+        instance.estado_pago == 'CONFIRMADO'
+        and instance._estado_pago_original != 'CONFIRMADO'
+    )
+    instance._estado_pago_original = instance.estado_pago
+    if confirmado:
+        encolar_pagos_confirmados([(instance, celular_de(cliente_de_pago(instance)))])
@@ -1,3 +1,1079 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import time as hora, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Cancha, EventoCambio, ListaEspera, MensajeSaliente, OcupacionDia, Pago, Reserva, TrabajoPurga, Usuario
+from . import perfilado, purgas, ultimo_login
+from .calendario import leer_token
+from .eventos import Consumidor
+from .middleware import CODIFICADORES, codificaciones_soportadas
+from .notificaciones import ProveedorFalso, despachar_lote, reclamar_lote
+from .serializers import UsuarioSerializer
+
+
+class ArranqueTests(SimpleTestCase):
+    # Módulos pesados o de uso ocasional que se importan recién al usarlos
+    DIFERIDOS = ['numpy', 'reservas.analitica', 'reservas.perfilado', 'reservas.importacion', 'reservas.purgas']
+    SCRIPT = (
+        "import sys, django; django.setup(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns; "
+    )
+
+    def test_arranque_no_importa_modulos_diferidos(self):
+        resultado = subprocess.run(
+            [sys.executable, '-c', self.SCRIPT + "print(' '.join(sys.modules))"],
+            check=True, capture_output=True, text=True, env=os.environ.copy(),
+        )
+        importados = set(resultado.stdout.split())
+        self.assertEqual(
+            [m for m in self.DIFERIDOS if m in importados], [],
+            "revisar con: python manage.py perfil_arranque",
+        )
+
+    @skipUnless(os.environ.get('ARRANQUE_PRESUPUESTO_SEGUNDOS'), "benchmark: definir ARRANQUE_PRESUPUESTO_SEGUNDOS")
+    def test_arranque_dentro_del_presupuesto(self):
+        # Medición de tiempo: solo a pedido, en una máquina sin carga
+        presupuesto = float(os.environ['ARRANQUE_PRESUPUESTO_SEGUNDOS'])
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, '-c', self.SCRIPT], check=True, env=os.environ.copy())
+        duracion = time.perf_counter() - inicio
+        self.assertLess(
+            duracion, presupuesto,
+            f"El arranque tomó {duracion:.2f}s (presupuesto {presupuesto}s); "
+            "revisar con: python manage.py perfil_arranque"
+        )
+
+
+class ReservasTestCase(TestCase):
+    """Usuarios y una cancha comunes; las caches se limpian en cada test."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('admin', password='x', rol='administrador')
+        cls.trabajador = Usuario.objects.create_user('trabajador', password='x', rol='trabajador')
+        cls.cliente = Usuario.objects.create_user('cliente', password='x', rol='cliente', celular='999111222')
+        cls.cancha = Cancha.objects.create(
+            nombre='Cancha 1', deporte='futbol', calidad='premium', costo_dia=50, costo_noche=80,
+        )
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def api(self, usuario=None):
+        cliente = APIClient()
+        if usuario is not None:
+            cliente.force_authenticate(usuario)
+        return cliente
+
+    def reservar(self, inicio=10, fin=11, dias=1, cancha=None, cliente=None, **extra):
+        extra.setdefault('monto_total', 50)
+        return Reserva.objects.create(
+            cancha=cancha or self.cancha,
+            cliente=cliente or self.cliente,
+            fecha_reserva=timezone.localdate() + timedelta(days=dias),
+            hora_inicio=hora(inicio), hora_fin=hora(fin % 24),
+            **extra,
+        )
+
+
+# ----------------- CACHE POR USUARIO -----------------
+class CachePorUsuarioTests(ReservasTestCase):
+    def test_segundo_get_sale_de_cache_e_invalida_al_guardar(self):
+        api = self.api(self.cliente)
+        original = UsuarioSerializer.to_representation
+        with mock.patch.object(UsuarioSerializer, 'to_representation', autospec=True, side_effect=original) as serializar:
+            self.assertEqual(api.get(reverse('perfil')).data['first_name'], '')
+            api.get(reverse('perfil'))
+            self.assertEqual(serializar.call_count, 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.cliente.first_name = 'Ana'
+                self.cliente.save()
+            api.force_authenticate(self.cliente)
+            self.assertEqual(api.get(reverse('perfil')).data['first_name'], 'Ana')
+            self.assertEqual(serializar.call_count, 2)
+
+    def test_mis_reservas_refleja_cambios_de_cancha_y_de_personal(self):
+        self.reservar(atendido_por=self.trabajador)
+        api = self.api(self.cliente)
+        datos = api.get(reverse('reservas-mis')).data[0]
+        self.assertEqual(datos['cancha_detalle']['nombre'], 'Cancha 1')
+        self.assertEqual(datos['atendido_por']['first_name'], '')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cancha.nombre = 'Cancha Central'
+            self.cancha.save()
+            self.trabajador.first_name = 'Luis'
+            self.trabajador.save()
+        datos = api.get(reverse('reservas-mis')).data[0]
+        self.assertEqual(datos['cancha_detalle']['nombre'], 'Cancha Central')
+        self.assertEqual(datos['atendido_por']['first_name'], 'Luis')
+
+
+# ----------------- IDEMPOTENCIA -----------------
+class IdempotenciaTests(ReservasTestCase):
+    def test_reintento_devuelve_la_respuesta_guardada(self):
+        reserva = self.reservar()
+        api = self.api(self.cliente)
+        url = reverse('abonar-reserva', args=[reserva.id])
+
+        primera = api.post(url, {'monto': '20'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        repetida = api.post(url, {'monto': '20'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(repetida.status_code, 200)
+        self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+        self.assertEqual(repetida.data['pago_id'], primera.data['pago_id'])
+        self.assertEqual(Pago.objects.filter(reserva=reserva).count(), 1)
+
+    def test_misma_clave_con_otros_datos_es_422(self):
+        reserva = self.reservar()
+        api = self.api(self.cliente)
+        url = reverse('abonar-reserva', args=[reserva.id])
+
+        api.post(url, {'monto': '20'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        response = api.post(url, {'monto': '30'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Pago.objects.filter(reserva=reserva).count(), 1)
+
+
+# ----------------- VERIFICACIÓN DE PAGOS EN LOTE -----------------
+class VerificarPagosLoteTests(ReservasTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reserva = self.reservar()
+        self.pagos = [
+            Pago.objects.create(reserva=self.reserva, monto=monto, estado_pago='PENDIENTE')
+            for monto in (20, 30)
+        ]
+        self.url = reverse('pagos-verificar-lote')
+
+    def test_confirma_y_reporta_por_item(self):
+        response = self.api(self.trabajador).post(self.url, {'pagos': [
+            {'id': self.pagos[0].id, 'estado_pago': 'CONFIRMADO'},
+            {'id': self.pagos[1].id, 'estado_pago': 'CONFIRMADO'},
+            {'id': 999999, 'estado_pago': 'CONFIRMADO'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['ok'] for r in response.data['resultados']], [True, True, False])
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, 'PAGO_COMPLETO')
+        self.assertEqual(self.reserva.saldo, 0)
+
+    def test_un_evento_por_reserva_y_por_pago(self):
+        EventoCambio.objects.all().delete()
+        self.api(self.trabajador).post(self.url, {'pagos': [
+            {'id': pago.id, 'estado_pago': 'CONFIRMADO'} for pago in self.pagos
+        ]}, format='json')
+        eventos = list(EventoCambio.objects.values_list('entidad', 'objeto_id', 'accion'))
+        self.assertCountEqual(eventos, [
+            ('reserva', self.reserva.id, 'actualizado'),
+            *(('pago', pago.id, 'actualizado') for pago in self.pagos),
+        ])
+
+    def test_item_invalido_no_aplica_nada(self):
+        response = self.api(self.trabajador).post(self.url, {'pagos': [
+            {'id': self.pagos[0].id, 'estado_pago': 'CONFIRMADO'},
+            {'id': self.pagos[1].id, 'estado_pago': 'APROBADO'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Pago.objects.exclude(estado_pago='PENDIENTE').exists())
+
+    def test_error_a_mitad_de_lote_revierte_la_transaccion(self):
+        with mock.patch('reservas.views.encolar_pagos_confirmados', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.api(self.trabajador).post(self.url, {'pagos': [
+                    {'id': self.pagos[0].id, 'estado_pago': 'CONFIRMADO'},
+                ]}, format='json')
+        self.assertFalse(Pago.objects.exclude(estado_pago='PENDIENTE').exists())
+        self.assertFalse(EventoCambio.objects.filter(entidad='pago', accion='actualizado').exists())
+
+    def test_rechazar_un_pago_de_reserva_pagada_revierte_el_estado(self):
+        reserva = self.reservar(inicio=14, fin=15)
+        response = self.api(self.cliente).post(
+            reverse('abonar-reserva', args=[reserva.id]), {'monto': '50'}, format='json',
+        )
+        self.assertEqual(response.data['estado'], 'PAGO_COMPLETO')
+
+        response = self.api(self.trabajador).post(self.url, {'pagos': [
+            {'id': response.data['pago_id'], 'estado_pago': 'RECHAZADO'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        reserva.refresh_from_db()
+        self.assertEqual(
+            (reserva.estado, reserva.monto_pagado, reserva.saldo),
+            ('PENDIENTE_APROBACION', Decimal('0'), Decimal('50')),
+        )
+        self.assertEqual(response.data['reservas'][0]['estado'], 'PENDIENTE_APROBACION')
+
+
+# ----------------- SALDOS -----------------
+class SaldosTests(ReservasTestCase):
+    def test_saldo_se_recalcula_con_los_pagos(self):
+        reserva = self.reservar()
+        pago = Pago.objects.create(reserva=reserva, monto=20, estado_pago='PENDIENTE')
+        Pago.objects.create(reserva=reserva, monto=10, estado_pago='CONFIRMADO')
+        reserva.refresh_from_db()
+        self.assertEqual((reserva.monto_pagado, reserva.saldo), (Decimal('30'), Decimal('20')))
+
+        pago.estado_pago = 'RECHAZADO'
+        pago.save()
+        reserva.refresh_from_db()
+        self.assertEqual((reserva.monto_pagado, reserva.saldo), (Decimal('10'), Decimal('40')))
+
+    def test_estado_sigue_al_saldo(self):
+        reserva = self.reservar()
+        pago = Pago.objects.create(reserva=reserva, monto=50, estado_pago='CONFIRMADO')
+        reserva.refresh_from_db()
+        self.assertEqual(reserva.estado, 'PAGO_COMPLETO')
+
+        pago.delete()
+        reserva.refresh_from_db()
+        self.assertEqual((reserva.estado, reserva.saldo), ('PENDIENTE_APROBACION', Decimal('50')))
+
+        # Una reserva anulada no cambia de estado por sus pagos
+        Reserva.objects.filter(id=reserva.id).update(estado='ANULADA')
+        Pago.objects.create(reserva=reserva, monto=50, estado_pago='CONFIRMADO')
+        reserva.refresh_from_db()
+        self.assertEqual(reserva.estado, 'ANULADA')
+
+    def test_reconciliar_saldos_repara_una_fila_desfasada(self):
+        reserva = self.reservar()
+        Pago.objects.create(reserva=reserva, monto=20, estado_pago='CONFIRMADO')
+        Reserva.objects.filter(id=reserva.id).update(monto_pagado=0, saldo=50)
+
+        salida = StringIO()
+        call_command('reconciliar_saldos', '--reparar', stdout=salida)
+        self.assertIn('Reservas desfasadas: 1', salida.getvalue())
+        reserva.refresh_from_db()
+        self.assertEqual((reserva.monto_pagado, reserva.saldo), (Decimal('20'), Decimal('30')))
+
+    def test_abonar_con_monto_invalido_es_400(self):
+        reserva = self.reservar()
+        api = self.api(self.cliente)
+        url = reverse('abonar-reserva', args=[reserva.id])
+        for monto in ('abc', 'NaN', 'Infinity'):
+            response = api.post(url, {'monto': monto}, format='json', HTTP_IDEMPOTENCY_KEY=f'k-{monto}')
+            self.assertEqual(response.status_code, 400, monto)
+        self.assertFalse(Pago.objects.exists())
+
+
+# ----------------- THROTTLING -----------------
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'catalogo': '3/min'},
+})
+class ThrottlingTests(ReservasTestCase):
+    def test_429_despues_de_la_rafaga(self):
+        api = self.api()
+        codigos = [api.get(reverse('canchas-list-create')).status_code for _ in range(4)]
+        self.assertEqual(codigos, [200, 200, 200, 429])
+        response = api.get(reverse('canchas-list-create'))
+        self.assertEqual(response.status_code, 429)
+        # Los contadores no están en la cache compartida (tabla de la base)
+        self.assertEqual(settings.THROTTLE_CACHE, 'throttle')
+        cache.clear()
+        self.assertEqual(api.get(reverse('canchas-list-create')).status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_feeds_no_gastan_la_cuota_del_catalogo(self):
+        api = self.api()
+        for _ in range(5):
+            api.get(reverse('calendario-feed', args=['invalido']))
+        self.assertEqual(api.get(reverse('canchas-list-create')).status_code, 200)
+
+
+# ----------------- LAST_LOGIN DIFERIDO -----------------
+@override_settings(ULTIMO_LOGIN_LOTE=1)
+class UltimoLoginTests(ReservasTestCase):
+    def setUp(self):
+        super().setUp()
+        ultimo_login._pendientes.clear()
+        self.addCleanup(ultimo_login._pendientes.clear)
+
+    def test_fallo_al_volcar_no_rompe_el_login_ni_pierde_pendientes(self):
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=RuntimeError):
+            with self.assertLogs('reservas.ultimo_login', 'ERROR'):
+                response = self.api().post(reverse('custom_token_obtain_pair'), {'username': 'cliente', 'password': 'x'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.cliente.pk, ultimo_login._pendientes)
+
+        self.assertEqual(ultimo_login.volcar(), 1)
+        self.cliente.refresh_from_db()
+        self.assertIsNotNone(self.cliente.last_login)
+
+
+# ----------------- LISTA DE ESPERA -----------------
+class ListaEsperaTests(ReservasTestCase):
+    def esperar(self, inicio, fin, cliente=None):
+        return ListaEspera.objects.create(
+            cancha=self.cancha, cliente=cliente or self.cliente,
+            fecha=timezone.localdate() + timedelta(days=1),
+            hora_inicio=hora(inicio), hora_fin=hora(fin),
+        )
+
+    def test_promueve_al_anular_por_orden_de_llegada(self):
+        reserva = self.reservar(10, 12)
+        primera = self.esperar(10, 11)
+        solapada = self.esperar(10, 12, cliente=self.trabajador)
+        siguiente = self.esperar(11, 12)
+
+        reserva.estado = 'ANULADA'
+        reserva.save()
+
+        for espera in (primera, solapada, siguiente):
+            espera.refresh_from_db()
+        self.assertEqual(primera.estado, 'PROMOVIDA')
+        # Ya no entra: se solapa con la reserva recién creada para la primera
+        self.assertEqual(solapada.estado, 'ESPERANDO')
+        self.assertEqual(siguiente.estado, 'PROMOVIDA')
+        self.assertEqual(
+            (primera.reserva.hora_inicio, primera.reserva.estado),
+            (hora(10), 'PENDIENTE_APROBACION'),
+        )
+
+    def test_no_promueve_si_el_horario_sigue_ocupado(self):
+        anulada = self.reservar(10, 11)
+        self.reservar(11, 12)
+        espera = self.esperar(10, 12)
+
+        anulada.estado = 'ANULADA'
+        anulada.save()
+        espera.refresh_from_db()
+        self.assertEqual(espera.estado, 'ESPERANDO')
+
+
+# ----------------- NOTIFICACIONES (outbox) -----------------
+class NotificacionesTests(ReservasTestCase):
+    def pendientes(self):
+        return MensajeSaliente.objects.filter(estado='PENDIENTE')
+
+    def test_recordatorio_se_despacha_con_reintentos(self):
+        reserva = self.reservar(10, 11)
+        mensaje = self.pendientes().get(reserva=reserva)
+        self.assertEqual(mensaje.destinatario, '999111222')
+
+        proveedor = ProveedorFalso(fallos=1)
+        self.assertEqual(despachar_lote(proveedor), 0)  # todavía no vence
+
+        MensajeSaliente.objects.update(enviar_desde=timezone.now())
+        with self.assertLogs('reservas.notificaciones', 'WARNING'):
+            despachar_lote(proveedor)
+        mensaje.refresh_from_db()
+        self.assertEqual((mensaje.estado, mensaje.intentos), ('PENDIENTE', 1))
+        self.assertGreater(mensaje.enviar_desde, timezone.now())
+
+        MensajeSaliente.objects.update(enviar_desde=timezone.now())
+        despachar_lote(proveedor)
+        mensaje.refresh_from_db()
+        self.assertEqual(mensaje.estado, 'ENVIADO')
+        self.assertEqual(len(proveedor.enviados), 1)
+
+    def test_reprogramar_reemplaza_el_recordatorio_pendiente(self):
+        reserva = self.reservar(10, 11)
+        anterior = self.pendientes().get(reserva=reserva)
+
+        reserva = Reserva.objects.get(pk=reserva.pk)
+        reserva.hora_inicio, reserva.hora_fin = '15:30', '16:30'
+        reserva.save()
+
+        anterior.refresh_from_db()
+        self.assertEqual(anterior.estado, 'CANCELADO')
+        nuevo = self.pendientes().get(reserva=reserva)
+        self.assertIn('15:30', nuevo.contenido)
+
+    def test_anular_cancela_y_un_rollback_no_deja_mensajes(self):
+        reserva = self.reservar(10, 11)
+        reserva.estado = 'ANULADA'
+        reserva.save()
+        self.assertFalse(self.pendientes().exists())
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.reservar(12, 13)
+            raise RuntimeError
+        self.assertFalse(self.pendientes().exists())
+
+    def test_envia_con_el_mensaje_reclamado_y_retoma_reclamos_vencidos(self):
+        mensaje = self.pendientes().get(reserva=self.reservar(10, 11))
+        MensajeSaliente.objects.update(enviar_desde=timezone.now())
+
+        class ProveedorQueVerifica(ProveedorFalso):
+            def enviar(proveedor, enviado):
+                # El reclamo ya está escrito cuando se llama al proveedor
+                self.assertEqual(MensajeSaliente.objects.get(pk=enviado.pk).estado, 'EN_PROCESO')
+                super().enviar(enviado)
+
+        # Un despachador que murió después de reclamar: nadie lo toma hasta que vence
+        self.assertEqual(len(reclamar_lote(50)), 1)
+        mensaje.refresh_from_db()
+        self.assertEqual(mensaje.estado, 'EN_PROCESO')
+        self.assertEqual(reclamar_lote(50), [])
+        MensajeSaliente.objects.update(enviar_desde=timezone.now() - timedelta(seconds=1))
+
+        proveedor = ProveedorQueVerifica()
+        self.assertEqual(despachar_lote(proveedor), 1)
+        mensaje.refresh_from_db()
+        self.assertEqual(mensaje.estado, 'ENVIADO')
+        self.assertEqual(len(proveedor.enviados), 1)
+
+
+# ----------------- PERFILADO -----------------
+class PerfiladoTests(ReservasTestCase):
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.enterContext(override_settings(PERFILADO_DIR=directorio.name))
+        self.api_admin = APIClient()
+        self.api_admin.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+
+    def test_perfila_a_pedido_del_administrador(self):
+        response = self.api_admin.get(reverse('perfil'), HTTP_X_PERFILAR='1')
+        self.assertEqual(response.status_code, 200)
+        informe = self.api_admin.get(reverse('perfiles-detail', args=[response['X-Perfil-Id']]))
+        self.assertEqual(informe.data['ruta'], reverse('perfil'))
+
+    def test_con_otro_perfilado_en_curso_responde_sin_perfilar(self):
+        with perfilado._perfilando:
+            response = self.api_admin.get(reverse('perfil'), HTTP_X_PERFILAR='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Perfil-Id', response)
+
+    def test_listado_usa_el_resumen(self):
+        informe_id = self.api_admin.get(reverse('perfil'), HTTP_X_PERFILAR='1')['X-Perfil-Id']
+        # El informe completo no se abre para el listado
+        with open(perfilado._ruta(informe_id), 'w') as archivo:
+            archivo.write('{corrupto')
+        listado = self.api_admin.get(reverse('perfiles-list')).data
+        self.assertEqual([(i['id'], i['ruta']) for i in listado], [(informe_id, reverse('perfil'))])
+
+    def test_archivos_borrados_por_otro_worker_no_fallan(self):
+        ids = [self.api_admin.get(reverse('perfil'), HTTP_X_PERFILAR='1')['X-Perfil-Id'] for _ in range(2)]
+        # Otro worker borra un informe entre el listado del directorio y su lectura
+        os.remove(perfilado._ruta(ids[0]))
+        os.remove(perfilado._ruta(ids[0], 'resumen'))
+        with mock.patch.object(perfilado.os, 'listdir', return_value=[f'{i}.json' for i in ids]):
+            self.assertEqual([i['id'] for i in perfilado.listar_informes()], [ids[1]])
+        with override_settings(PERFILADO_MAX_ARCHIVOS=0):
+            with mock.patch.object(perfilado.os, 'remove', side_effect=FileNotFoundError):
+                perfilado.aplicar_retencion()
+            perfilado.aplicar_retencion()
+        self.assertEqual(perfilado.listar_informes(), [])
+
+
+# ----------------- MAPAS DE OCUPACIÓN -----------------
+class DisponibilidadTests(ReservasTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manana = timezone.localdate() + timedelta(days=1)
+
+    def buscar(self, **parametros):
+        parametros = {'desde': self.manana.isoformat(), **parametros}
+        return self.api(self.cliente).get(reverse('canchas-disponibilidad'), parametros)
+
+    def inicios(self, cancha=None, **parametros):
+        cancha = cancha or self.cancha
+        return [
+            r['hora_inicio'].strftime('%H:%M')
+            for r in self.buscar(**parametros).data if r['cancha'] == cancha.id
+        ]
+
+    def test_busca_alrededor_de_las_reservas(self):
+        self.reservar(10, 11)
+        self.assertEqual(self.inicios(hora_desde='09:00', hora_hasta='12:00'), ['09:00', '11:00'])
+
+    def test_mover_de_cancha_libera_la_anterior(self):
+        otra = Cancha.objects.create(nombre='Cancha 2', deporte='futbol', costo_dia=40, costo_noche=60)
+        reserva = self.reservar(10, 11)
+        reserva.cancha = otra
+        reserva.save()
+        self.assertEqual(self.inicios(hora_desde='10:00', hora_hasta='11:00'), ['10:00'])
+        self.assertEqual(self.inicios(otra, hora_desde='10:00', hora_hasta='11:00'), [])
+
+    def test_reserva_hasta_medianoche(self):
+        self.reservar(23, 0)
+        self.assertEqual(self.inicios(hora_desde='22:00', hora_hasta='00:00'), ['22:00'])
+        self.reservar(22, 23, dias=2)
+        resultado = self.buscar(desde=(self.manana + timedelta(days=1)).isoformat(), hora_desde='23:00').data
+        self.assertEqual([(r['hora_inicio'], r['hora_fin']) for r in resultado], [(hora(23), hora(0))])
+
+    def test_reconstruir_coincide_con_los_mapas_incrementales(self):
+        self.reservar(10, 11)
+        self.reservar(18, 20, dias=2)
+        mapas = dict(OcupacionDia.objects.values_list('fecha', 'mapa'))
+        OcupacionDia.objects.all().delete()
+        call_command('reconstruir_ocupacion', stdout=StringIO())
+        self.assertEqual(dict(OcupacionDia.objects.values_list('fecha', 'mapa')), mapas)
+
+    def test_horas_invalidas_son_400(self):
+        for parametros in ({'hora_desde': '12:00', 'hora_hasta': '10:00'}, {'hora_desde': '10:10'}, {'hora_hasta': '12:05'}):
+            self.assertEqual(self.buscar(**parametros).status_code, 400, parametros)
+        self.assertEqual(self.buscar(hora_desde='22:00', hora_hasta='00:00').status_code, 200)
+
+
+# ----------------- IMPORTACIÓN DE CLIENTES -----------------
+class ImportarClientesTests(ReservasTestCase):
+    def importar(self, contenido, **parametros):
+        archivo = SimpleUploadedFile('clientes.csv', contenido, content_type='text/csv')
+        url = reverse('usuarios-importar')
+        if parametros:
+            url += '?' + '&'.join(f'{k}={v}' for k, v in parametros.items())
+        return self.api(self.admin).post(url, {'archivo': archivo}, format='multipart')
+
+    def test_reporta_errores_duplicados_y_salta_filas_vacias(self):
+        Usuario.objects.create_user('12345678', dni='12345678', rol='cliente')
+        contenido = (
+            'nombre;apellido;dni;celular\n'
+            'Ana;Pérez;87654321;\n'
+            '\n'
+            ';;;\n'
+            'Luis;Soto;12345678;\n'          # dni ya registrado
+            'Rosa;Díaz;87654321;\n'          # repetido en el archivo
+            'Juan;;123;\n'                    # dni inválido
+            ';Sin nombre;;987654321\n'
+            'Eva;Ríos;;+51 912 345 678\n'
+        ).encode()
+        response = self.importar(contenido)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['filas'], response.data['creados']), (6, 2))
+        self.assertEqual([e['fila'] for e in response.data['errores']], [5, 6, 7, 8])
+        self.assertTrue(Usuario.objects.filter(username='cel51912345678', rol='cliente').exists())
+        self.assertFalse(Usuario.objects.get(username='87654321').has_usable_password())
+
+    def test_simular_no_crea(self):
+        response = self.importar('nombre,dni\nAna,87654321\n'.encode(), simular=1)
+        self.assertEqual(response.data['creados'], 1)
+        self.assertFalse(Usuario.objects.filter(dni='87654321').exists())
+
+    def test_archivo_no_utf8_no_inserta_nada(self):
+        filas = ''.join(f'Cliente{i},{10000000 + i}\n' for i in range(1500))
+        contenido = f'nombre,dni\n{filas}'.encode() + 'Íñigo,20000000\n'.encode('latin-1')
+        response = self.importar(contenido)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('línea 1502', response.data['error'])
+        self.assertFalse(Usuario.objects.filter(username__startswith='1000').exists())
+
+
+# ----------------- DESACTIVACIÓN Y PURGAS -----------------
+class PurgaTests(ReservasTestCase):
+    def test_delete_desactiva_sin_borrar(self):
+        self.reservar()
+        response = self.api(self.admin).delete(reverse('canchas-detail', args=[self.cancha.id]))
+        self.assertEqual(response.status_code, 204)
+        self.cancha.refresh_from_db()
+        self.assertFalse(self.cancha.disponible)
+        self.assertEqual(Reserva.objects.count(), 1)
+
+        response = self.api(self.admin).delete(reverse('usuarios-detail', args=[self.cliente.id]))
+        self.assertEqual(response.status_code, 204)
+        self.cliente.refresh_from_db()
+        self.assertFalse(self.cliente.is_active)
+
+    def test_no_se_reserva_en_cancha_ni_para_cliente_desactivados(self):
+        otra = Cancha.objects.create(nombre='Cancha 2', deporte='voley', costo_dia=40, costo_noche=60)
+        datos = {
+            'cancha': self.cancha.id, 'fecha_reserva': str(timezone.localdate() + timedelta(days=1)),
+            'hora_inicio': '10:00', 'hora_fin': '11:00', 'monto_total': 50, 'monto_pagado': 20,
+        }
+        self.assertEqual(self.api(self.admin).delete(reverse('canchas-detail', args=[self.cancha.id])).status_code, 204)
+        response = self.api(self.cliente).post(reverse('reservas-list-create'), datos, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cancha', response.data)
+
+        self.assertEqual(self.api(self.admin).delete(reverse('usuarios-detail', args=[self.cliente.id])).status_code, 204)
+        response = self.api(self.trabajador).post(reverse('reservas-list-create'), {
+            **datos, 'cancha': otra.id, 'cliente': self.cliente.id, 'cliente_username': 'cliente',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cliente', response.data)
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_purga_por_lotes(self):
+        for inicio in range(8, 13):
+            Pago.objects.create(reserva=self.reservar(inicio, inicio + 1), monto=10, estado_pago='PENDIENTE')
+        otra = Cancha.objects.create(nombre='Cancha 2', deporte='voley', costo_dia=40, costo_noche=60)
+        conservada = self.reservar(cancha=otra)
+
+        response = self.api(self.admin).delete(reverse('canchas-detail', args=[self.cancha.id]) + '?purgar=1')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['total'], 10)
+
+        with mock.patch.object(purgas, '_purgar_lote', wraps=purgas._purgar_lote) as lote:
+            call_command('ejecutar_purgas', '--lote', '2', stdout=StringIO())
+        # 3 lotes con reservas y uno vacío que termina el ciclo
+        self.assertEqual(lote.call_count, 4)
+
+        trabajo = TrabajoPurga.objects.get(pk=response.data['id'])
+        self.assertEqual((trabajo.estado, trabajo.eliminados), ('COMPLETADO', 10))
+        self.assertFalse(Cancha.objects.filter(pk=self.cancha.id).exists())
+        self.assertEqual(list(Reserva.objects.values_list('id', flat=True)), [conservada.id])
+        self.assertEqual(EventoCambio.objects.filter(accion='eliminado', entidad='reserva').count(), 5)
+        self.assertFalse(OcupacionDia.objects.filter(cancha_id=self.cancha.id).exists())
+
+
+# ----------------- LOTE -----------------
+class LoteTests(ReservasTestCase):
+    def lote(self, usuario, *solicitudes):
+        response = self.api(usuario).post(reverse('lote'), {'solicitudes': list(solicitudes)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['resultados']
+
+    def test_ejecuta_solo_vistas_permitidas(self):
+        resultados = self.lote(
+            self.cliente,
+            {'id': 'perfil', 'ruta': reverse('perfil')},
+            {'ruta': reverse('usuarios-list-create')},
+            {'ruta': '/no-existe/'},
+        )
+        self.assertEqual([r['status'] for r in resultados], [200, 404, 404])
+        self.assertEqual(resultados[0]['id'], 'perfil')
+        self.assertEqual(resultados[0]['datos']['username'], 'cliente')
+
+    def test_cada_subsolicitud_verifica_permisos(self):
+        resultados = self.lote(self.cliente, {'ruta': reverse('agenda')}, {'ruta': reverse('reservas-mis')})
+        self.assertEqual([r['status'] for r in resultados], [403, 200])
+        self.assertEqual(self.lote(self.trabajador, {'ruta': reverse('agenda')})[0]['status'], 200)
+
+    def test_etag_devuelve_304(self):
+        primero = self.lote(self.cliente, {'ruta': reverse('canchas-list-create')})[0]
+        segundo = self.lote(self.cliente, {'ruta': reverse('canchas-list-create'), 'etag': primero['etag']})[0]
+        self.assertEqual((segundo['status'], segundo['datos']), (304, None))
+        self.assertEqual(segundo['etag'], primero['etag'])
+
+
+# ----------------- CALENDARIO (iCalendar) -----------------
+class CalendarioTests(ReservasTestCase):
+    def enlace(self, usuario, metodo='get', **parametros):
+        response = getattr(self.api(usuario), metodo)(reverse('calendario-enlace') + (
+            '?' + '&'.join(f'{k}={v}' for k, v in parametros.items()) if parametros else ''
+        ))
+        self.assertEqual(response.status_code, 200)
+        return response.data['url']
+
+    @staticmethod
+    def token(url):
+        return leer_token(url.rsplit('/', 1)[1][:-len('.ics')])
+
+    def test_token_invalido_o_alterado_es_404(self):
+        url = self.enlace(self.cliente)
+        self.assertEqual(self.api().get(url).status_code, 200)
+        token = url.rsplit('/', 1)[1][:-len('.ics')]
+        alterado = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+        for token in (alterado, 'invalido'):
+            self.assertEqual(self.api().get(reverse('calendario-feed', args=[token])).status_code, 404)
+
+    def test_etag_y_last_modified(self):
+        reserva = self.reservar()
+        api = self.api()
+        url = self.enlace(self.cliente)
+        response = api.get(url)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn(f'UID:reserva-{reserva.id}@sisreservas', response.content.decode())
+
+        self.assertEqual(api.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(api.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        # Last-Modified sale de los datos, no del momento en que se generó el feed
+        cache.clear()
+        self.assertEqual(api.get(url)['Last-Modified'], response['Last-Modified'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.hora_fin = hora(12)
+            reserva.save()
+        self.assertEqual(api.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_feed_de_cancha_sin_celular_y_con_nombres_al_dia(self):
+        self.reservar()
+        url = self.enlace(self.trabajador, cancha=self.cancha.id)
+        contenido = self.api().get(url).content.decode()
+        self.assertIn('Cancha 1: cliente', contenido)
+        self.assertNotIn('999111222', contenido)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.first_name = 'Ana'
+            self.cliente.save(update_fields=['first_name'])
+        self.assertIn('Cancha 1: Ana', self.api().get(url).content.decode())
+
+    def test_rotar_revoca_el_enlace_anterior(self):
+        for usuario, parametros in ((self.cliente, {}), (self.trabajador, {'cancha': self.cancha.id})):
+            anterior = self.enlace(usuario, **parametros)
+            # Primero queda cacheado con el enlace anterior
+            self.assertEqual(self.api().get(anterior).status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                nuevo = self.enlace(usuario, 'post', **parametros)
+            self.assertNotEqual(anterior, nuevo)
+            self.assertEqual(self.api().get(anterior).status_code, 404)
+            self.assertEqual(self.api().get(nuevo).status_code, 200)
+            # La firma lleva la hora: se compara el contenido del token
+            self.assertEqual(self.token(self.enlace(usuario, **parametros)), self.token(nuevo))
+
+
+# ----------------- REGISTRO DE CAMBIOS -----------------
+class EventosTests(ReservasTestCase):
+    def test_feed_por_cursor_y_permisos(self):
+        reserva = self.reservar()
+        Pago.objects.create(reserva=reserva, monto=10, estado_pago='PENDIENTE')
+        self.assertEqual(self.api(self.cliente).get(reverse('eventos')).status_code, 403)
+
+        api = self.api(self.trabajador)
+        datos = api.get(reverse('eventos')).data
+        acciones = [(e['entidad'], e['accion']) for e in datos['eventos']]
+        # El pago recalcula el saldo de la reserva
+        self.assertEqual(acciones, [('reserva', 'creado'), ('reserva', 'actualizado'), ('pago', 'creado')])
+        self.assertEqual(datos['siguiente'], datos['eventos'][-1]['id'])
+
+        datos = api.get(reverse('eventos'), {'despues': datos['siguiente']}).data
+        self.assertEqual((datos['eventos'], datos['siguiente']), ([], datos['siguiente']))
+        solo_pagos = api.get(reverse('eventos'), {'entidad': 'pago'}).data['eventos']
+        self.assertEqual({e['entidad'] for e in solo_pagos}, {'pago'})
+        self.assertEqual(api.get(reverse('eventos'), {'despues': 'x'}).status_code, 400)
+
+    def test_un_hueco_reciente_detiene_la_lectura_hasta_el_margen(self):
+        for inicio in (8, 10, 12):
+            self.reservar(inicio, inicio + 1)
+        ids = list(EventoCambio.objects.order_by('id').values_list('id', flat=True))
+        # Un id intermedio todavía sin confirmar (o revertido)
+        EventoCambio.objects.filter(id=ids[1]).delete()
+        api = self.api(self.trabajador)
+        self.assertEqual([e['id'] for e in api.get(reverse('eventos')).data['eventos']], ids[:1])
+
+        EventoCambio.objects.update(creado=timezone.now() - timedelta(seconds=settings.EVENTOS_MARGEN_SEGUNDOS + 1))
+        self.assertEqual([e['id'] for e in api.get(reverse('eventos')).data['eventos']], [ids[0], *ids[2:]])
+
+    def test_confirmacion_tardia_se_registra(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.reservar()
+        tarde = timezone.now() + timedelta(seconds=settings.EVENTOS_MARGEN_SEGUNDOS + 1)
+        with self.assertLogs('reservas.eventos', 'ERROR'), mock.patch('reservas.eventos.timezone.now', return_value=tarde):
+            for callback in callbacks:
+                callback()
+
+    def test_consumidor_avanza_solo_si_el_manejador_termina(self):
+        for inicio in (8, 10, 12):
+            self.reservar(inicio, inicio + 1)
+        consumidor = Consumidor('reportes')
+        with self.assertRaises(RuntimeError):
+            consumidor.procesar(mock.Mock(side_effect=RuntimeError))
+        self.assertEqual(consumidor.posicion(), 0)
+
+        lotes = []
+        self.assertEqual(consumidor.procesar_todo(lotes.append, limite=2), 3)
+        self.assertEqual([len(lote) for lote in lotes], [2, 1])
+        self.assertEqual(consumidor.posicion(), lotes[-1][-1].id)
+        self.assertEqual(consumidor.procesar(lotes.append), 0)
+
+
+# ----------------- SINCRONIZACIÓN INCREMENTAL -----------------
+class SyncTests(ReservasTestCase):
+    def sync(self, usuario, token=None):
+        response = self.api(usuario).get(reverse('sync'), {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_delta_con_cambios_y_eliminados(self):
+        conservada = self.reservar(8, 9)
+        borrada = self.reservar(10, 11)
+        otro = Usuario.objects.create_user('otro', password='x', rol='cliente')
+        self.reservar(12, 13, cliente=otro)
+
+        completo = self.sync(self.cliente)
+        self.assertEqual({r['id'] for r in completo['reservas']}, {conservada.id, borrada.id})
+        self.assertEqual(self.sync(self.cliente, completo['token'])['reservas'], [])
+
+        pago = Pago.objects.create(reserva=conservada, monto=10, estado_pago='PENDIENTE')
+        borrada_id = borrada.id
+        borrada.delete()
+        delta = self.sync(self.cliente, completo['token'])
+        self.assertEqual([r['id'] for r in delta['reservas']], [conservada.id])
+        self.assertEqual([p['id'] for p in delta['pagos']], [pago.id])
+        self.assertEqual(delta['eliminados'], {'reservas': [borrada_id], 'pagos': []})
+        self.assertEqual(self.sync(self.cliente, delta['token'])['eliminados'], {'reservas': [], 'pagos': []})
+
+    def test_cambio_confirmado_tarde_llega_en_el_delta_siguiente(self):
+        self.reservar(8, 9)
+        tarde = self.reservar(10, 11)
+        # El evento de `tarde` tiene id menor que uno ya visible, pero aún no confirmó
+        evento = EventoCambio.objects.filter(objeto_id=tarde.id, entidad='reserva').get()
+        self.reservar(12, 13)
+        EventoCambio.objects.filter(id=evento.id).delete()
+        token = self.sync(self.cliente)['token']
+
+        evento.save()
+        self.assertIn(tarde.id, [r['id'] for r in self.sync(self.cliente, token)['reservas']])
+
+    def test_token_invalido_o_vencido(self):
+        token = self.sync(self.cliente)['token']
+        response = self.api(self.cliente).get(reverse('sync'), {'since': token + 'x'})
+        self.assertEqual(response.status_code, 400)
+        with override_settings(SYNC_TOKEN_DURACION=timedelta(seconds=-1)):
+            response = self.api(self.cliente).get(reverse('sync'), {'since': token})
+        self.assertEqual(response.status_code, 410)
+
+
+# ----------------- COMPROBANTES -----------------
+class ComprobantesTests(ReservasTestCase):
+    CONTENIDO = b'0123456789' * 10
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.media = directorio.name
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.pago = Pago.objects.create(reserva=self.reservar(), monto=10, estado_pago='PENDIENTE')
+        self.pago.comprobante_imagen.save('yape.jpg', SimpleUploadedFile('yape.jpg', self.CONTENIDO))
+        self.url = reverse('pagos-comprobante', args=[self.pago.id])
+
+    def test_permisos_y_nombre_por_contenido(self):
+        otro = Usuario.objects.create_user('otro', password='x', rol='cliente')
+        self.assertEqual(self.api(otro).get(self.url).status_code, 403)
+        for usuario in (self.cliente, self.trabajador):
+            response = self.api(usuario).get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), self.CONTENIDO)
+        digest = hashlib.sha256(self.CONTENIDO).hexdigest()
+        self.assertEqual(self.pago.comprobante_imagen.name, f'comprobantes/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        self.assertEqual(response['ETag'], f'"{digest}"')
+
+    def test_condicional_y_rangos(self):
+        api = self.api(self.cliente)
+        etag = api.get(self.url)['ETag']
+        self.assertEqual(api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = api.get(self.url, HTTP_RANGE='bytes=10-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-14/{len(self.CONTENIDO)}')
+        self.assertEqual(b''.join(response.streaming_content), b'01234')
+        self.assertEqual(b''.join(api.get(self.url, HTTP_RANGE='bytes=-3').streaming_content), b'789')
+        self.assertEqual(api.get(self.url, HTTP_RANGE='bytes=500-').status_code, 416)
+        # If-Range de otra versión: archivo completo
+        self.assertEqual(api.get(self.url, HTTP_RANGE='bytes=10-14', HTTP_IF_RANGE='"otro"').status_code, 200)
+
+    @override_settings(COMPROBANTES_ENVIO='nginx')
+    def test_nginx_entrega_los_bytes(self):
+        response = self.api(self.cliente).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/media-protegido/' + self.pago.comprobante_imagen.name)
+        self.assertEqual(response.content, b'')
+
+    def test_mover_comprobantes_desde_la_raiz_anterior(self):
+        anterior = tempfile.TemporaryDirectory()
+        self.addCleanup(anterior.cleanup)
+        os.makedirs(os.path.join(anterior.name, 'comprobantes'))
+        with open(os.path.join(anterior.name, 'comprobantes', 'viejo.jpg'), 'wb') as archivo:
+            archivo.write(b'viejo')
+        viejo = Pago.objects.create(reserva=self.pago.reserva, monto=5, estado_pago='PENDIENTE')
+        Pago.objects.filter(pk=viejo.pk).update(comprobante_imagen='comprobantes/viejo.jpg')
+
+        salida = StringIO()
+        call_command('mover_comprobantes', '--desde', anterior.name, stdout=salida)
+        self.assertIn('Movidos: 1. No encontrados: 0', salida.getvalue())
+        self.assertTrue(os.path.isfile(os.path.join(self.media, 'comprobantes', 'viejo.jpg')))
+        response = self.api(self.cliente).get(reverse('pagos-comprobante', args=[viejo.id]))
+        self.assertEqual(b''.join(response.streaming_content), b'viejo')
+
+
+# ----------------- COMPRESIÓN -----------------
+@override_settings(COMPRESION_MIN_BYTES=200)
+class CompresionTests(ReservasTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for numero in range(2, 12):
+            Cancha.objects.create(nombre=f'Cancha {numero}', deporte='futbol', costo_dia=50, costo_noche=80)
+
+    def get(self, **cabeceras):
+        return self.client.get(reverse('canchas-list-create'), **cabeceras)
+
+    def test_negocia_segun_accept_encoding(self):
+        plano = self.get()
+        self.assertFalse(plano.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plano['Vary'])
+
+        casos = [('gzip', 'gzip', gzip.decompress)]
+        if 'br' in codificaciones_soportadas():
+            import brotli
+            casos.append(('br, gzip', 'br', brotli.decompress))
+        if 'zstd' in codificaciones_soportadas():
+            import zstandard
+            casos.append(('zstd;q=1, gzip;q=0.5', 'zstd', zstandard.ZstdDecompressor().decompress))
+        for aceptadas, esperada, descomprimir in casos:
+            response = self.get(HTTP_ACCEPT_ENCODING=aceptadas)
+            self.assertEqual(response['Content-Encoding'], esperada)
+            self.assertEqual(descomprimir(response.content), plano.content)
+
+        self.assertFalse(self.get(HTTP_ACCEPT_ENCODING='gzip;q=0').has_header('Content-Encoding'))
+        with override_settings(COMPRESION_MIN_BYTES=10 ** 6):
+            self.assertFalse(self.get(HTTP_ACCEPT_ENCODING='gzip').has_header('Content-Encoding'))
+
+    def test_mismo_etag_en_el_200_comprimido_y_en_el_304(self):
+        comprimido = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(comprimido['Content-Encoding'], 'gzip')
+        no_modificado = self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=comprimido['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual(no_modificado['ETag'], comprimido['ETag'])
+        self.assertEqual(self.get()['ETag'], comprimido['ETag'])
+
+    def test_cuerpo_comprimido_se_cachea_por_etag(self):
+        with mock.patch.dict(CODIFICADORES, gzip=mock.Mock(wraps=CODIFICADORES['gzip'])) as codificadores:
+            primera = self.get(HTTP_ACCEPT_ENCODING='gzip')
+            segunda = self.get(HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(codificadores['gzip'].call_count, 1)
+        self.assertEqual(primera.content, segunda.content)
+
+
+# ----------------- REPORTES -----------------
+class ReporteDemandaTests(ReservasTestCase):
+    def test_forma_del_mapa_y_del_pronostico(self):
+        # Dos lunes seguidos de 18:00 a 20:00 y una anulada
+        lunes = timezone.localdate() - timedelta(days=timezone.localdate().weekday() + 14)
+        for semana in (0, 1):
+            Reserva.objects.create(
+                cancha=self.cancha, cliente=self.cliente, fecha_reserva=lunes + timedelta(weeks=semana),
+                hora_inicio=hora(18), hora_fin=hora(20), monto_total=80,
+            )
+        Reserva.objects.create(
+            cancha=self.cancha, cliente=self.cliente, fecha_reserva=lunes,
+            hora_inicio=hora(8), hora_fin=hora(9), monto_total=50, estado='ANULADA',
+        )
+        hasta = lunes + timedelta(days=13)
+        response = self.api(self.admin).get(reverse('reportes-demanda'), {'desde': lunes, 'hasta': hasta})
+        self.assertEqual(response.status_code, 200)
+
+        cancha = response.data['canchas'][0]
+        self.assertEqual((cancha['reservas'], cancha['anuladas'], cancha['horas_reservadas']), (3, 1, 4.0))
+        self.assertEqual(len(cancha['ocupacion']), 7)
+        self.assertEqual({len(fila) for fila in cancha['ocupacion']}, {24})
+        self.assertEqual(cancha['ocupacion'][0][18:20], [1.0, 1.0])
+        self.assertEqual(cancha['ocupacion'][0][8], 0.0)
+
+        pronostico = cancha['pronostico']
+        self.assertEqual([p['fecha'] for p in pronostico], [hasta + timedelta(days=j) for j in range(1, 8)])
+        self.assertEqual(pronostico[0]['horas'], 2.0)
+        self.assertEqual({p['horas'] for p in pronostico[1:]}, {0.0})
+
+    def test_rango_y_permisos(self):
+        api = self.api(self.admin)
+        self.assertEqual(api.get(reverse('reportes-demanda'), {'desde': '2025-01-01', 'hasta': '2026-06-01'}).status_code, 400)
+        self.assertEqual(api.get(reverse('reportes-demanda'), {'desde': '2025-02-01', 'hasta': '2025-01-01'}).status_code, 400)
+        self.assertEqual(api.get(reverse('reportes-demanda'), {'desde': 'ayer'}).status_code, 400)
+        respuesta = api.get(reverse('reportes-demanda')).data
+        self.assertEqual((respuesta['hasta'] - respuesta['desde']).days, 364)
+        self.assertEqual(self.api(self.trabajador).get(reverse('reportes-demanda')).status_code, 403)
+
+
+# ----------------- AGENDA -----------------
+class AgendaTests(ReservasTestCase):
+    def test_formato_columnar_y_304(self):
+        reserva = self.reservar(22, 0, dias=0)
+        Reserva.objects.create(
+            cancha=self.cancha, cliente=self.cliente, fecha_reserva=reserva.fecha_reserva,
+            hora_inicio=hora(8), hora_fin=hora(9), monto_total=50, estado='ANULADA',
+        )
+        api = self.api(self.trabajador)
+        response = api.get(reverse('agenda'), {'semana': reserva.fecha_reserva.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        lunes = reserva.fecha_reserva - timedelta(days=reserva.fecha_reserva.weekday())
+        base = (reserva.fecha_reserva - lunes).days * 1440
+        self.assertEqual(response.data['semana'], lunes.isoformat())
+        # Las anuladas no aparecen; la que termina a medianoche cierra el día
+        self.assertEqual(response.data['canchas'], {str(self.cancha.id): {
+            'inicio': [base + 22 * 60], 'fin': [base + 1440],
+            'estado': [response.data['estados'].index('PENDIENTE_APROBACION')], 'id': [reserva.id],
+        }})
+
+        iso = reserva.fecha_reserva.strftime('%G-W%V')
+        self.assertEqual(api.get(reverse('agenda'), {'semana': iso}).data['semana'], lunes.isoformat())
+        self.assertEqual(api.get(reverse('agenda'), {'semana': 'x'}).status_code, 400)
+        self.assertEqual(self.api(self.cliente).get(reverse('agenda')).status_code, 403)
+        no_modificado = api.get(reverse('agenda'), {'semana': lunes.isoformat()}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+
+    def test_mover_de_cancha_actualiza_agenda_y_feeds(self):
+        otra = Cancha.objects.create(nombre='Cancha 2', deporte='futbol', costo_dia=50, costo_noche=80)
+        reserva = self.reservar()
+        api = self.api(self.trabajador)
+        semana = {'semana': reserva.fecha_reserva.isoformat()}
+        self.assertIn(str(self.cancha.id), api.get(reverse('agenda'), semana).data['canchas'])
+        feeds = {}
+        for cancha in (self.cancha, otra):
+            feeds[cancha.id] = api.get(reverse('calendario-enlace'), {'cancha': cancha.id}).data['url']
+            self.api().get(feeds[cancha.id])  # quedan en cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.cancha = otra
+            reserva.save()
+        self.assertEqual(list(api.get(reverse('agenda'), semana).data['canchas']), [str(otra.id)])
+        uid = f'UID:reserva-{reserva.id}@sisreservas'
+        self.assertNotIn(uid, self.api().get(feeds[self.cancha.id]).content.decode())
+        self.assertIn(uid, self.api().get(feeds[otra.id]).content.decode())
+
+
+# ----------------- ADMIN -----------------
+class PaginadorAdminTests(ReservasTestCase):
+    TOTAL = 250
+
+    def setUp(self):
+        super().setUp()
+        superusuario = Usuario.objects.create_superuser('root', password='x', rol='administrador')
+        self.client.force_login(superusuario)
+        hoy = timezone.localdate()
+        # bulk_create: sin señales, solo filas
+        Reserva.objects.bulk_create(
+            Reserva(
+                cancha=self.cancha, cliente=self.cliente, fecha_reserva=hoy + timedelta(days=i),
+                hora_inicio=hora(10), hora_fin=hora(11), monto_total=50,
+            )
+            for i in range(self.TOTAL)
+        )
+        self.url = reverse('admin:reservas_reserva_changelist')
+
+    def estimacion(self, filas):
+        conexion = mock.MagicMock(vendor='postgresql')
+        conexion.cursor.return_value.__enter__.return_value.fetchone.return_value = (filas,)
+        return mock.patch('reservas.paginacion.connections', {'default': conexion})
+
+    def test_changelist_con_conteo_exacto_bajo_el_umbral(self):
+        response = self.client.get(self.url, {'p': 2})
+        self.assertEqual(response.status_code, 200)
+        paginador = response.context['cl'].paginator
+        self.assertEqual(paginador.count, self.TOTAL)
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+
+    def test_changelist_usa_la_estimacion_en_tablas_grandes(self):
+        with self.estimacion(1_000_000), CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].paginator.count, 1_000_000)
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+        tabla = Reserva._meta.db_table
+        self.assertFalse([
+            c['sql'] for c in consultas
+            if 'COUNT(' in c['sql'].upper() and tabla in c['sql'] and 'WHERE' not in c['sql'].upper()
+        ])
+
+        # Con filtros la estimación no aplica: COUNT(*) exacto
+        with self.estimacion(1_000_000):
+            response = self.client.get(self.url, {'estado__exact': 'ANULADA'})
+        self.assertEqual(response.context['cl'].paginator.count, 0)
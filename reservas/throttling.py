@@ -0,0 +1,127 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class VentanaDeslizanteThrottle(BaseThrottle):
+    """
+    Throttle por ventana deslizante. La tasa se toma de
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope] con el formato de DRF
+    ("10/min"): hasta 10 solicitudes en cualquier intervalo de un minuto.
+
+    Se cuenta con un contador por periodo fijo en la cache THROTTLE_CACHE
+    (cache.add + cache.incr) y el periodo anterior se pondera por la parte
+    que todavía cae dentro de la ventana. A diferencia de un token bucket,
+    que guarda (fichas, instante) y necesita leer y reescribir ambos, solo
+    usa incrementos, que son atómicos en locmem, redis y memcached: dos
+    requests simultáneos no pueden gastar la misma cuota.
+    """
+    scope = None
+    # Métodos HTTP a limitar (None = todos)
+    metodos = None
+    PERIODOS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def __init__(self):
+        tasa = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if tasa is None:
+            raise ImproperlyConfigured(f"No hay tasa definida para el scope '{self.scope}'.")
+        cantidad, periodo = tasa.split('/')
+        self.capacidad = int(cantidad)
+        self.periodo = self.PERIODOS[periodo[0]]
+        self.espera = None
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def allow_request(self, request, view):
+        if self.metodos is not None and request.method not in self.metodos:
+            return True
+
+        ident = self.get_cache_key(request, view)
+        if ident is None:
+            return True
+
+        store = caches[settings.THROTTLE_CACHE]
+        numero, transcurrido = divmod(time.time(), self.periodo)
+        numero = int(numero)
+        clave = f'cuota:{self.scope}:{ident}:{numero}'
+        # El contador solo hace falta durante este periodo y el siguiente
+        store.add(clave, 0, self.periodo * 2)
+        try:
+            actual = store.incr(clave)
+        except ValueError:
+            # Expiró entre add e incr
+            store.set(clave, 1, self.periodo * 2)
+            actual = 1
+        anterior = store.get(f'cuota:{self.scope}:{ident}:{numero - 1}', 0)
+        peso = 1 - transcurrido / self.periodo
+        if anterior * peso + actual <= self.capacidad:
+            return True
+
+        # Rechazada: no consume cuota
+        store.decr(clave)
+        exceso = anterior * peso + actual - self.capacidad
+        restante = self.periodo - transcurrido
+        self.espera = min(exceso * self.periodo / anterior, restante) if anterior else restante
+        return False
+
+    def wait(self):
+        return self.espera
+
+
+class IPThrottle(VentanaDeslizanteThrottle):
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UsuarioThrottle(VentanaDeslizanteThrottle):
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'u{request.user.pk}'
+        return self.get_ident(request)
+
+
+# ----------------- LOGIN -----------------
+class LoginIPThrottle(IPThrottle):
+    scope = 'login'
+
+
+class LoginUsuarioThrottle(VentanaDeslizanteThrottle):
+    """Limita intentos contra una misma cuenta aunque vengan de varias IPs."""
+    scope = 'login_usuario'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        return hashlib.md5(str(username).lower().encode()).hexdigest()
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginUsuarioThrottle]
+
+
+# ----------------- RESERVAS / CANCHAS -----------------
+class ReservaThrottle(UsuarioThrottle):
+    scope = 'reserva'
+    metodos = ('POST',)
+
+
+class AbonarThrottle(UsuarioThrottle):
+    scope = 'abonar'
+
+
+class CatalogoThrottle(IPThrottle):
+    scope = 'catalogo'
+    metodos = ('GET',)
+
+
+class CalendarioThrottle(IPThrottle):
+    # Las apps de calendario consultan el feed periódicamente: cuota propia
+    # para no gastar la de navegación de la misma IP
+    scope = 'calendario'
+    metodos = ('GET',)
@@ -0,0 +1,105 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Buffer en memoria {user_id: momento del último login}. Se vuelca con un
+# solo UPDATE cuando acumula ULTIMO_LOGIN_LOTE usuarios o pasan
+# ULTIMO_LOGIN_INTERVALO segundos desde el último volcado; un hilo del
+# proceso también lo vuelca cada ULTIMO_LOGIN_INTERVALO aunque no haya
+# más logins, así que un kill del worker pierde como máximo ese intervalo.
+_lock = threading.Lock()
+_pendientes = {}
+_ultimo_volcado = time.monotonic()
+_hilo = None
+
+
+def registrar_login(user_id, momento=None):
+    with _lock:
+        _pendientes[user_id] = momento or timezone.now()
+        debe_volcar = (
+            len(_pendientes) >= settings.ULTIMO_LOGIN_LOTE
+            or time.monotonic() - _ultimo_volcado >= settings.ULTIMO_LOGIN_INTERVALO
+        )
+    _iniciar_hilo()
+    if debe_volcar:
+        volcar_seguro()
+
+
+def volcar_seguro():
+    # El volcado corre dentro de un login ajeno: un error no debe hacerlo
+    # fallar (volcar() ya devolvió los pendientes al buffer)
+    try:
+        volcar()
+    except Exception:
+        logger.exception("No se pudo volcar last_login")
+
+
+def volcar():
+    global _pendientes, _ultimo_volcado
+    with _lock:
+        pendientes, _pendientes = _pendientes, {}
+        _ultimo_volcado = time.monotonic()
+    if not pendientes:
+        return 0
+
+    from .models import Usuario
+
+    try:
+        ids = list(pendientes)
+        for i in range(0, len(ids), 500):
+            bloque = ids[i:i + 500]
+            Usuario.objects.filter(pk__in=bloque).update(last_login=Case(
+                *[When(pk=pk, then=Value(pendientes[pk])) for pk in bloque],
+                output_field=DateTimeField(),
+            ))
+    except Exception:
+        # Devolver al buffer lo que no se pudo escribir (sin pisar logins más nuevos)
+        with _lock:
+            for pk, momento in pendientes.items():
+                _pendientes.setdefault(pk, momento)
+        raise
+    return len(pendientes)
+
+
+def _volcado_periodico():
+    from django.db import connection
+
+    while True:
+        time.sleep(settings.ULTIMO_LOGIN_INTERVALO)
+        if _pendientes:
+            volcar_seguro()
+            # Conexión propia del hilo: no dejarla abierta hasta el próximo volcado
+            connection.close()
+
+
+def _iniciar_hilo():
+    global _hilo
+    if _hilo is not None:
+        return
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_volcado_periodico, name='ultimo-login', daemon=True)
+            _hilo.start()
+
+
+def _reiniciar_en_hijo():
+    # Un worker creado con fork no debe heredar logins pendientes del master
+    # (ni su hilo, que no existe en el hijo)
+    global _pendientes, _lock, _hilo
+    _lock = threading.Lock()
+    _pendientes = {}
+    _hilo = None
+
+
+# gunicorn termina los workers con sys.exit (también por timeout), así que
+# atexit corre; solo un SIGKILL pierde lo pendiente desde el último volcado
+atexit.register(volcar_seguro)
+os.register_at_fork(after_in_child=_reiniciar_en_hijo)
@@ -1,27 +1,37 @@
 from django.urls import path
 from .views import (
-    UsuarioListCreateView, UsuarioDetailView, PerfilView,
-    CanchaListCreateView, CanchaDetailView,
+    UsuarioListCreateView, UsuarioDetailView, UsuarioImportarView, PerfilView,
+    CanchaListCreateView, CanchaDetailView, DisponibilidadCanchasView,
     ReservaListCreateView, ReservaDetailView, MisReservasView, ReservasConSaldoView, AbonarReservaView,
-    PagoListCreateView, PagoDetailView,
+    ListaEsperaListCreateView, ListaEsperaDetailView,
+    AgendaView, EnlaceCalendarioView, FeedCalendarioView, EventosView, SyncView, LoteView, ReporteDemandaView, PerfilListView, PerfilDetailView,
+    TrabajoPurgaListView, TrabajoPurgaDetailView,
+    PagoListCreateView, PagoDetailView, VerificarPagosLoteView, ComprobantePagoView,
     MyTokenObtainPairView
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .serializers import TokenObtainPairDiferidoSerializer
+from .throttling import LOGIN_THROTTLES
 
 
 urlpatterns = [
     # ----------------- AUTENTICACIÓN JWT -----------------
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', TokenObtainPairView.as_view(
+        serializer_class=TokenObtainPairDiferidoSerializer,
+        throttle_classes=LOGIN_THROTTLES,
+    ), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('login/', MyTokenObtainPairView.as_view(), name='custom_token_obtain_pair'),
 
     # ----------------- USUARIOS -----------------
     path('usuarios/', UsuarioListCreateView.as_view(), name='usuarios-list-create'),
+    path('usuarios/importar/', UsuarioImportarView.as_view(), name='usuarios-importar'),
     path('usuarios/<int:pk>/', UsuarioDetailView.as_view(), name='usuarios-detail'),
     path('perfil/', PerfilView.as_view(), name='perfil'),
 
     # ----------------- CANCHAS -----------------
     path('canchas/', CanchaListCreateView.as_view(), name='canchas-list-create'),
+    path('canchas/disponibilidad/', DisponibilidadCanchasView.as_view(), name='canchas-disponibilidad'),
     path('canchas/<int:pk>/', CanchaDetailView.as_view(), name='canchas-detail'),
 
     # ----------------- RESERVAS -----------------
@@ -31,7 +41,40 @@ urlpatterns = [
     path('reservas/<int:pk>/', ReservaDetailView.as_view(), name='reservas-detail'),
     path('reservas/', ReservaListCreateView.as_view(), name='reservas-list-create'),
 
+    # ----------------- LISTA DE ESPERA -----------------
+    path('lista-espera/', ListaEsperaListCreateView.as_view(), name='lista-espera-list-create'),
+    path('lista-espera/<int:pk>/', ListaEsperaDetailView.as_view(), name='lista-espera-detail'),
+
+    # ----------------- AGENDA -----------------
+    path('agenda/', AgendaView.as_view(), name='agenda'),
+
+    # ----------------- CALENDARIO -----------------
+    path('calendario/enlace/', EnlaceCalendarioView.as_view(), name='calendario-enlace'),
+    path('calendario/<str:token>.ics', FeedCalendarioView.as_view(), name='calendario-feed'),
+
+    # ----------------- REGISTRO DE CAMBIOS -----------------
+    path('eventos/', EventosView.as_view(), name='eventos'),
+
+    # ----------------- SINCRONIZACIÓN -----------------
+    path('sync/', SyncView.as_view(), name='sync'),
+
+    # ----------------- LOTE -----------------
+    path('lote/', LoteView.as_view(), name='lote'),
+
+    # ----------------- REPORTES -----------------
+    path('reportes/demanda/', ReporteDemandaView.as_view(), name='reportes-demanda'),
+
+    # ----------------- PURGAS -----------------
+    path('purgas/', TrabajoPurgaListView.as_view(), name='purgas-list'),
+    path('purgas/<int:pk>/', TrabajoPurgaDetailView.as_view(), name='purgas-detail'),
+
+    # ----------------- PERFILADO -----------------
+    path('perfiles/', PerfilListView.as_view(), name='perfiles-list'),
+    path('perfiles/<str:informe_id>/', PerfilDetailView.as_view(), name='perfiles-detail'),
+
     # ----------------- PAGOS -----------------
     path('pagos/', PagoListCreateView.as_view(), name='pagos-list-create'),
+    path('pagos/verificar-lote/', VerificarPagosLoteView.as_view(), name='pagos-verificar-lote'),
     path('pagos/<int:pk>/', PagoDetailView.as_view(), name='pagos-detail'),
+    path('pagos/<int:pk>/comprobante/', ComprobantePagoView.as_view(), name='pagos-comprobante'),
 ]
@@ -2,19 +2,61 @@ from rest_framework import generics, permissions, serializers, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction
 from django.db.models import F
-from .models import Cancha, Reserva, Pago, Usuario
-from .serializers import CanchaSerializer, ReservaSerializer, PagoSerializer, UsuarioSerializer, MyTokenObtainPairSerializer
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from .models import Cancha, Reserva, Pago, Usuario, ListaEspera, EventoCambio, TrabajoPurga
+from .serializers import CanchaSerializer, ReservaSerializer, PagoSerializer, UsuarioSerializer, MyTokenObtainPairSerializer, VerificacionLoteSerializer, ListaEsperaSerializer, BusquedaDisponibilidadSerializer, ReporteDemandaSerializer, TrabajoPurgaSerializer, LoteSerializer
 from .permissions import EsAdministrador, EsTrabajador, EsCliente, PuedeEditarReserva
-from decimal import Decimal
+from .cache import CachePorUsuarioMixin, VERSION_CANCHAS, VERSION_GLOBAL_RESERVAS, VERSION_PERSONAL, etag_coincide, invalidar_agenda_canchas, invalidar_usuarios, obtener_version
+from .almacenamiento import servir_archivo
+from .saldos import recalcular_saldos
+from .eventos import leer_eventos, marca_de_agua, registrar_pagos_actualizados
+from .idempotencia import idempotente
+from .notificaciones import encolar_pagos_confirmados
+from .ocupacion import buscar_horarios
+from .lote import ejecutar_lote
+from .calendario import ICalendarRenderer, feed, leer_token, token_feed
+from .throttling import LOGIN_THROTTLES, AbonarThrottle, CalendarioThrottle, CatalogoThrottle, ReservaThrottle
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 # ----------------- token -----------------
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_classes = LOGIN_THROTTLES
 
 
 Usuario = get_user_model()
+# ----------------- DESACTIVACIÓN -----------------
+class DesactivarMixin:
+    """
+    DELETE no borra en línea (la cascada de reservas y pagos puede ser
+    enorme): marca el objeto como inactivo y, con ?purgar=1, encola la
+    eliminación definitiva para el comando ejecutar_purgas.
+    """
+    campo_activo = None
+    tipo_purga = None
+
+    def destroy(self, request, *args, **kwargs):
+        instancia = self.get_object()
+        if getattr(instancia, self.campo_activo):
+            setattr(instancia, self.campo_activo, False)
+            instancia.save(update_fields=[self.campo_activo])
+
+        if request.query_params.get('purgar') == '1':
+            from .purgas import encolar_purga
+            trabajo = encolar_purga(self.tipo_purga, instancia.pk, request.user)
+            return Response(TrabajoPurgaSerializer(trabajo).data, status=status.HTTP_202_ACCEPTED)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 # ----------------- USUARIOS -----------------
 class UsuarioListCreateView(generics.ListCreateAPIView):
     queryset = Usuario.objects.all()
@@ -27,43 +69,123 @@ class UsuarioListCreateView(generics.ListCreateAPIView):
         # Por defecto, todo registro desde el endpoint es cliente
         serializer.save(rol='cliente')
 
-class UsuarioDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UsuarioDetailView(DesactivarMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     permission_classes = [EsAdministrador]
+    campo_activo = 'is_active'
+    tipo_purga = 'usuario'
+
+class UsuarioImportarView(APIView):
+    """
+    Importa clientes desde un CSV (columnas nombre, apellido, dni, celular)
+    con reservas/importacion.py. Con ?simular=1 solo valida.
+    """
+    permission_classes = [EsAdministrador]
+
+    def post(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({"error": "Debe enviar el archivo CSV en el campo 'archivo'."}, status=status.HTTP_400_BAD_REQUEST)
 
-class PerfilView(APIView):
+        from .importacion import importar_clientes, leer_archivo_subido, linea_no_utf8
+        # Se valida antes de insertar: los lotes se confirman a medida que se leen
+        linea = linea_no_utf8(archivo)
+        if linea is not None:
+            return Response({"error": f"El archivo debe estar en UTF-8 (línea {linea})."}, status=status.HTTP_400_BAD_REQUEST)
+
+        reporte = importar_clientes(
+            leer_archivo_subido(archivo),
+            simular=request.query_params.get('simular') == '1',
+        )
+        return Response(reporte)
+
+class PerfilView(CachePorUsuarioMixin, generics.RetrieveAPIView):
+    serializer_class = UsuarioSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_alcance = 'perfil'
+    cache_global_para_staff = False
 
-    def get(self, request):
-        serializer = UsuarioSerializer(request.user)
-        return Response(serializer.data)
+    def get_object(self):
+        return self.request.user
 
 # ----------------- CANCHAS -----------------
 class CanchaListCreateView(generics.ListCreateAPIView):
     queryset = Cancha.objects.all()
     serializer_class = CanchaSerializer
+    throttle_classes = [CatalogoThrottle]
 
     def get_permissions(self):
         if self.request.method == 'POST':
             return [EsAdministrador()]
         return [permissions.AllowAny()]
 
-class CanchaDetailView(generics.RetrieveUpdateDestroyAPIView):
+    def list(self, request, *args, **kwargs):
+        # El catálogo cambia poco: ETag por versión y cuerpo cacheado. Débil
+        # (W/) porque identifica los datos, no los bytes: es el mismo con o
+        # sin compresión (CompresionMiddleware), en el 200 y en el 304
+        version = obtener_version(VERSION_CANCHAS)
+        etag = f'W/"canchas-{version}"'
+        if etag_coincide(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            clave = f'canchas:{version}'
+            data = cache.get(clave)
+            if data is None:
+                data = self.get_serializer(self.get_queryset(), many=True).data
+                cache.set(clave, data, 3600)
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, no-cache'
+        return response
+
+class DisponibilidadCanchasView(APIView):
+    """
+    Busca horarios libres en varias canchas y días a la vez usando los mapas
+    de ocupación (reservas/ocupacion.py), del más barato al más caro.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [CatalogoThrottle]
+
+    def get(self, request):
+        serializer = BusquedaDisponibilidadSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+
+        canchas = Cancha.objects.filter(disponible=datos['disponible'])
+        if 'deporte' in datos:
+            canchas = canchas.filter(deporte=datos['deporte'])
+        if 'calidad' in datos:
+            canchas = canchas.filter(calidad=datos['calidad'])
+
+        resultados = buscar_horarios(
+            canchas, datos['desde'], datos['hasta'],
+            datos['hora_desde'], datos['hora_hasta'], datos['duracion'], datos['limite'],
+        )
+        return Response(resultados)
+
+class CanchaDetailView(DesactivarMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Cancha.objects.all()
     serializer_class = CanchaSerializer
     permission_classes = [EsAdministrador]
+    campo_activo = 'disponible'
+    tipo_purga = 'cancha'
 
 # ----------------- RESERVAS -----------------
 class ReservaListCreateView(generics.ListCreateAPIView):
     queryset = Reserva.objects.all()
     serializer_class = ReservaSerializer
+    throttle_classes = [ReservaThrottle]
 
     def get_queryset(self):
         user = self.request.user
         if user.rol == 'cliente':
             return Reserva.objects.filter(cliente=user)
         return Reserva.objects.all()
+
+    @idempotente
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         usuario = self.request.user
@@ -87,10 +209,10 @@ class ReservaListCreateView(generics.ListCreateAPIView):
                 })
 
             try:
-                cliente_obj = Usuario.objects.get(id=cliente_id, rol='cliente')
+                cliente_obj = Usuario.objects.get(id=cliente_id, rol='cliente', is_active=True)
             except Usuario.DoesNotExist:
                 raise serializers.ValidationError({
-                    "cliente": "El usuario indicado no existe o no es cliente."
+                    "cliente": "El usuario indicado no existe, no es cliente o está desactivado."
                 })
 
             serializer.save(cliente=cliente_obj)
@@ -104,9 +226,12 @@ class ReservaDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [PuedeEditarReserva]
 
 # ----------------- MIS RESERVAS (solo cliente) -----------------
-class MisReservasView(generics.ListAPIView):
+class MisReservasView(CachePorUsuarioMixin, generics.ListAPIView):
     serializer_class = ReservaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_alcance = 'mis-reservas'
+    # Las reservas serializadas incluyen la cancha y quién las atendió
+    cache_dependencias = (VERSION_CANCHAS, VERSION_PERSONAL)
 
     def get_queryset(self):
         user = self.request.user
@@ -119,18 +244,18 @@ class MisReservasView(generics.ListAPIView):
         return Reserva.objects.all().order_by('-fecha_reserva')
 
 
-class ReservasConSaldoView(generics.ListAPIView):
+class ReservasConSaldoView(CachePorUsuarioMixin, generics.ListAPIView):
     serializer_class = ReservaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_alcance = 'con-saldo'
+    # Las reservas serializadas incluyen la cancha y quién las atendió
+    cache_dependencias = (VERSION_CANCHAS, VERSION_PERSONAL)
 
     def get_queryset(self):
         user = self.request.user
 
         # Filtrar reservas aprobadas con saldo pendiente
-        queryset = Reserva.objects.filter(
-            estado='APROBADA',
-            monto_pagado__lt=F('monto_total')  # monto_pagado < monto_total
-        )
+        queryset = Reserva.objects.filter(estado='APROBADA', saldo__gt=0)
 
         # Si es cliente, solo sus reservas
         if user.rol == 'cliente':
@@ -142,7 +267,9 @@ class ReservasConSaldoView(generics.ListAPIView):
 
 class AbonarReservaView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [AbonarThrottle]
 
+    @idempotente
     def post(self, request, reserva_id):
         try:
             reserva = Reserva.objects.get(id=reserva_id)
@@ -162,31 +289,30 @@ class AbonarReservaView(APIView):
             return Response({"error": "Se requiere el monto a abonar."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-           monto = Decimal(str(monto))
-        except ValueError:
+            monto = Decimal(str(monto))
+            if not monto.is_finite():
+                raise InvalidOperation
+        except (InvalidOperation, ValueError):
             return Response({"error": "Monto inválido."}, status=status.HTTP_400_BAD_REQUEST)
 
         if monto <= 0:
             return Response({"error": "El monto debe ser mayor que 0."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Crear registro de pago
-        pago = Pago.objects.create(
-            reserva=reserva,
-            monto=monto,
-            metodo_pago=metodo_pago,
-            estado_pago="PENDIENTE",
-        )
-
-        # Actualizar monto pagado de la reserva
-        reserva.monto_pagado += monto
-
-        # Si ya alcanza el total → marcar como PAGO_COMPLETO
-        if reserva.monto_pagado >= reserva.calcular_monto_total:
-            reserva.estado = "PAGO_COMPLETO"
-        else:
-            reserva.estado = "APROBADA"
+        with transaction.atomic():
+            # Crear registro de pago (monto_pagado se recalcula a partir de los pagos)
+            pago = Pago.objects.create(
+                reserva=reserva,
+                monto=monto,
+                metodo_pago=metodo_pago,
+                estado_pago="PENDIENTE",
+            )
+            # El estado PAGO_COMPLETO se deriva del saldo al registrar el pago
+            reserva.refresh_from_db(fields=['monto_pagado', 'saldo', 'estado'])
 
-        reserva.save()
+            # Un abono parcial aprueba la reserva
+            if reserva.estado == "PENDIENTE_APROBACION":
+                reserva.estado = "APROBADA"
+                reserva.save(update_fields=['estado'])
 
         return Response({
             "reserva_id": reserva.id,
@@ -196,6 +322,371 @@ class AbonarReservaView(APIView):
         })
     
 
+# ----------------- LISTA DE ESPERA -----------------
+class ListaEsperaListCreateView(generics.ListCreateAPIView):
+    serializer_class = ListaEsperaSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = ListaEspera.objects.order_by('-creado')
+        if user.rol == 'cliente':
+            return queryset.filter(cliente=user)
+        return queryset
+
+    def perform_create(self, serializer):
+        serializer.save(cliente=self.request.user)
+
+
+class ListaEsperaDetailView(generics.RetrieveDestroyAPIView):
+    serializer_class = ListaEsperaSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.rol == 'cliente':
+            return ListaEspera.objects.filter(cliente=user)
+        return ListaEspera.objects.all()
+
+    def perform_destroy(self, instance):
+        # Salir de la lista: se conserva el registro como CANCELADA
+        if instance.estado == 'ESPERANDO':
+            instance.estado = 'CANCELADA'
+            instance.save(update_fields=['estado'])
+
+
+# ----------------- AGENDA (grilla semanal) -----------------
+class AgendaView(APIView):
+    """
+    Agenda semanal compacta en formato columnar: por cancha, arreglos de
+    minutos de inicio/fin (desde el lunes 00:00), códigos de estado e ids.
+    """
+    permission_classes = [EsTrabajador]
+    ESTADOS = [codigo for codigo, _ in Reserva.ESTADO_RESERVA_CHOICES if codigo != 'ANULADA']
+
+    def get(self, request):
+        semana = request.query_params.get('semana')
+        try:
+            lunes = self.inicio_semana(semana)
+        except ValueError:
+            return Response(
+                {"error": "Parámetro semana inválido (use AAAA-MM-DD o AAAA-Www)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        version = obtener_version(VERSION_GLOBAL_RESERVAS)
+        etag = f'W/"agenda-{lunes.isoformat()}-{version}"'
+        if etag_coincide(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        clave = f'agenda:{lunes.isoformat()}:{version}'
+        data = cache.get(clave)
+        if data is None:
+            data = self.construir(lunes)
+            cache.set(clave, data, 3600)
+
+        response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @staticmethod
+    def inicio_semana(semana):
+        if not semana:
+            dia = timezone.localdate()
+        elif '-W' in semana:
+            dia = datetime.strptime(f'{semana}-1', '%G-W%V-%u').date()
+        else:
+            dia = date.fromisoformat(semana)
+        return dia - timedelta(days=dia.weekday())
+
+    def construir(self, lunes):
+        codigos = {estado: i for i, estado in enumerate(self.ESTADOS)}
+        filas = (
+            Reserva.objects.filter(
+                fecha_reserva__gte=lunes,
+                fecha_reserva__lt=lunes + timedelta(days=7),
+                estado__in=self.ESTADOS,
+            )
+            .order_by('cancha_id', 'fecha_reserva', 'hora_inicio')
+            .values_list('cancha_id', 'fecha_reserva', 'hora_inicio', 'hora_fin', 'estado', 'id')
+        )
+
+        canchas = {}
+        for cancha_id, fecha, hora_inicio, hora_fin, estado, reserva_id in filas:
+            columnas = canchas.get(cancha_id)
+            if columnas is None:
+                columnas = canchas[cancha_id] = {"inicio": [], "fin": [], "estado": [], "id": []}
+            base = (fecha - lunes).days * 1440
+            inicio = base + hora_inicio.hour * 60 + hora_inicio.minute
+            fin = base + hora_fin.hour * 60 + hora_fin.minute
+            if fin <= inicio:
+                # Termina a medianoche
+                fin += 1440
+            columnas["inicio"].append(inicio)
+            columnas["fin"].append(fin)
+            columnas["estado"].append(codigos[estado])
+            columnas["id"].append(reserva_id)
+
+        return {
+            "semana": lunes.isoformat(),
+            "estados": self.ESTADOS,
+            "canchas": {str(cancha_id): columnas for cancha_id, columnas in canchas.items()},
+        }
+
+
+# ----------------- CALENDARIO (iCalendar) -----------------
+class EnlaceCalendarioView(APIView):
+    """
+    URL del feed .ics para suscribirse desde una app de calendario. El
+    cliente obtiene el suyo; trabajadores y administradores pueden pedir
+    el de una cancha (?cancha=<id>) o el de un cliente (?cliente=<id>).
+    Con POST se genera un enlace nuevo y los anteriores dejan de funcionar.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    MODELOS = {'cliente': Usuario, 'cancha': Cancha}
+
+    def get(self, request):
+        return self.enlace(request, rotar=False)
+
+    def post(self, request):
+        return self.enlace(request, rotar=True)
+
+    def enlace(self, request, rotar):
+        user = request.user
+        tipo, objeto_id = 'cliente', user.pk
+        for parametro in ('cancha', 'cliente'):
+            valor = request.query_params.get(parametro)
+            if valor is None:
+                continue
+            if user.rol == 'cliente':
+                return Response({"error": "No autorizado."}, status=status.HTTP_403_FORBIDDEN)
+            if not valor.isdigit():
+                return Response({"error": f"Parámetro {parametro} inválido."}, status=status.HTTP_400_BAD_REQUEST)
+            tipo, objeto_id = parametro, int(valor)
+
+        objetos = self.MODELOS[tipo].objects.filter(pk=objeto_id)
+        with transaction.atomic():
+            if rotar and objetos.update(calendario_version=F('calendario_version') + 1):
+                # El feed cacheado con el enlace anterior deja de servirse
+                if tipo == 'cliente':
+                    invalidar_usuarios([objeto_id], global_reservas=False)
+                else:
+                    invalidar_agenda_canchas([objeto_id])
+            version = objetos.values_list('calendario_version', flat=True).first()
+        if version is None:
+            return Response({"error": "No encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        ruta = reverse('calendario-feed', kwargs={'token': token_feed(tipo, objeto_id, version)})
+        return Response({"url": request.build_absolute_uri(ruta)})
+
+
+class FeedCalendarioView(APIView):
+    """
+    Feed .ics autenticado por el token firmado de la URL (las apps de
+    calendario no envían el JWT). Responde 304 con If-None-Match o
+    If-Modified-Since mientras la versión de datos no cambie.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [ICalendarRenderer]
+    throttle_classes = [CalendarioThrottle]
+
+    def get(self, request, token):
+        try:
+            tipo, objeto_id, version_enlace = leer_token(token)
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        resultado = feed(tipo, objeto_id, version_enlace)
+        if resultado is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        cuerpo, etag, ultima = resultado
+
+        if request.META.get('HTTP_IF_NONE_MATCH'):
+            no_modificado = etag_coincide(request, etag)
+        else:
+            desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            no_modificado = None not in (desde, ultima) and int(ultima.timestamp()) <= desde
+        response = Response(status=status.HTTP_304_NOT_MODIFIED) if no_modificado else Response(cuerpo)
+        response['ETag'] = etag
+        if ultima is not None:
+            response['Last-Modified'] = http_date(ultima.timestamp())
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+# ----------------- REGISTRO DE CAMBIOS -----------------
+class EventosView(APIView):
+    """Lee el registro de cambios a partir de un id (?despues=<id>&limite=&entidad=)."""
+    permission_classes = [EsTrabajador]
+
+    def get(self, request):
+        try:
+            despues = int(request.query_params.get('despues', 0))
+            limite = min(int(request.query_params.get('limite', 500)), 1000)
+        except ValueError:
+            return Response({"error": "despues y limite deben ser enteros."}, status=status.HTTP_400_BAD_REQUEST)
+
+        eventos = leer_eventos(despues, limite, entidad=request.query_params.get('entidad'))
+        return Response({
+            "eventos": [
+                {
+                    "id": e.id, "entidad": e.entidad, "objeto_id": e.objeto_id, "accion": e.accion,
+                    "cliente_id": e.cliente_id, "datos": e.datos, "creado": e.creado,
+                }
+                for e in eventos
+            ],
+            "siguiente": eventos[-1].id if eventos else despues,
+        })
+
+
+# ----------------- SINCRONIZACIÓN INCREMENTAL -----------------
+class SyncView(APIView):
+    """
+    Sincronización para la app móvil. Sin ?since= devuelve todas las
+    reservas y pagos visibles para el usuario; con el token de la respuesta
+    anterior devuelve solo lo creado, modificado o eliminado desde entonces
+    (las reservas anuladas llegan como cambios con estado ANULADA).
+
+    El token guarda la marca de agua del registro de cambios (ver
+    reservas.eventos.marca_de_agua), no una hora: un cambio que confirma
+    tarde aparece en el delta siguiente aunque su hora sea anterior.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    SALT = 'reservas.sync'
+
+    def get(self, request):
+        user = request.user
+        desde = None
+        since = request.query_params.get('since')
+        if since:
+            try:
+                desde = self.leer_token(since)
+            except signing.SignatureExpired:
+                return Response(
+                    {"error": "Token since vencido: sincronice de nuevo sin since."},
+                    status=status.HTTP_410_GONE
+                )
+            except (signing.BadSignature, KeyError, TypeError, ValueError):
+                return Response({"error": "Token since inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Antes de leer los datos: lo que cambie mientras tanto se repite en el próximo delta
+        hasta = marca_de_agua(desde or 0)
+        reservas = Reserva.objects.select_related('cancha', 'cliente', 'atendido_por')
+        pagos = Pago.objects.select_related('reserva__cliente', 'reserva__cancha', 'verificado_por')
+        if user.rol == 'cliente':
+            reservas = reservas.filter(cliente=user)
+            pagos = pagos.filter(reserva__cliente=user)
+
+        borrados = {"reservas": [], "pagos": []}
+        if desde is not None:
+            eventos = EventoCambio.objects.filter(id__gt=desde, id__lte=hasta)
+            if user.rol == 'cliente':
+                eventos = eventos.filter(cliente_id=user.id)
+            cambiados = {'reserva': set(), 'pago': set()}
+            for entidad, objeto_id in eventos.values_list('entidad', 'objeto_id').distinct():
+                cambiados[entidad].add(objeto_id)
+            reservas = reservas.filter(id__in=cambiados['reserva'])
+            pagos = pagos.filter(id__in=cambiados['pago'])
+            # Lo que tuvo eventos y ya no existe fue eliminado
+            existentes = {
+                'reserva': set(Reserva.objects.filter(id__in=cambiados['reserva']).values_list('id', flat=True)),
+                'pago': set(Pago.objects.filter(id__in=cambiados['pago']).values_list('id', flat=True)),
+            }
+            for entidad, ids in cambiados.items():
+                borrados[f'{entidad}s'] = sorted(ids - existentes[entidad])
+
+        contexto = {'request': request}
+        return Response({
+            "reservas": ReservaSerializer(reservas.order_by('actualizado'), many=True, context=contexto).data,
+            "pagos": PagoSerializer(pagos.order_by('actualizado'), many=True, context=contexto).data,
+            "eliminados": borrados,
+            "token": signing.dumps({'e': hasta}, salt=self.SALT),
+        })
+
+    def leer_token(self, since):
+        datos = signing.loads(since, salt=self.SALT, max_age=settings.SYNC_TOKEN_DURACION)
+        if 'e' in datos:
+            return int(datos['e'])
+        # Tokens anteriores, con la hora de la sincronización
+        hora = datetime.fromisoformat(datos['t']) - timedelta(seconds=settings.EVENTOS_MARGEN_SEGUNDOS)
+        return (
+            EventoCambio.objects.filter(creado__lte=hora)
+            .order_by('-id').values_list('id', flat=True).first()
+        ) or 0
+
+
+# ----------------- LOTE -----------------
+class LoteView(APIView):
+    """
+    Varias lecturas en un solo request (p. ej. al abrir la app: perfil,
+    canchas, mis reservas y saldo). La autenticación se hace una vez y cada
+    resultado trae su status, su ETag y sus datos.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = LoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({"resultados": ejecutar_lote(request, serializer.validated_data['solicitudes'])})
+
+
+# ----------------- REPORTES -----------------
+class ReporteDemandaView(APIView):
+    """
+    Ocupación por día de la semana y hora, tasa de anulación y pronóstico
+    de demanda por cancha (ver reservas/analitica.py). Por defecto cubre el
+    último año hasta hoy, con un máximo de 366 días.
+    """
+    permission_classes = [EsAdministrador]
+
+    def get(self, request):
+        serializer = ReporteDemandaSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+
+        # Import diferido: NumPy solo se carga al pedir el reporte
+        from .analitica import reporte_demanda
+        return Response(reporte_demanda(datos['desde'], datos['hasta']))
+
+
+# ----------------- PURGAS -----------------
+class TrabajoPurgaListView(generics.ListAPIView):
+    queryset = TrabajoPurga.objects.order_by('-id')
+    serializer_class = TrabajoPurgaSerializer
+    permission_classes = [EsAdministrador]
+
+
+class TrabajoPurgaDetailView(generics.RetrieveAPIView):
+    """Progreso de una purga encolada con DELETE ...?purgar=1."""
+    queryset = TrabajoPurga.objects.all()
+    serializer_class = TrabajoPurgaSerializer
+    permission_classes = [EsAdministrador]
+
+
+# ----------------- PERFILADO -----------------
+class PerfilListView(APIView):
+    """Informes guardados por el perfilado a pedido (más recientes primero)."""
+    permission_classes = [EsAdministrador]
+
+    def get(self, request):
+        from .perfilado import listar_informes
+        return Response(listar_informes())
+
+
+class PerfilDetailView(APIView):
+    permission_classes = [EsAdministrador]
+
+    def get(self, request, informe_id):
+        from .perfilado import leer_informe
+        informe = leer_informe(informe_id)
+        if informe is None:
+            return Response({"error": "Informe no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(informe)
+
+
 # ----------------- PAGOS -----------------
 class PagoListCreateView(generics.ListCreateAPIView):
     serializer_class = PagoSerializer
@@ -213,3 +704,94 @@ class PagoDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Pago.objects.all()
     serializer_class = PagoSerializer
     permission_classes = [EsTrabajador]
+
+
+class ComprobantePagoView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        pago = Pago.objects.select_related('reserva').filter(pk=pk).first()
+        if pago is None:
+            return Response({"error": "Pago no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        # Permitir: cliente dueño, trabajador o admin
+        if pago.reserva.cliente_id != request.user.id and request.user.rol not in ["trabajador", "administrador"]:
+            return Response(
+                {"error": "No tienes permisos para ver este comprobante."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        archivo = pago.comprobante_imagen
+        response = servir_archivo(request, archivo.storage, archivo.name) if archivo else None
+        if response is None:
+            return Response({"error": "El pago no tiene comprobante."}, status=status.HTTP_404_NOT_FOUND)
+        return response
+
+
+class VerificarPagosLoteView(APIView):
+    """
+    Verifica o rechaza varios pagos en una sola transacción. Las reservas
+    afectadas se bloquean con una sola consulta y su monto_pagado/saldo se
+    recalcula con un solo UPDATE para todas ellas.
+    """
+    permission_classes = [EsTrabajador]
+
+    def post(self, request):
+        serializer = VerificacionLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['pagos']
+
+        resultados = []
+        ahora = timezone.now()
+        with transaction.atomic():
+            pagos = Pago.objects.select_for_update().in_bulk([item['id'] for item in items])
+            reservas = Reserva.objects.select_for_update().in_bulk({p.reserva_id for p in pagos.values()})
+
+            pagos_modificados = {}
+            for item in items:
+                pago = pagos.get(item['id'])
+                if pago is None:
+                    resultados.append({"id": item['id'], "ok": False, "error": "Pago no encontrado."})
+                    continue
+                if pago.id in pagos_modificados:
+                    resultados.append({"id": pago.id, "ok": False, "error": "Pago repetido en el lote."})
+                    continue
+                if pago.estado_pago != 'PENDIENTE':
+                    resultados.append({"id": pago.id, "ok": False, "error": f"El pago ya está {pago.estado_pago}."})
+                    continue
+
+                pago.estado_pago = item['estado_pago']
+                pago.verificado_por = request.user
+                pago.actualizado = ahora
+                if 'observacion' in item:
+                    pago.observacion = item['observacion']
+                pagos_modificados[pago.id] = pago
+                resultados.append({"id": pago.id, "ok": True, "estado_pago": pago.estado_pago, "reserva_id": pago.reserva_id})
+
+            Pago.objects.bulk_update(pagos_modificados.values(), ['estado_pago', 'verificado_por', 'observacion', 'actualizado'])
+
+            # Un solo UPDATE recalcula monto_pagado, saldo y estado de las
+            # reservas afectadas (y registra sus eventos)
+            reserva_ids = {p.reserva_id for p in pagos_modificados.values()}
+            recalcular_saldos(reserva_ids)
+            reservas_modificadas = list(Reserva.objects.filter(id__in=reserva_ids).order_by('id'))
+
+            # bulk_update no dispara señales: registrar los cambios en lote
+            clientes = {rid: reservas[rid].cliente_id for rid in reserva_ids}
+            registrar_pagos_actualizados(pagos_modificados.values(), clientes)
+
+            celulares = dict(Usuario.objects.filter(id__in=set(clientes.values())).values_list('id', 'celular'))
+            encolar_pagos_confirmados(
+                (p, celulares.get(clientes[p.reserva_id]))
+                for p in pagos_modificados.values() if p.estado_pago == 'CONFIRMADO'
+            )
+
+            invalidar_usuarios(clientes.values())
+
+        return Response({
+            "resultados": resultados,
+            "reservas": [
+                {"id": r.id, "monto_pagado": r.monto_pagado, "estado": r.estado}
+                for r in reservas_modificadas
+            ],
+        })
@@ -20,7 +20,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 env = environ.Env(
     DEBUG=(bool, False)
 )
-environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
+# En producción las variables vienen del entorno: solo se lee .env si existe
+if os.path.exists(os.path.join(BASE_DIR, '.env')):
+    environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -62,7 +64,8 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),      # Token de refresco dura 7 días
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
-    "UPDATE_LAST_LOGIN": True,
+    # last_login se escribe en lotes desde reservas.ultimo_login
+    "UPDATE_LAST_LOGIN": False,
 
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
@@ -74,11 +77,26 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Usadas por los throttles de reservas/throttling.py
+    'DEFAULT_THROTTLE_RATES': {
+        'login': env('THROTTLE_LOGIN', default='10/min'),
+        'login_usuario': env('THROTTLE_LOGIN_USUARIO', default='5/min'),
+        'reserva': env('THROTTLE_RESERVA', default='20/min'),
+        'abonar': env('THROTTLE_ABONAR', default='20/min'),
+        'catalogo': env('THROTTLE_CATALOGO', default='120/min'),
+        'calendario': env('THROTTLE_CALENDARIO', default='30/min'),
+    },
+    # Cantidad de proxies delante de gunicorn (para leer X-Forwarded-For)
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=None),
 }
 
+# Alias de CACHES donde se guardan los contadores de los throttles (ver CACHES)
+THROTTLE_CACHE = env('THROTTLE_CACHE', default='throttle')
+
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'reservas.middleware.CompresionMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -87,9 +105,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'reservas.middleware.PerfiladoMiddleware',
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Compresión de respuestas (reservas.middleware.CompresionMiddleware)
+COMPRESION_MIN_BYTES = env.int('COMPRESION_MIN_BYTES', default=1024)
+COMPRESION_TIPOS = ['application/json', 'text/calendar']
+COMPRESION_CACHE_TIMEOUT = 3600
 '''
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # puerto típico de Vite
@@ -134,6 +158,65 @@ DATABASES = {
 }
 
 
+# Cache (respuestas por usuario, versiones de invalidación, throttles). Tiene
+# que ser compartida por todos los workers de gunicorn: con una cache por
+# proceso una escritura solo invalida la del worker que la atendió. Por
+# defecto usa una tabla de la base (manage.py createcachetable, en build.sh);
+# con redis/memcached es más rápida, p. ej. CACHE_URL=rediscache://127.0.0.1:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dbcache://cache_sisreservas'),
+    # Contadores de los throttles: varias escrituras por request, que en la
+    # tabla de la base serían consultas SQL y no atómicas. Por defecto en
+    # memoria de cada proceso (incremento atómico, pero la cuota efectiva se
+    # multiplica por la cantidad de workers); para una cuota global,
+    # THROTTLE_CACHE_URL=rediscache://... o pymemcache://...
+    'throttle': env.cache('THROTTLE_CACHE_URL', default='locmemcache://throttle'),
+}
+
+# Tiempo que se guardan las respuestas de POST con Idempotency-Key
+IDEMPOTENCIA_TTL = timedelta(hours=env.int('IDEMPOTENCIA_TTL_HORAS', default=24))
+
+# Registro de cambios: tiempo máximo entre que una transacción crea un evento
+# y confirma. Un hueco en los ids se espera hasta este margen antes de darlo
+# por revertido (ver reservas.eventos.marca_de_agua); solo demora la lectura
+# cuando hay huecos
+EVENTOS_MARGEN_SEGUNDOS = env.int('EVENTOS_MARGEN_SEGUNDOS', default=60)
+# Validez del token de /sync/; uno más viejo obliga a una sincronización completa
+SYNC_TOKEN_DURACION = timedelta(days=env.int('SYNC_TOKEN_DIAS', default=30))
+
+# Perfilado a pedido de administradores (cabecera X-Perfilar: 1)
+PERFILADO_DIR = env('PERFILADO_DIR', default=str(BASE_DIR / 'perfiles'))
+PERFILADO_MAX_ARCHIVOS = env.int('PERFILADO_MAX_ARCHIVOS', default=200)
+PERFILADO_MAX_BYTES = env.int('PERFILADO_MAX_MB', default=50) * 1024 * 1024
+
+# Outbox de notificaciones (comando despachar_mensajes)
+MENSAJERIA_PROVEEDOR = env('MENSAJERIA_PROVEEDOR', default='reservas.notificaciones.ProveedorConsola')
+MENSAJERIA_RECORDATORIO_HORAS = env.int('MENSAJERIA_RECORDATORIO_HORAS', default=3)
+MENSAJERIA_MAX_INTENTOS = env.int('MENSAJERIA_MAX_INTENTOS', default=5)
+MENSAJERIA_BACKOFF_SEGUNDOS = env.int('MENSAJERIA_BACKOFF_SEGUNDOS', default=30)
+# Tiempo que un despachador retiene los mensajes que tomó antes de que otro
+# pueda reintentarlos (debe superar el timeout del proveedor)
+MENSAJERIA_RECLAMO_SEGUNDOS = env.int('MENSAJERIA_RECLAMO_SEGUNDOS', default=300)
+
+# Escritura diferida de last_login
+ULTIMO_LOGIN_LOTE = env.int('ULTIMO_LOGIN_LOTE', default=100)
+ULTIMO_LOGIN_INTERVALO = env.int('ULTIMO_LOGIN_INTERVALO', default=60)
+
+
+# Hashing de contraseñas. El primer hasher es el que se usa para contraseñas
+# nuevas; los demás solo verifican hashes existentes, que se recalculan con
+# el preferido en el siguiente login. Medir el costo con: manage.py benchmark_login
+PASSWORD_PBKDF2_ITERATIONS = env.int('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000)
+PASSWORD_HASHERS = list(dict.fromkeys([
+    env('PASSWORD_HASHER', default='reservas.hashers.PBKDF2AjustableHasher'),
+    'reservas.hashers.PBKDF2AjustableHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -170,6 +253,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos subidos (comprobantes de pago). Antes MEDIA_ROOT no estaba
+# configurado y se guardaban relativos al directorio de trabajo; build.sh
+# los mueve con manage.py mover_comprobantes
+MEDIA_URL = 'media/'
+MEDIA_ROOT = env('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
+# Las subidas se escriben a disco por bloques mientras se calcula su sha256
+FILE_UPLOAD_HANDLERS = ['reservas.almacenamiento.HashTemporaryFileUploadHandler']
+FILE_UPLOAD_TEMP_DIR = env('FILE_UPLOAD_TEMP_DIR', default=None)
+
+# Quién entrega los bytes de /api/pagos/<id>/comprobante/:
+# 'django', 'nginx' (X-Accel-Redirect) o 'apache' (X-Sendfile)
+COMPROBANTES_ENVIO = env('COMPROBANTES_ENVIO', default='django')
+# location internal de nginx que apunta a MEDIA_ROOT
+COMPROBANTES_ACCEL_PREFIX = env('COMPROBANTES_ACCEL_PREFIX', default='/media-protegido/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
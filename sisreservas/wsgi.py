@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sisreservas.settings')
 
 application = get_wsgi_application()
+
+if os.environ.get('DJANGO_PRECARGAR_URLS') == 'True':
+    # Con gunicorn --preload el master importa vistas, serializers y
+    # simplejwt una sola vez y los workers los heredan con fork.
+    from django.db import connections
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    # Ninguna conexión abierta en el master debe compartirse con los workers
+    connections.close_all()